@@ -0,0 +1,79 @@
+import pytest
+import sqlite3
+from weetags.bench import generate
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+
+def schema(database: str) -> list[tuple]:
+    con = sqlite3.connect(database)
+    rows = con.execute("SELECT type, name FROM sqlite_master ORDER BY name").fetchall()
+    catalog = con.execute("SELECT tree, schema_version, root_id FROM weetags__catalog").fetchall()
+    con.close()
+    return rows + catalog
+
+@pytest.fixture
+def database(tmp_path) -> str:
+    database = str(tmp_path / "catalog.db")
+    TreeBuilder.build_tree("catalog", database, data=list(generate("balanced", 100, seed=5)))
+    return database
+
+
+@pytest.mark.tree
+def test_catalog_open(database: str):
+    before = schema(database)
+    tree = Tree("catalog", database)
+    assert tree.root_id == "n0"
+    tree.con.close()
+    assert schema(database) == before
+
+@pytest.mark.tree
+def test_catalog_stale(database: str):
+    con = sqlite3.connect(database)
+    con.execute("CREATE INDEX idx_catalog__nodes_weight ON catalog__nodes(weight);")
+    con.commit()
+    con.close()
+
+    # stale catalogs fall back on the pragmas, without being rewritten.
+    before = schema(database)
+    tree = Tree("catalog", database)
+    assert tree.root_id == "n0" and tree.node("n5", ["id"]) == {"id": "n5"}
+    assert schema(database) == before
+    tree.con.close()
+
+    TreeBuilder.build_tree("catalog", database)
+    assert Tree("catalog", database)._read_catalog("catalog") is not None
+
+@pytest.mark.tree
+def test_catalog_index_changes(database: str):
+    tree = Tree("catalog", database)
+    index = tree.create_index(["weight"])
+    assert tree._read_catalog("catalog") is not None
+    tree.drop_index(index)
+    assert tree._read_catalog("catalog") is not None
+
+@pytest.mark.tree
+def test_catalog_parent_index(database: str):
+    tree = Tree("catalog", database)
+    with pytest.raises(ValueError, match="cannot be dropped"):
+        tree.drop_index("idx_catalog__nodes_parent")
+    assert "idx_catalog__nodes_parent" in tree.indexes
+
+@pytest.mark.tree
+def test_catalog_upgrade(database: str):
+    # trees built without a parent index are upgraded by the builder, not when opened.
+    con = sqlite3.connect(database)
+    con.execute("DROP INDEX idx_catalog__nodes_parent;")
+    con.commit()
+    con.close()
+
+    tree = Tree("catalog", database)
+    assert "idx_catalog__nodes_parent" not in tree.indexes
+    # reads do not depend on the index being there.
+    assert tree.node("n1", ["children"])["children"] == [f"n{i}" for i in range(11, 21)]
+    assert [n["id"] for n in tree.children_nodes("n1", ["id"])] == [f"n{i}" for i in range(11, 21)]
+    assert [n["id"] for n in tree.ancestors_nodes("n15", ["id"])] == ["n1", "n0"]
+    assert len(tree.descendants_nodes("n0", ["id"])) == 99
+    tree.con.close()
+    tree = TreeBuilder.build_tree("catalog", database)
+    assert "idx_catalog__nodes_parent" in tree.indexes
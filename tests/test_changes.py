@@ -0,0 +1,71 @@
+import pytest
+from weetags.bench import generate
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+NODE = {"name": "new node", "alias": [], "meta": {}, "weight": 1}
+
+
+@pytest.fixture(params=[False, True], ids=["metadata", "inline"])
+def tree(tmp_path, request) -> Tree:
+    # balanced tree: n1..n10 under n0, n11..n29 under n1 and n2, the latter being leaves.
+    database = str(tmp_path / "changes.db")
+    data = list(generate("balanced", 30, seed=2))
+    return TreeBuilder.build_tree("changes", database, data=data, track_changes=True, inline_metadata=request.param)
+
+
+@pytest.mark.tree
+def test_changes_insert(tree: Tree):
+    # the build itself is not logged.
+    assert tree.changes_since() == []
+    tree.add_node(nid="new", parent="n25", node_values=dict(NODE))
+    # inline metadata columns are written along with the node.
+    inline = ["depth", "is_root", "is_leaf"] if tree.inlines_metadata else []
+    assert tree.changes_since() == [
+        {"seq": 1, "op": "update", "nid": "n25", "changed": ["children"]},
+        # metadata only updates are logged as well.
+        {"seq": 2, "op": "update", "nid": "n25", "changed": ["is_leaf"]},
+        {"seq": 3, "op": "insert", "nid": "new", "changed": ["id", "parent", "children", "position", "name", "alias", "meta", "weight", *inline]},
+    ]
+
+@pytest.mark.tree
+def test_changes_update(tree: Tree):
+    tree.update_node(nid="n3", set_values=[("name", "renamed"), ("weight", -1)])
+    # setting a field to its current value is not a change.
+    tree.update_node(nid="n3", set_values=[("name", "renamed")])
+    assert tree.changes_since() == [{"seq": 1, "op": "update", "nid": "n3", "changed": ["name", "weight"]}]
+
+@pytest.mark.tree
+def test_changes_delete(tree: Tree):
+    parent = tree.node("n29", ["parent"])["parent"]
+    tree.delete_node("n29")
+    assert tree.changes_since() == [
+        {"seq": 1, "op": "update", "nid": parent, "changed": ["children"]},
+        {"seq": 2, "op": "delete", "nid": "n29", "changed": []},
+    ]
+
+@pytest.mark.tree
+def test_changes_pages_and_prune(tree: Tree):
+    for i in range(5):
+        tree.update_node(nid=f"n{i}", set_values=[("weight", -1)])
+    assert isinstance(tree.changes_since(), list)
+    assert [c["nid"] for c in tree.changes_since(seq=1, limit=2)] == ["n1", "n2"]
+
+    tree.prune_changes(3)
+    assert [c["seq"] for c in tree.changes_since()] == [4, 5]
+    # sequence numbers keep increasing after a prune.
+    tree.update_node(nid="n9", set_values=[("weight", -1)])
+    assert [c["seq"] for c in tree.changes_since(seq=4)] == [5, 6]
+
+@pytest.mark.tree
+def test_changes_not_tracked(tmp_path):
+    database = str(tmp_path / "untracked.db")
+    tree = TreeBuilder.build_tree("untracked", database, data=list(generate("balanced", 30, seed=2)))
+    with pytest.raises(ValueError):
+        tree.changes_since()
+    with pytest.raises(ValueError):
+        tree.prune_changes(0)
+
+    tree.track_changes()
+    tree.update_node(nid="n3", set_values=[("name", "renamed")])
+    assert Tree("untracked", database).changes_since() == [{"seq": 1, "op": "update", "nid": "n3", "changed": ["name"]}]
@@ -0,0 +1,60 @@
+import pytest
+from weetags.bench import generate
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+# balanced tree: n1..n10 under n0, n11..n29 under n1 and n2.
+RECORDS = list(generate("balanced", 30, seed=2))
+NODE = {"name": "new", "alias": [], "meta": {}, "weight": 1}
+
+def children(tree: Tree, nid: str) -> list[str]:
+    ids = [n["id"] for n in tree.children_nodes(nid, ["id"])]
+    # stored or derived, the children field follows the same order.
+    assert tree.node(nid, ["children"])["children"] == ids
+    return ids
+
+@pytest.fixture(params=[(True, False), (False, False), (True, True), (False, True)], ids=["stored", "derived", "stored-inline", "derived-inline"])
+def tree(tmp_path, request) -> Tree:
+    store_children, inline_metadata = request.param
+    return TreeBuilder.build_tree("children", str(tmp_path / "children.db"), data=RECORDS, store_children=store_children, inline_metadata=inline_metadata)
+
+
+@pytest.mark.tree
+def test_positions(tree: Tree):
+    assert children(tree, "n0") == [f"n{i}" for i in range(1, 11)]
+    assert [tree.node(f"n{i}", ["position"])["position"] for i in range(1, 11)] == list(range(10))
+    # positions are only returned when listed.
+    assert "position" not in tree.node("n1")
+    assert tree.node("n0", ["position"])["position"] == 0
+
+@pytest.mark.tree
+def test_children_layout(tree: Tree):
+    columns = [row[1] for row in tree.cursor.execute("PRAGMA table_info(children__nodes);")]
+    assert ("children" in columns) == tree.stores_children
+    assert tree.node("n3")["children"] == [] and tree.node("n3")["is_leaf"] == 1
+
+@pytest.mark.tree
+def test_children_order_mutations(tree: Tree):
+    tree.add_node(nid="first", parent="n0", node_values=dict(NODE))
+    tree.add_node(nid="second", parent="n0", node_values=dict(NODE))
+    tree.add_node(nid="leaf", parent="n3", node_values=dict(NODE))
+    # new children come last, in insertion order.
+    assert children(tree, "n0") == [f"n{i}" for i in range(1, 11)] + ["first", "second"]
+    assert children(tree, "n3") == ["leaf"] and tree.node("n3", ["is_leaf"])["is_leaf"] == 0
+
+    tree.delete_node("n5")
+    tree.delete_node("first")
+    assert children(tree, "n0") == ["n1", "n2", "n3", "n4", "n6", "n7", "n8", "n9", "n10", "second"]
+    tree.add_node(nid="third", parent="n0", node_values=dict(NODE))
+    assert children(tree, "n0")[-2:] == ["second", "third"]
+
+    tree.delete_node("leaf")
+    assert children(tree, "n3") == []
+
+@pytest.mark.tree
+def test_children_order_unordered(tmp_path):
+    # children keep the order of the records, whatever the order parents come in.
+    records = RECORDS[11:] + RECORDS[:11]
+    tree = TreeBuilder.build_tree("unordered", str(tmp_path / "unordered.db"), data=records, ordered=False, store_children=False)
+    expected = [r["id"] for r in records if r["parent"] == "n1"]
+    assert children(tree, "n1") == expected
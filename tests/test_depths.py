@@ -0,0 +1,67 @@
+import pytest
+from weetags.bench import generate
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+# balanced tree: n1..n10 under n0, n11..n110 under n1..n10, n111..n199 under n11..n19.
+RECORDS = list(generate("balanced", 200, seed=1))
+PARENTS = {r["id"]: r["parent"] for r in RECORDS}
+
+def depth(nid: str) -> int:
+    return 0 if PARENTS[nid] is None else depth(PARENTS[nid]) + 1
+
+def ancestors(nid: str) -> list[str]:
+    return [] if PARENTS[nid] is None else [PARENTS[nid]] + ancestors(PARENTS[nid])
+
+def descendants(nid: str) -> set[str]:
+    return {n for n in PARENTS if nid in ancestors(n)}
+
+def ids(nodes: list[dict]) -> list[str]:
+    return [n["id"] for n in nodes]
+
+@pytest.fixture(params=[False, True], ids=["metadata", "inline"])
+def tree(tmp_path, request) -> Tree:
+    return TreeBuilder.build_tree("depths", str(tmp_path / "depths.db"), data=RECORDS, inline_metadata=request.param)
+
+
+@pytest.mark.tree
+def test_ancestors_depths(tree: Tree):
+    assert ids(tree.ancestors_nodes("n150", ["id"])) == ancestors("n150") == ["n14", "n1", "n0"]
+    # relative bounds count levels up from the node.
+    assert ids(tree.ancestors_nodes("n150", ["id"], min_depth=2)) == ["n1", "n0"]
+    assert ids(tree.ancestors_nodes("n150", ["id"], max_depth=2)) == ["n14", "n1"]
+    assert ids(tree.ancestors_nodes("n150", ["id"], min_depth=2, max_depth=2)) == ["n1"]
+    # absolute bounds are depths in the tree.
+    assert ids(tree.ancestors_nodes("n150", ["id"], min_depth=1, absolute=True)) == ["n14", "n1"]
+    assert ids(tree.ancestors_nodes("n150", ["id"], max_depth=0, absolute=True)) == ["n0"]
+    assert ids(tree.ancestors_nodes("n150", ["id"], min_depth=3, absolute=True)) == []
+    assert tree.ancestors_nodes("missing", ["id"], max_depth=1, absolute=True) == []
+
+@pytest.mark.tree
+def test_descendants_depths(tree: Tree):
+    below = descendants("n1")
+    assert set(ids(tree.descendants_nodes("n1", ["id"]))) == below
+    children = {n for n in below if depth(n) == 2}
+    assert set(ids(tree.descendants_nodes("n1", ["id"], max_depth=1))) == children
+    assert set(ids(tree.descendants_nodes("n1", ["id"], min_depth=2))) == below - children
+    assert set(ids(tree.descendants_nodes("n1", ["id"], min_depth=2, absolute=True))) == children | (below - children)
+    assert set(ids(tree.descendants_nodes("n1", ["id"], min_depth=3, absolute=True))) == below - children
+    assert set(ids(tree.descendants_nodes("n0", ["id"], max_depth=1, absolute=True))) == {f"n{i}" for i in range(1, 11)}
+    # bounds above the node select nothing.
+    assert tree.descendants_nodes("n1", ["id"], max_depth=1, absolute=True) == []
+    # the walk is level by level.
+    depths = [n["depth"] for n in tree.descendants_nodes("n0", ["depth"])]
+    assert depths == sorted(depths)
+
+@pytest.mark.tree
+def test_level_nodes(tree: Tree):
+    for level in range(1, 4):
+        expected = {n for n in PARENTS if depth(n) == level}
+        assert set(ids(tree.level_nodes("n0", level, ["id"], absolute=True))) == expected
+        assert set(ids(tree.level_nodes("n0", level, ["id"]))) == expected
+    # levels are read among the descendants, the node itself excluded.
+    assert tree.level_nodes("n0", 0, ["id"], absolute=True) == []
+    assert set(ids(tree.level_nodes("n11", 1, ["id"]))) == {n for n in PARENTS if PARENTS[n] == "n11"}
+    assert set(ids(tree.level_nodes("n11", 3, ["id"], absolute=True))) == {n for n in PARENTS if PARENTS[n] == "n11"}
+    assert tree.level_nodes("n11", 2, ["id"], absolute=True) == []
+    assert ids(tree.level_nodes("n0", 2, ["id"], limit=3, order_by=["id"])) == sorted(n for n in PARENTS if depth(n) == 2)[:3]
@@ -0,0 +1,60 @@
+import pytest
+import sqlite3
+from weetags.bench import generate
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+
+@pytest.fixture
+def database(tmp_path) -> str:
+    database = str(tmp_path / "explain.db")
+    TreeBuilder.build_tree("explain", database, data=list(generate("balanced", 200, seed=2)))
+    return database
+
+
+@pytest.mark.tree
+def test_explain_indexed(database: str):
+    tree = Tree("explain", database)
+    [stmt] = tree.explain("nodes_where", conditions=[[("id", "=", "n5")]])
+    assert stmt["params"] == ["n5"] and stmt["warnings"] == []
+    for stmt in tree.explain("descendants_nodes", nid="n1"):
+        assert stmt["warnings"] == []
+
+@pytest.mark.tree
+def test_explain_full_scan(database: str):
+    tree = Tree("explain", database)
+    [stmt] = tree.explain("nodes_where", conditions=[[("weight", ">", 10)]])
+    assert stmt["warnings"] == ["full scan: SCAN explain__nodes"]
+
+    index = tree.create_index(["weight"])
+    [stmt] = tree.explain("nodes_where", conditions=[[("weight", ">", 10)]])
+    assert stmt["warnings"] == [] and any(index in step for step in stmt["plan"])
+
+@pytest.mark.tree
+def test_explain_aliased_scan(tmp_path):
+    database = str(tmp_path / "derived.db")
+    TreeBuilder.build_tree("derived", database, data=list(generate("balanced", 200, seed=2)), store_children=False)
+    tree = Tree("derived", database)
+    for stmt in tree.explain("node", nid="n1"):
+        assert not [w for w in stmt["warnings"] if w.startswith("full scan")]
+
+    con = sqlite3.connect(database)
+    con.execute("DROP INDEX idx_derived__nodes_parent;")
+    con.commit()
+    con.close()
+
+    # without the parent index, derived children scan the nodes table under the `c` alias.
+    tree = Tree("derived", database)
+    warnings = [w for stmt in tree.explain("node", nid="n1") for w in stmt["warnings"]]
+    assert "full scan: SCAN c" in warnings
+
+@pytest.mark.tree
+def test_explain_mutation(database: str):
+    tree = Tree("explain", database)
+    explained = tree.explain("delete_node", nid="n5")
+    assert any(stmt["sql"].lstrip().startswith("DELETE") for stmt in explained)
+    # mutations are rolled back.
+    assert tree.node("n5", ["id"]) == {"id": "n5"}
+    assert "n5" in tree.node("n0", ["children"])["children"]
+    with pytest.raises(ValueError):
+        tree.explain("_delete_node", nid="n5")
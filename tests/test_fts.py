@@ -0,0 +1,50 @@
+import pytest
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+RECORDS = [
+    {"id": "root", "parent": None, "name": "root", "alias": []},
+    {"id": "a", "parent": "root", "name": "doctor in a long sentence, full of words unrelated to the query", "alias": []},
+    {"id": "b", "parent": "root", "name": "doctor of medicine, the doctor job", "alias": ["Docteur"]},
+    {"id": "c", "parent": "a", "name": "nurse", "alias": ["infirmier", "doctor assistant"]},
+    {"id": "z", "parent": "a", "name": "Doctor", "alias": ["Médecin"]},
+]
+
+def ids(nodes: list[dict]) -> list[str]:
+    return [n["id"] for n in nodes]
+
+@pytest.fixture
+def tree(tmp_path) -> Tree:
+    database = str(tmp_path / "fts.db")
+    return TreeBuilder.build_tree("fts", database, data=RECORDS, indexes=[{"field": "alias", "kind": "fts"}, {"field": "name", "kind": "fts"}])
+
+
+@pytest.mark.tree
+def test_fts_match(tree: Tree):
+    assert "fts__fts_alias" in tree.indexes and "fts__fts_name" in tree.indexes
+    # accents and case are ignored, list elements are searched as a single document.
+    assert ids(tree.nodes_where([[("alias", "MATCH", "medecin")]], ["id"])) == ["z"]
+    assert sorted(ids(tree.nodes_where([[("alias", "MATCH", "doc*")]], ["id"]))) == ["b", "c"]
+    assert sorted(ids(tree.nodes_where([[("alias", "MATCH", "MEDECIN OR infirmier")]], ["id"]))) == ["c", "z"]
+    assert ids(tree.nodes_where([[("alias", "MATCH", '"doctor assistant"')]], ["id"])) == ["c"]
+    # MATCH conditions combine with the other conditions, and with relations.
+    assert ids(tree.nodes_where([[("name", "MATCH", "doctor"), ("alias", "MATCH", "docteur")]], ["id"])) == ["b"]
+    assert ids(tree.nodes_where([[("name", "MATCH", "doctor"), ("parent", "=", "a")]], ["id"])) == ["z"]
+    assert ids(tree.children_nodes("a", ["id"], conditions=[[("alias", "MATCH", "doctor")]])) == ["c"]
+
+@pytest.mark.tree
+def test_fts_bm25(tree: Tree):
+    # best matches first: the shortest documents, the most occurrences.
+    assert ids(tree.nodes_where([[("name", "MATCH", "doctor")]], ["id"])) == ["z", "b", "a"]
+    assert ids(tree.nodes_where([[("name", "MATCH", "doctor")]], ["id"], limit=2)) == ["z", "b"]
+    # an explicit order replaces the relevance.
+    assert ids(tree.nodes_where([[("name", "MATCH", "doctor")]], ["id"], order_by=["id"])) == ["a", "b", "z"]
+
+@pytest.mark.tree
+def test_fts_triggers(tree: Tree):
+    tree.update_node(nid="z", set_values=[("alias", ["surgeon"])])
+    tree.add_node(nid="y", parent="b", node_values={"name": "chief doctor", "alias": ["médecin chef"]})
+    tree.delete_node("c")
+    assert ids(tree.nodes_where([[("alias", "MATCH", "medecin")]], ["id"])) == ["y"]
+    assert ids(tree.nodes_where([[("alias", "MATCH", "surgeon")]], ["id"])) == ["z"]
+    assert ids(tree.nodes_where([[("alias", "MATCH", "infirmier")]], ["id"])) == []
@@ -0,0 +1,50 @@
+import pytest
+import sqlite3
+from threading import Thread, Event
+from weetags.bench import generate
+from weetags.exceptions import QueryTimeout, QueryInterrupted
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+
+@pytest.fixture
+def tree(tmp_path) -> Tree:
+    database = str(tmp_path / "guard.db")
+    return TreeBuilder.build_tree("guard", database, data=list(generate("balanced", 5000, seed=6)))
+
+
+@pytest.mark.tree
+def test_guard_deadline(tree: Tree):
+    with pytest.raises(QueryTimeout) as e:
+        tree.descendants_nodes("n0", deadline=0)
+    assert e.value.deadline == 0
+    # the guard is released: the next operations run without deadline.
+    assert tree.deadline is None
+    assert len(tree.descendants_nodes("n0", ["id"], deadline=60)) == 4999
+
+@pytest.mark.tree
+def test_guard_other_errors(tree: Tree):
+    # errors that are not aborts are raised as is, even past the deadline.
+    with pytest.raises(sqlite3.OperationalError, match="no such table"):
+        with tree._guard(0):
+            tree.con.execute("SELECT * FROM missing;")
+
+@pytest.mark.tree
+def test_guard_interrupt(tree: Tree):
+    done = Event()
+
+    def interrupt() -> None:
+        while not done.is_set():
+            tree.interrupt()
+            done.wait(0.001)
+
+    thread = Thread(target=interrupt)
+    thread.start()
+    try:
+        with pytest.raises(QueryInterrupted):
+            for _ in range(1000):
+                tree.descendants_nodes("n0", ["id"])
+    finally:
+        done.set()
+        thread.join()
+    assert len(tree.descendants_nodes("n0", ["id"])) == 4999
@@ -0,0 +1,74 @@
+import pytest
+import sqlite3
+from weetags.bench import generate
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+
+def index_sql(tree: Tree, name: str) -> str:
+    return tree.cursor.execute("SELECT sql FROM sqlite_master WHERE name = ?;", [name]).fetchone()[0].strip()
+
+@pytest.fixture
+def tree(tmp_path) -> Tree:
+    database = str(tmp_path / "indexes.db")
+    return TreeBuilder.build_tree("ix", database, data=list(generate("balanced", 100, seed=3)))
+
+
+@pytest.mark.tree
+def test_composite_index(tree: Tree):
+    index = tree.create_index(["depth", "nid"])
+    assert index == "idx_ix__metadata_depth_nid" and index in tree.indexes
+    assert index_sql(tree, index) == "CREATE INDEX idx_ix__metadata_depth_nid ON ix__metadata(depth, nid)"
+    [stmt] = tree.explain("nodes_where", conditions=[[("depth", "=", 2)]])
+    assert any(index in step for step in stmt["plan"])
+    assert tree.create_index(["weight", "name"]) == "idx_ix__nodes_weight_name"
+
+@pytest.mark.tree
+def test_composite_index_tables(tree: Tree, tmp_path):
+    # depth lives in the metadata table, parent in the nodes table.
+    with pytest.raises(ValueError, match="same table"):
+        tree.create_index(["depth", "parent"])
+    tree.create_index("alias")
+    with pytest.raises(ValueError, match="index table"):
+        tree.create_index(["alias", "name"])
+
+    # with inline metadata, both live in the nodes table.
+    database = str(tmp_path / "inline.db")
+    inline = TreeBuilder.build_tree("inline", database, data=list(generate("balanced", 100, seed=3)), inline_metadata=True)
+    assert inline.create_index(["depth", "parent"]) == "idx_inline__nodes_depth_parent"
+
+@pytest.mark.tree
+def test_partial_index(tree: Tree):
+    index = tree.create_index("nid", where=[[("is_leaf", "=", True)]])
+    assert index.startswith("idx_ix__metadata_nid_")
+    assert index_sql(tree, index).endswith("WHERE (ix__metadata.is_leaf = 1)")
+    with pytest.raises(ValueError, match="Partial index"):
+        tree.create_index("weight", where=[[("name", "LIKE", "a%")]])
+
+@pytest.mark.tree
+def test_unique_index(tree: Tree):
+    index = tree.create_index("name", unique=True, name="uniq_name")
+    assert index == "uniq_name" and index_sql(tree, index).startswith("CREATE UNIQUE INDEX")
+    name = tree.node("n2", ["name"])["name"]
+    with pytest.raises(sqlite3.IntegrityError):
+        tree.update_node(nid="n3", set_values=[("name", name)])
+
+    tree.drop_index(index)
+    assert index not in tree.indexes
+    tree.update_node(nid="n3", set_values=[("name", name)])
+
+@pytest.mark.tree
+def test_index_table(tree: Tree):
+    index = tree.create_index("alias")
+    assert index == "ix__alias" and index in tree.indexes
+    alias = next(n["alias"][0] for n in tree.nodes_where(fields=["alias"]) if n["alias"])
+    matching = tree.nodes_where([[("alias", "=", alias)]], ["id"])
+    assert len(matching) > 0
+
+    # the index table is dropped along with the triggers keeping it in sync.
+    tree.drop_index(index)
+    assert index not in tree.indexes
+    assert tree.cursor.execute("SELECT name FROM sqlite_master WHERE tbl_name = 'ix__alias';").fetchall() == []
+    tree.update_node(nid="n3", set_values=[("alias", ["renamed"])])
+    with pytest.raises(KeyError):
+        tree.drop_index(index)
@@ -0,0 +1,55 @@
+import pytest
+import sqlite3
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+RECORDS = [
+    {"id": "r", "parent": None, "meta": {"lang": "en", "rank": 1, "geo": {"country": "fr"}}},
+    {"id": "a", "parent": "r", "meta": {"lang": "fr", "rank": 5, "geo": {"country": "be"}}},
+    {"id": "b", "parent": "r", "meta": {"lang": "fr", "rank": 9}},
+    {"id": "c", "parent": "a", "meta": {}},
+]
+
+def ids(nodes: list[dict]) -> list[str]:
+    return [n["id"] for n in nodes]
+
+@pytest.fixture
+def database(tmp_path) -> str:
+    database = str(tmp_path / "paths.db")
+    TreeBuilder.build_tree("paths", database, data=RECORDS, indexes=["meta.rank", "meta.geo.country"])
+    return database
+
+
+@pytest.mark.tree
+def test_json_path_columns(database: str):
+    con = sqlite3.connect(database)
+    columns = {row[1]: row[6] for row in con.execute("PRAGMA table_xinfo(paths__nodes);")}
+    con.close()
+    # extracted values are virtual generated columns, named after their path.
+    assert columns["meta_rank"] == 2 and columns["meta_geo_country"] == 2
+
+    tree = Tree("paths", database)
+    assert {"idx_paths__nodes_meta_rank", "idx_paths__nodes_meta_geo_country"} <= set(tree.indexes)
+    [stmt] = tree.explain("nodes_where", conditions=[[("meta.rank", ">", 3)]])
+    assert stmt["warnings"] == [] and "idx_paths__nodes_meta_rank" in stmt["plan"][0]
+
+@pytest.mark.tree
+def test_json_path_namespaces(database: str):
+    tree = Tree("paths", database)
+    # conditions and fields refer to a path or to its column name alike.
+    assert tree.nodes_where([[("meta.rank", ">", 3)]], ["id", "meta.rank"]) == [{"id": "a", "meta_rank": 5}, {"id": "b", "meta_rank": 9}]
+    assert tree.nodes_where([[("meta_rank", ">", 3)]], ["id", "meta_rank"]) == [{"id": "a", "meta_rank": 5}, {"id": "b", "meta_rank": 9}]
+    assert ids(tree.nodes_where([[("meta.geo.country", "=", "be")]], ["id"])) == ["a"]
+    assert tree.node("c", ["id", "meta.rank", "meta_geo_country"]) == {"id": "c", "meta_rank": None, "meta_geo_country": None}
+
+@pytest.mark.tree
+def test_json_path_mutations(database: str):
+    tree = Tree("paths", database)
+    # generated columns follow their dict.
+    tree.update_node(nid="c", set_values=[("meta", {"rank": 7})])
+    assert ids(tree.nodes_where([[("meta.rank", ">", 3)]], ["id"], order_by=["meta.rank"])) == ["a", "c", "b"]
+
+    index = tree.create_index("meta.lang")
+    assert index == "idx_paths__nodes_meta_lang"
+    assert ids(tree.nodes_where([[("meta.lang", "=", "fr")]], ["id"])) == ["a", "b"]
+    assert Tree("paths", database).nodes_where([[("meta_lang", "=", "en")]], ["id", "meta.lang"]) == [{"id": "r", "meta_lang": "en"}]
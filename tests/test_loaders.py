@@ -0,0 +1,156 @@
+import io
+import bz2
+import csv
+import sys
+import gzip
+import json
+import lzma
+import pytest
+import weetags.loaders as loaders
+from weetags.bench import generate, write_dataset
+from weetags.loaders import iter_json_array, infer_compression, open_source, JlLoader, JsonLoader, CsvLoader, TsvLoader
+from weetags.tree_builder import TreeBuilder
+
+
+class CountingStream(io.StringIO):
+    """keep the number of characters read from the stream."""
+
+    def __init__(self, value: str) -> None:
+        super().__init__(value)
+        self.consumed = 0
+
+    def read(self, size: int = -1) -> str:
+        chunk = super().read(size)
+        self.consumed += len(chunk)
+        return chunk
+
+@pytest.fixture
+def records() -> list[dict]:
+    records = list(generate("skewed", 50, seed=3))
+    records[3]["name"] = "escaped \" \\ é \n"
+    records[4]["weight"] = -1.5e-3
+    records[5]["meta"] = {"deep": [[{"x": None}], True, False]}
+    return records
+
+
+@pytest.mark.loaders
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 1 << 20])
+def test_json_array_valid(records: list[dict], chunk_size: int):
+    # every chunk size cuts the elements, strings and escapes at different places.
+    text = json.dumps(records, indent=1, ensure_ascii=False)
+    assert list(iter_json_array(io.StringIO(text), chunk_size)) == records
+    assert list(iter_json_array(io.StringIO(" [ ] "), chunk_size)) == []
+
+@pytest.mark.loaders
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+@pytest.mark.parametrize("cut", [-1, -2, -10, -300])
+def test_json_array_truncated(records: list[dict], chunk_size: int, cut: int):
+    text = json.dumps(records)[:cut]
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), chunk_size))
+
+@pytest.mark.loaders
+@pytest.mark.parametrize("text", [
+    '{"id": "n0"}',
+    '[{"id": "n0"}, {"id": "n1"}] [',
+    '[{"id": "n0"} {"id": "n1"}]',
+    '[{"id": "n0"},, {"id": "n1"}]',
+    '[{"id": "n0"}, {"id": n1}]',
+    '[{"id": "n0"}, {"id": "n1",}]',
+])
+def test_json_array_malformed(text: str):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), 4))
+
+@pytest.mark.loaders
+def test_json_array_malformed_early(records: list[dict]):
+    # a malformed element is reported without reading the rest of the stream.
+    text = '[{"id": "n0", "name": nope}, ' + json.dumps(records)[1:]
+    stream = CountingStream(text)
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(stream, 64))
+    assert stream.consumed <= 128 < len(text)
+
+@pytest.mark.loaders
+def test_sample_closes_source(tmp_path, monkeypatch):
+    opened = []
+    def open_source(*args, **kwargs):
+        opened.append(source(*args, **kwargs))
+        return opened[-1]
+
+    source = loaders.open_source
+    monkeypatch.setattr(loaders, "open_source", open_source)
+    path = write_dataset(tmp_path / "nodes.jl", "balanced", 100, seed=3)
+    # the sampled records are read from a generator left unexhausted.
+    builder = TreeBuilder("sample", str(tmp_path / "sample.db"), data=[str(path)], sample=5)
+    assert builder.check_records and len(opened) == 1 and opened[0].closed
+
+COMPRESSORS = {"gz": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+
+@pytest.mark.loaders
+@pytest.mark.parametrize("compression", ["gz", "bz2", "xz"])
+def test_compressed_sources(tmp_path, records: list[dict], compression: str):
+    lines = "".join([json.dumps(r) + "\n" for r in records])
+    path = tmp_path / f"nodes.jl.{compression}"
+    with COMPRESSORS[compression](path, "wt", encoding="utf-8") as f:
+        f.write(lines)
+    # without a telling extension, the compression is inferred from the magic bytes.
+    renamed = path.rename(tmp_path / "nodes.data")
+
+    assert infer_compression(str(renamed)) == compression
+    assert infer_compression(str(tmp_path / f"missing.{compression}")) == compression
+    with open_source(str(renamed), compression) as f:
+        assert f.read() == lines
+    assert list(JlLoader(str(renamed)).loader()) == records
+
+    array = tmp_path / f"nodes.json.{compression}"
+    with COMPRESSORS[compression](array, "wt", encoding="utf-8") as f:
+        json.dump(records, f)
+    assert list(JsonLoader(str(array)).loader()) == records
+    assert list(JsonLoader(str(array), "lazy").loader()) == records
+
+@pytest.mark.loaders
+def test_uncompressed_source(tmp_path):
+    path = tmp_path / "nodes.jl"
+    path.write_text('{"id": "n0", "parent": null}\n')
+    assert infer_compression(str(path)) is None
+    with pytest.raises(ValueError, match="Unknown compression"):
+        open_source(str(path), "rar")
+
+@pytest.mark.loaders
+def test_zstd_source(tmp_path, records: list[dict]):
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "nodes.data"
+    path.write_bytes(zstandard.ZstdCompressor().compress("".join([json.dumps(r) + "\n" for r in records]).encode()))
+    assert infer_compression(str(path)) == "zst"
+    assert list(JlLoader(str(path)).loader()) == records
+
+@pytest.mark.loaders
+def test_zstd_missing(tmp_path, monkeypatch):
+    path = tmp_path / "nodes.jl.zst"
+    path.write_bytes(b"\x28\xb5\x2f\xfd")
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    with pytest.raises(ImportError, match="zstd"):
+        open_source(str(path), "zst")
+
+@pytest.mark.loaders
+@pytest.mark.parametrize("loader, delimiter", [(CsvLoader, ","), (TsvLoader, "\t")])
+def test_delimited_columns(tmp_path, loader, delimiter: str):
+    header = ["id", "parent", "weight", "score", "active", "alias", "meta"]
+    rows = [
+        ["n0", "", "3", "0.5", "true", '["a", "b"]', '{"lang": "en"}'],
+        ["n1", "n0", "", "2", "no", "[]", ""],
+    ]
+    path = tmp_path / f"nodes.{loader.__name__.lower()[:3]}"
+    with open(path, "w", newline="") as f:
+        csv.writer(f, delimiter=delimiter).writerows([header, *rows])
+
+    # without columns, values are loaded as strings.
+    assert list(loader(str(path)).loader())[0]["weight"] == "3"
+    columns = {"weight": "INTEGER", "score": "REAL", "active": "BOOL", "alias": "JSONLIST", "meta": "JSON"}
+    assert list(loader(str(path), columns=columns).loader()) == [
+        {"id": "n0", "parent": None, "weight": 3, "score": 0.5, "active": True, "alias": ["a", "b"], "meta": {"lang": "en"}},
+        {"id": "n1", "parent": "n0", "weight": None, "score": 2.0, "active": False, "alias": [], "meta": None},
+    ]
+    with pytest.raises(ValueError, match="unknown dtype"):
+        list(loader(str(path), columns={"weight": "DATE"}).loader())
@@ -0,0 +1,65 @@
+import pytest
+from weetags.bench import generate
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+
+def snapshot(tree: Tree) -> list[dict]:
+    return tree.nodes_where(fields=["id", "parent", "children", "name", "alias", "depth", "is_root", "is_leaf"], order_by=["id"])
+
+@pytest.fixture
+def database(tmp_path) -> str:
+    database = str(tmp_path / "memory.db")
+    TreeBuilder.build_tree("memory", database, data=list(generate("balanced", 100, seed=3)), indexes=["alias"])
+    return database
+
+
+@pytest.mark.tree
+def test_in_memory(database: str):
+    on_disk = Tree("memory", database)
+    before = snapshot(on_disk)
+    tree = Tree("memory", database, in_memory=True)
+    assert tree.in_memory and tree.root_id == "n0"
+    assert snapshot(tree) == before and tree.indexes == on_disk.indexes
+
+    # mutations only apply to the in memory copy.
+    tree.update_node(nid="n5", set_values=[("name", "in memory")])
+    tree.add_node(nid="new", parent="n42", node_values={"name": "new", "alias": ["fresh"]})
+    tree.delete_node("n60")
+    assert tree.node("n5", ["name"])["name"] == "in memory"
+    assert [n["id"] for n in tree.nodes_where([[("alias", "=", "fresh")]], ["id"])] == ["new"]
+    assert snapshot(Tree("memory", database)) == before
+    with pytest.raises(ValueError):
+        tree.start_writer()
+
+@pytest.mark.tree
+def test_load_into_memory(database: str):
+    tree = Tree("memory", database)
+    tree.load_into_memory()
+    tree.load_into_memory()
+    assert tree.in_memory and len(snapshot(tree)) == 100
+
+    tree = Tree("memory", database)
+    tree.start_writer()
+    with pytest.raises(ValueError):
+        tree.load_into_memory()
+    tree.stop_writer()
+
+@pytest.mark.tree
+def test_persist(database: str, tmp_path):
+    tree = Tree("memory", database, in_memory=True)
+    tree.update_node(nid="n5", set_values=[("name", "persisted")])
+    tree.delete_node("n60")
+    path = tmp_path / "snapshot.db"
+    tree.persist(path)
+
+    # the snapshot is a tree database of its own, the source file is left untouched.
+    restored = Tree("memory", str(path))
+    assert snapshot(restored) == snapshot(tree)
+    assert restored.node("n5", ["name"])["name"] == "persisted" and restored.node("n60") is None
+    assert restored.indexes == tree.indexes
+    assert Tree("memory", database).node("n60", ["id"]) == {"id": "n60"}
+
+    # file backed trees persist as well, and snapshots reload into memory.
+    restored.persist(tmp_path / "copy.db")
+    assert snapshot(Tree("memory", str(tmp_path / "copy.db"), in_memory=True)) == snapshot(tree)
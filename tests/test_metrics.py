@@ -0,0 +1,67 @@
+import pytest
+from weetags.bench import generate
+from weetags.metrics import MetricsSink, BUCKETS
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+
+class RecordingSink(MetricsSink):
+    def __init__(self) -> None:
+        self.records = []
+
+    def record(self, method: str, elapsed: float, statements: int) -> None:
+        self.records.append((method, statements))
+
+@pytest.fixture
+def tree(tmp_path) -> Tree:
+    database = str(tmp_path / "metrics.db")
+    return TreeBuilder.build_tree("metrics", database, data=list(generate("balanced", 100, seed=3)), track_changes=True)
+
+
+@pytest.mark.tree
+def test_metrics_disabled(tree: Tree):
+    with pytest.raises(ValueError):
+        tree.stats()
+    tree.enable_metrics()
+    tree.node("n1")
+    tree.disable_metrics()
+    tree.node("n1")
+    with pytest.raises(ValueError):
+        tree.stats()
+
+@pytest.mark.tree
+def test_metrics_stats(tree: Tree):
+    tree.enable_metrics()
+    tree.node("n1")
+    tree.node("n2")
+    tree.children_nodes("n1")
+    tree.changes_since()
+
+    stats = tree.stats()
+    # one statement per read, primitives are recorded along with the public methods.
+    assert stats["node"]["count"] == 2 and stats["node"]["statements"] == 2
+    assert stats["_read_one"]["count"] == 2
+    assert stats["children_nodes"]["statements"] == 1 and stats["changes_since"]["statements"] == 1
+    node = stats["node"]
+    assert node["mean"] == pytest.approx(node["total"] / 2) and 0 < node["max"] <= node["total"]
+    assert sum(node["histogram"].values()) == 2
+    assert set(node["histogram"]) <= {f"<={b}" for b in BUCKETS}
+    assert "stats" not in stats and "enable_metrics" not in stats
+
+@pytest.mark.tree
+def test_metrics_sink(tree: Tree):
+    sink = RecordingSink()
+    tree.enable_metrics(sink)
+    tree.node("n1")
+    tree.add_node(nid="new", parent="n50", node_values={"name": "new"})
+    tree.delete_node("n60")
+
+    methods = [method for method, _ in sink.records]
+    assert methods[:2] == ["_read_one", "node"]
+    assert tree.stats()["node"]["count"] == 1
+    # only the outermost public call is recorded, its statements include the ones of the calls it made.
+    assert "delete_node" in methods and "orphans_nodes" not in methods and "descendants_nodes" not in methods
+    end = methods.index("add_node")
+    primitives = sum([statements for method, statements in sink.records[2:end]])
+    assert sink.records[end][1] >= primitives > 0
+    assert sink.records[-1] == ("delete_node", tree.stats()["delete_node"]["statements"])
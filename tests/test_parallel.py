@@ -0,0 +1,61 @@
+import gzip
+import json
+import pytest
+import weetags.parallel as parallel
+from weetags.bench import generate, write_dataset
+from weetags.parallel import ParallelLoader, chunk_offsets, read_chunk, encode_chunk, to_row
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+
+def snapshot(tree: Tree) -> list[dict]:
+    return tree.nodes_where(fields=["id", "parent", "children", "name", "alias", "meta", "weight", "depth", "is_root", "is_leaf"], order_by=["id"])
+
+@pytest.fixture
+def dataset(tmp_path) -> str:
+    return str(write_dataset(tmp_path / "nodes.jl", "balanced", 300, seed=8))
+
+
+@pytest.mark.loaders
+@pytest.mark.parametrize("chunk_size", [1, 37, 256, 1 << 22])
+def test_chunk_offsets(dataset: str, chunk_size: int):
+    with open(dataset, "rb") as f:
+        content = f.read()
+    offsets = chunk_offsets(dataset, chunk_size)
+    # ranges are contiguous, cover the whole file, and end on a newline.
+    assert offsets[0][0] == 0 and offsets[-1][1] == len(content)
+    assert all([end == start for (_, end), (start, _) in zip(offsets, offsets[1:])])
+    assert all([content[end - 1:end] == b"\n" for _, end in offsets])
+
+    # records straddling a boundary are read once, by the chunk they start in.
+    records = [json.loads(line) for line in content.splitlines()]
+    assert [r for start, end in offsets for r in read_chunk(dataset, start, end)] == records
+
+@pytest.mark.loaders
+def test_encode_chunk(dataset: str):
+    columns = ["id", "parent", "alias", "meta", "weight", "missing"]
+    [(start, end), *_] = chunk_offsets(dataset, 1000)
+    records = list(read_chunk(dataset, start, end))
+    rows = encode_chunk(dataset, start, end, columns)
+    assert rows == [to_row(r, columns, encode=True) for r in records]
+    assert rows[1][2] == json.dumps(records[1]["alias"]) and rows[1][5] is None
+
+@pytest.mark.tree
+def test_parallel_build(tmp_path, dataset: str, monkeypatch):
+    # a second, compressed, source is consumed inline, after the first one.
+    compressed = str(tmp_path / "more.jl.gz")
+    with gzip.open(compressed, "wt") as f:
+        for record in generate("balanced", 50, seed=9):
+            if record["parent"] is not None:
+                f.write(json.dumps({**record, "id": f"gz{record['id']}", "parent": "n299"}) + "\n")
+
+    serial = TreeBuilder.build_tree("serial", str(tmp_path / "serial.db"), data=[dataset, compressed])
+    # small chunks make records straddle the chunk boundaries.
+    offsets = parallel.chunk_offsets
+    monkeypatch.setattr(parallel, "chunk_offsets", lambda fp, chunk_size: offsets(fp, 256))
+    tree = TreeBuilder.build_tree("parallel", str(tmp_path / "parallel.db"), data=[dataset, compressed], workers=2)
+
+    assert len(chunk_offsets(dataset, 256)) > 10
+    assert snapshot(tree) == snapshot(serial)
+    assert tree.info["model"] == serial.info["model"]
+    assert ParallelLoader(TreeBuilder("check", data=[dataset]).data, 2, 256).infer_model() == TreeBuilder("check", data=[dataset]).model
@@ -0,0 +1,122 @@
+import pytest
+import sqlite3
+from weetags.bench import generate
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+
+
+def snapshot(tree: Tree) -> dict[str, dict]:
+    return {n["id"]: n for n in tree.nodes_where(fields=["id", "parent", "children", "name", "depth", "is_root", "is_leaf"])}
+
+@pytest.fixture
+def records() -> list[dict]:
+    # balanced tree: n1..n10 under n0, n11..n110 under n1..n10, n111..n199 under n11..n19.
+    return list(generate("balanced", 200, seed=1))
+
+@pytest.fixture
+def database(tmp_path, records) -> str:
+    database = str(tmp_path / "sync.db")
+    TreeBuilder.build_tree("sync", database, data=records, indexes=["alias"])
+    return database
+
+
+@pytest.mark.tree
+def test_sync_insert_update_delete(database: str, records: list[dict]):
+    records = [dict(r) for r in records if r["id"] not in [f"n{i}" for i in range(191, 200)]]
+    records[5]["name"] = "renamed"
+    records.append({"id": "new", "parent": "n42", "name": "new node", "alias": ["fresh"], "meta": {}, "weight": 1})
+
+    builder = TreeBuilder("sync", database, data=records)
+    assert builder.sync_tree() == {"deleted": 9, "updated": 1, "inserted": 1}
+    builder.con.close()
+
+    tree = Tree("sync", database)
+    nodes = snapshot(tree)
+    assert len(nodes) == 192
+    assert nodes["n5"]["name"] == "renamed"
+    assert nodes["new"] == {"id": "new", "parent": "n42", "children": [], "name": "new node", "depth": 3, "is_root": 0, "is_leaf": 1}
+    assert "new" in nodes["n42"]["children"] and nodes["n42"]["is_leaf"] == 0
+    # n19 lost every child.
+    assert nodes["n19"]["children"] == [] and nodes["n19"]["is_leaf"] == 1
+    # index tables follow through the triggers.
+    assert [n["id"] for n in tree.nodes_where([[("alias", "=", "fresh")]], ["id"])] == ["new"]
+
+@pytest.mark.tree
+def test_sync_unchanged(database: str, records: list[dict]):
+    tree = Tree("sync", database)
+    before = snapshot(tree)
+    builder = TreeBuilder("sync", database, data=records)
+    assert builder.sync_tree() == {"deleted": 0, "updated": 0, "inserted": 0}
+    assert snapshot(tree) == before
+
+@pytest.mark.tree
+def test_sync_move(database: str, records: list[dict]):
+    records = [dict(r) for r in records]
+    # n11 (depth 2, children n111..n120) moves under the leaf n150 (depth 3).
+    records[11]["parent"] = "n150"
+    tree = TreeBuilder.build_tree("sync", database, data=records, sync=True)
+    nodes = snapshot(tree)
+
+    assert nodes["n11"]["parent"] == "n150" and nodes["n11"]["depth"] == 4
+    assert all([nodes[f"n{i}"]["depth"] == 5 for i in range(111, 121)])
+    assert nodes["n150"]["children"] == ["n11"] and nodes["n150"]["is_leaf"] == 0
+    assert "n11" not in nodes["n1"]["children"]
+    assert sorted(nodes["n1"]["children"]) == sorted([f"n{i}" for i in range(12, 21)])
+    assert [n["id"] for n in tree.ancestors_nodes("n111", ["id"])] == ["n11", "n150", "n14", "n1", "n0"]
+    assert tree.tree_depth == 5
+
+@pytest.mark.tree
+def test_sync_invalid_data(database: str, records: list[dict]):
+    tree = Tree("sync", database)
+    before = snapshot(tree)
+
+    orphan = records + [{"id": "lost", "parent": "unknown", "name": "lost", "alias": [], "meta": {}, "weight": 1}]
+    with pytest.raises(ValueError, match="unknown"):
+        TreeBuilder.build_tree("sync", database, data=orphan, sync=True)
+
+    cycle = [dict(r) for r in records]
+    cycle[1]["parent"] = "n11"
+    with pytest.raises(ValueError, match="cycle"):
+        TreeBuilder.build_tree("sync", database, data=cycle, sync=True)
+
+    duplicated = records + [dict(records[3])]
+    with pytest.raises(ValueError, match="duplicated"):
+        TreeBuilder.build_tree("sync", database, data=duplicated, sync=True)
+
+    # fields missing from the tree are not silently dropped, sampled or not.
+    extended = [dict(r) for r in records]
+    extended[150]["color"] = "blue"
+    with pytest.raises(ValueError, match="color"):
+        TreeBuilder.build_tree("sync", database, data=extended, sync=True)
+    with pytest.raises(ValueError, match="color"):
+        TreeBuilder.build_tree("sync", database, data=extended, sample=10, sync=True)
+    assert snapshot(tree) == before
+
+@pytest.mark.tree
+def test_sync_rollback(database: str, records: list[dict]):
+    tree = Tree("sync", database)
+    tree.create_index("name", unique=True)
+    before = snapshot(tree)
+
+    # the deletes and the insert come before the failing update, they are rolled back along with it.
+    records = [dict(r) for r in records if r["id"] != "n199"]
+    name, records[6]["name"] = records[6]["name"], records[7]["name"]
+    records.append({"id": "new", "parent": "n42", "name": "new node", "alias": [], "meta": {}, "weight": 1})
+    with pytest.raises(sqlite3.IntegrityError):
+        TreeBuilder.build_tree("sync", database, data=records, sync=True)
+    assert snapshot(tree) == before
+
+    # staging tables do not outlive a failed sync.
+    records[6]["name"] = name
+    tree = TreeBuilder.build_tree("sync", database, data=records, sync=True)
+    assert "n199" not in snapshot(tree) and "new" in snapshot(tree)
+
+@pytest.mark.tree
+def test_sync_reorder(database: str, records: list[dict]):
+    # n1 children n11..n20 are given in the reverse order.
+    records = records[:11] + records[11:21][::-1] + records[21:]
+    tree = TreeBuilder.build_tree("sync", database, data=records, sync=True)
+    expected = [f"n{i}" for i in range(20, 10, -1)]
+    assert tree.node("n1", ["children"])["children"] == expected
+    assert [n["id"] for n in tree.children_nodes("n1", ["id"])] == expected
+    assert [n["position"] for n in tree.children_nodes("n1", ["position"])] == list(range(10))
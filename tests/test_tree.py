@@ -4,13 +4,19 @@ import tests.data as data
 from weetags.tree import Tree
 from weetags.tree_builder import TreeBuilder
 
+# every test runs against both layouts: metadata in its own table, or inline within the nodes table.
+DATABASES = {False: "volume/db.db", True: "volume/db_inline.db"}
+
 @pytest.mark.tree
-def test_tree_builder_1():
-    tree = TreeBuilder.build_tree("topics", "volume/db.db", ["tags/topics.jl"], indexes=["alias"], replace=True)
+@pytest.mark.parametrize("inline_metadata", [False, True])
+def test_tree_builder_1(inline_metadata: bool):
+    database = DATABASES[inline_metadata]
+    tree = TreeBuilder.build_tree("topics", database, ["tags/topics.jl"], indexes=["alias"], replace=True, inline_metadata=inline_metadata)
+    assert tree.inlines_metadata == inline_metadata
 
-@pytest.fixture
-def tree() -> Tree:
-    return Tree("topics", "volume/db.db", timeout=1)
+@pytest.fixture(params=[False, True], ids=["metadata", "inline"])
+def tree(request) -> Tree:
+    return Tree("topics", DATABASES[request.param], timeout=1)
 
 
 @pytest.mark.tree
@@ -81,11 +87,11 @@ def test_nodes_children(tree: Tree):
     assert nodes == []
 
     nodes = tree.children_nodes("Social services")
-    assert nodes == [data.CHILDCARE, data.SSHOTLINES, data.INTEGRATION]
+    assert nodes == [data.CHILDCARE, data.INTEGRATION, data.SSHOTLINES]
 
     fields = ["id", "parent", "children",  "depth", "is_root", "is_leaf"]
     nodes = tree.children_nodes("Social services", fields=fields)
-    assert nodes == [{k:v for k,v in d.items() if k in fields} for d in [data.CHILDCARE, data.SSHOTLINES, data.INTEGRATION]]
+    assert nodes == [{k:v for k,v in d.items() if k in fields} for d in [data.CHILDCARE, data.INTEGRATION, data.SSHOTLINES]]
 
 @pytest.mark.tree
 def test_nodes_ancestors(tree: Tree):
@@ -107,11 +113,11 @@ def test_nodes_descendants(tree: Tree):
     assert nodes == []
 
     nodes = tree.descendants_nodes("Social services")
-    assert nodes == [data.SSHOTLINES, data.INTEGRATION, data.CHILDCARE]
+    assert nodes == [data.CHILDCARE, data.INTEGRATION, data.SSHOTLINES]
 
     fields = ["id", "parent", "children",  "depth", "is_root", "is_leaf"]
     nodes = tree.descendants_nodes("Social services", fields=fields)
-    assert nodes == [{k:v for k,v in d.items() if k in fields} for d in [data.SSHOTLINES, data.INTEGRATION, data.CHILDCARE]]
+    assert nodes == [{k:v for k,v in d.items() if k in fields} for d in [data.CHILDCARE, data.INTEGRATION, data.SSHOTLINES]]
 
 @pytest.mark.tree
 def test_nodes_siblings(tree: Tree):
@@ -123,11 +129,11 @@ def test_nodes_siblings(tree: Tree):
     assert nodes == []
 
     nodes = tree.siblings_nodes("Childcare")
-    assert nodes == [data.SSHOTLINES, data.INTEGRATION]
+    assert nodes == [data.INTEGRATION, data.SSHOTLINES]
 
     fields = ["id", "parent", "children",  "depth", "is_root", "is_leaf"]
     nodes = tree.siblings_nodes("Childcare", fields=fields)
-    assert nodes == [{k:v for k,v in d.items() if k in fields} for d in [data.SSHOTLINES, data.INTEGRATION]]
+    assert nodes == [{k:v for k,v in d.items() if k in fields} for d in [data.INTEGRATION, data.SSHOTLINES]]
 
 @pytest.mark.tree
 def test_nodes_relation_where(tree: Tree):
@@ -0,0 +1,75 @@
+import pytest
+import sqlite3
+from random import Random
+from weetags.bench import generate
+from weetags.tree_builder import TreeBuilder
+
+
+def tree_tables(database: str) -> list[str]:
+    con = sqlite3.connect(database)
+    tables = con.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'unordered__*'").fetchall()
+    con.close()
+    return [t[0] for t in tables]
+
+@pytest.fixture
+def records() -> list[dict]:
+    return list(generate("skewed", 500, seed=2))
+
+@pytest.fixture
+def database(tmp_path) -> str:
+    return str(tmp_path / "unordered.db")
+
+
+@pytest.mark.tree
+def test_unordered_load(database: str, records: list[dict]):
+    shuffled = list(records)
+    Random(3).shuffle(shuffled)
+    tree = TreeBuilder.build_tree("unordered", database, data=shuffled, indexes=["alias"], ordered=False)
+    expected = TreeBuilder.build_tree("expected", database, data=records, indexes=["alias"])
+
+    fields = ["id", "parent", "name", "alias", "depth", "is_root", "is_leaf"]
+    assert tree.nodes_where(fields=fields, order_by=["id"]) == expected.nodes_where(fields=fields, order_by=["id"])
+    assert tree.root_id == "n0" and tree.tree_depth == expected.tree_depth
+
+    # children keep the order in which they were given.
+    position = {r["id"]: i for i, r in enumerate(shuffled)}
+    for node in tree.nodes_where(fields=["id", "children"]):
+        assert node["children"] == sorted(node["children"], key=position.get)
+        assert node["children"] == [n["id"] for n in tree.children_nodes(node["id"], ["id"])]
+    assert [n["id"] for n in tree.nodes_where([[("alias", "=", "doctor")]], ["id"], order_by=["id"])] == \
+        [n["id"] for n in expected.nodes_where([[("alias", "=", "doctor")]], ["id"], order_by=["id"])]
+
+@pytest.mark.tree
+def test_unordered_duplicated_ids(database: str, records: list[dict]):
+    with pytest.raises(ValueError, match="`n7` is duplicated"):
+        TreeBuilder.build_tree("unordered", database, data=records + [dict(records[7])], ordered=False)
+    assert tree_tables(database) == []
+
+@pytest.mark.tree
+def test_unordered_orphans(database: str, records: list[dict]):
+    orphan = {"id": "lost", "parent": "unknown", "name": "lost", "alias": [], "meta": {}, "weight": 1}
+    with pytest.raises(ValueError, match="`lost` parent `unknown` is unknown"):
+        TreeBuilder.build_tree("unordered", database, data=records + [orphan], ordered=False)
+    assert tree_tables(database) == []
+
+@pytest.mark.tree
+def test_unordered_cycles(database: str, records: list[dict]):
+    cycle = [dict(r) for r in records] + [
+        {"id": "a", "parent": "b", "name": "a", "alias": [], "meta": {}, "weight": 1},
+        {"id": "b", "parent": "a", "name": "b", "alias": [], "meta": {}, "weight": 1}
+    ]
+    with pytest.raises(ValueError, match="part of a cycle"):
+        TreeBuilder.build_tree("unordered", database, data=cycle, ordered=False)
+    assert tree_tables(database) == []
+
+@pytest.mark.tree
+def test_unordered_roots(database: str, records: list[dict]):
+    root = {"id": "root2", "parent": None, "name": "root", "alias": [], "meta": {}, "weight": 1}
+    with pytest.raises(ValueError, match="found several"):
+        TreeBuilder.build_tree("unordered", database, data=records + [root], ordered=False)
+
+    rootless = [dict(r) for r in records]
+    rootless[0]["parent"] = "n1"
+    with pytest.raises(ValueError, match="found none"):
+        TreeBuilder.build_tree("unordered", database, data=rootless, ordered=False)
+    assert tree_tables(database) == []
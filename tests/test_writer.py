@@ -0,0 +1,139 @@
+import pytest
+import sqlite3
+from functools import partial
+from threading import Thread, Barrier, Event
+from weetags.bench import generate
+from weetags.tree import Tree
+from weetags.tree_builder import TreeBuilder
+from weetags.engine.writer import TreeWriter
+
+
+class RecordingWriter(TreeWriter):
+    """keep the size of every committed group."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.groups = []
+        super().__init__(*args, **kwargs)
+
+    def _commit_group(self, engine, group) -> None:
+        self.groups.append(len(group))
+        super()._commit_group(engine, group)
+
+@pytest.fixture
+def database(tmp_path) -> str:
+    database = str(tmp_path / "writer.db")
+    TreeBuilder.build_tree("writer", database, data=list(generate("balanced", 100, seed=4)))
+    return database
+
+
+@pytest.mark.tree
+def test_writer_producers(database: str):
+    tree = Tree("writer", database)
+    writer = RecordingWriter(partial(Tree, "writer", database), max_delay=0.2, max_batch=1000)
+    producers, per_producer = 8, 10
+    barrier = Barrier(producers)
+    futures = [[] for _ in range(producers)]
+
+    def produce(i: int) -> None:
+        barrier.wait()
+        for j in range(per_producer):
+            nid = f"n{i * per_producer + j}"
+            futures[i].append(writer.submit("update_node", (), {"nid": nid, "set_values": [("weight", -i)]}))
+
+    threads = [Thread(target=produce, args=(i,)) for i in range(producers)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert [f.result(timeout=5) for fs in futures for f in fs] == [None] * producers * per_producer
+    writer.close()
+
+    # requests are coalesced into groups, each committed within one transaction.
+    assert sum(writer.groups) == producers * per_producer
+    assert len(writer.groups) < producers * per_producer
+    for i in range(producers):
+        weights = tree.nodes_where([[("id", "IN", [f"n{i * per_producer + j}" for j in range(per_producer)])]], ["weight"])
+        assert [n["weight"] for n in weights] == [-i] * per_producer
+
+@pytest.mark.tree
+def test_writer_failing_request(database: str):
+    tree = Tree("writer", database)
+    writer = RecordingWriter(partial(Tree, "writer", database), max_delay=0.2, max_batch=1000)
+    before = tree.node("n2", ["children"])["children"]
+
+    ok1 = writer.submit("update_node", (), {"nid": "n1", "set_values": [("name", "first")]})
+    # n15 already exists: the parent children update runs, then the insert fails.
+    failing = writer.submit("add_node", (), {"nid": "n15", "parent": "n2", "node_values": {"name": "dup", "alias": [], "meta": {}, "weight": 1}})
+    ok2 = writer.submit("add_node", (), {"nid": "new", "parent": "n3", "node_values": {"name": "new", "alias": [], "meta": {}, "weight": 1}})
+    writer.close()
+
+    assert writer.groups == [3]
+    assert ok1.result() is None and ok2.result() is None
+    with pytest.raises(sqlite3.IntegrityError):
+        failing.result()
+    # the failing request is rolled back to its savepoint, the others are committed.
+    assert tree.node("n1", ["name"])["name"] == "first"
+    assert tree.node("new", ["id", "parent", "depth"]) == {"id": "new", "parent": "n3", "depth": 2}
+    assert tree.node("n2", ["children"])["children"] == before
+
+@pytest.mark.tree
+def test_writer_close_drains_queue(database: str):
+    tree = Tree("writer", database)
+    writer = RecordingWriter(partial(Tree, "writer", database), max_delay=5, max_batch=16)
+    futures = [writer.submit("update_node", (), {"nid": f"n{i}", "set_values": [("weight", 0)]}) for i in range(50)]
+    writer.close()
+
+    assert all([f.done() and f.exception() is None for f in futures])
+    assert sum(writer.groups) == 50 and max(writer.groups) <= 16
+    assert [n["weight"] for n in tree.nodes_where([[("id", "IN", [f"n{i}" for i in range(50)])]], ["weight"])] == [0] * 50
+    with pytest.raises(RuntimeError):
+        writer.submit("update_node", (), {"nid": "n1", "set_values": [("weight", 1)]})
+
+@pytest.mark.tree
+def test_tree_writer(database: str):
+    tree = Tree("writer", database)
+    tree.start_writer(max_delay=0.05)
+    future = tree.update_node(nid="n5", set_values=[("name", "queued")])
+    assert future.result(timeout=5) is None
+    tree.stop_writer()
+    assert tree.node("n5", ["name"])["name"] == "queued"
+    assert tree.update_node(nid="n5", set_values=[("name", "direct")]) is None
+
+@pytest.mark.tree
+def test_tree_writer_explain(database: str):
+    tree = Tree("writer", database)
+    tree.start_writer(max_delay=0.01)
+    done = Event()
+    futures = []
+
+    def produce() -> None:
+        i = 0
+        while not done.is_set():
+            futures.append(tree.update_node(nid=f"n{i % 50}", set_values=[("weight", -1)]))
+            i += 1
+            done.wait(0.001)
+
+    thread = Thread(target=produce)
+    thread.start()
+    try:
+        for _ in range(20):
+            explained = tree.explain("delete_node", nid="n5")
+            assert any(s["sql"].lstrip().startswith("DELETE") for s in explained)
+    finally:
+        done.set()
+        thread.join()
+    # other threads keep queuing their mutations to the writer while a mutation is explained.
+    assert futures and all([f.result(timeout=5) is None for f in futures])
+    tree.stop_writer()
+    assert tree.node("n5", ["id"]) == {"id": "n5"}
+    assert {n["weight"] for n in tree.nodes_where([[("id", "IN", [f"n{i}" for i in range(min(len(futures), 50))])]], ["weight"])} == {-1}
+
+@pytest.mark.tree
+def test_tree_writer_schema_changes(database: str):
+    tree = Tree("writer", database)
+    tree.start_writer(max_delay=0.01)
+    assert tree.delete_dead_branches().result(timeout=5) is None
+    with pytest.raises(ValueError, match="Stop the writer"):
+        tree.create_index(["weight"])
+    with pytest.raises(ValueError, match="Stop the writer"):
+        tree.track_changes()
+    tree.stop_writer()
+    assert tree.create_index(["weight"]) in tree.indexes
@@ -0,0 +1,217 @@
+"""
+Benchmark suite running over deterministic synthetic trees.
+
+    python -m weetags.bench --shapes balanced skewed --sizes 10000 100000 --output report.json
+    python -m weetags.bench --sizes 10000 --output new.json --compare report.json
+"""
+from __future__ import annotations
+
+import sys
+import json
+import sqlite3
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+from random import Random
+from time import perf_counter
+from statistics import median, quantiles
+
+from typing import Any, Callable, Iterator, Literal
+
+from weetags.tree_builder import TreeBuilder
+
+Shape = Literal["wide", "deep", "balanced", "skewed"]
+Payload = dict[str, Any]
+
+SHAPES = ("wide", "deep", "balanced", "skewed")
+SIZES = (10_000, 100_000, 1_000_000)
+LANGS = ("en", "fr", "uk", "pl", "de")
+WORDS = (
+    "health", "housing", "legal", "education", "transport", "employment", "pets", "finance",
+    "support", "hotline", "doctor", "childcare", "integration", "protection", "emigration", "aid"
+)
+RELATIONS = ("parent_node", "children_nodes", "siblings_nodes", "ancestors_nodes", "descendants_nodes", "level_nodes")
+
+
+def parent_index(shape: Shape, i: int, rng: Random) -> int:
+    """index of the parent of the `i`th node. Parents always come before their children."""
+    if shape == "wide":
+        return (i - 1) // 1000
+    elif shape == "deep":
+        # 4 chains hanging from the root.
+        return max(0, i - 4)
+    elif shape == "balanced":
+        return (i - 1) // 10
+    elif shape == "skewed":
+        # early nodes get most children, late nodes form long thin branches.
+        return int((i - 1) * rng.random() ** 3)
+    raise ValueError(f"unknown tree shape: {shape}. possible shapes: [{', '.join(SHAPES)}]")
+
+
+def generate(shape: Shape, size: int, seed: int = 0) -> Iterator[Payload]:
+    """yield `size` nodes of a tree of the given shape, ordered from root to leaves. The same seed yields the same tree."""
+    if size < 1:
+        raise ValueError("a tree must have at least one node")
+    rng = Random(seed)
+    for i in range(size):
+        yield {
+            "id": f"n{i}",
+            "parent": None if i == 0 else f"n{parent_index(shape, i, rng)}",
+            "name": f"{rng.choice(WORDS)} {i}",
+            "alias": rng.sample(WORDS, rng.randint(0, 3)),
+            "meta": {"lang": rng.choice(LANGS), "rank": rng.randint(0, 100)},
+            "weight": rng.randint(0, 1000)
+        }
+
+
+def write_dataset(path: Path, shape: Shape, size: int, seed: int = 0) -> Path:
+    with open(path, "w") as f:
+        for node in generate(shape, size, seed):
+            f.write(f"{json.dumps(node)}\n")
+    return path
+
+
+def timings(samples: list[float]) -> dict[str, Any]:
+    """latencies summary, in seconds."""
+    total = sum(samples)
+    p95 = quantiles(samples, n=20)[-1] if len(samples) > 1 else samples[0]
+    return {
+        "count": len(samples),
+        "total": total,
+        "mean": total / len(samples),
+        "p50": median(samples),
+        "p95": p95,
+        "max": max(samples)
+    }
+
+
+def measure(operation: Callable[[Any], Any], args: list[Any]) -> dict[str, Any]:
+    samples = []
+    for arg in args:
+        start = perf_counter()
+        operation(arg)
+        samples.append(perf_counter() - start)
+    return timings(samples)
+
+
+def bench_tree(
+    shape: Shape,
+    size: int,
+    workdir: Path,
+    repeat: int = 100,
+    seed: int = 0,
+    operations: list[str] | None = None
+) -> dict[str, Any]:
+    """build a synthetic tree and time every operation of the tree over `repeat` random nodes."""
+    rng = Random(seed)
+    name = f"bench_{shape}"
+    dataset = write_dataset(workdir / f"{shape}_{size}.jl", shape, size, seed)
+    database = str(workdir / f"{shape}_{size}.db")
+
+    start = perf_counter()
+    tree = TreeBuilder.build_tree(name, database=database, data=[dataset], indexes=["alias", "meta.rank"], replace=True)
+    results = {"build": timings([perf_counter() - start])}
+
+    nids = [f"n{rng.randrange(size)}" for _ in range(repeat)]
+    names = [f"{rng.choice(WORDS)} {rng.randrange(size)}" for _ in range(repeat)]
+    words = [rng.choice(WORDS) for _ in range(repeat)]
+    ranks = [rng.randint(0, 100) for _ in range(repeat)]
+    leaves = [n["id"] for n in tree.nodes_where([[("is_leaf", "=", True)]], ["id"], limit=repeat)]
+    benchmarks: dict[str, tuple[Callable[[Any], Any], list[Any]]] = {
+        "node": (lambda nid: tree.node(nid), nids),
+        "parent_node": (lambda nid: tree.parent_node(nid), nids),
+        "children_nodes": (lambda nid: tree.children_nodes(nid), nids),
+        "siblings_nodes": (lambda nid: tree.siblings_nodes(nid), nids),
+        "ancestors_nodes": (lambda nid: tree.ancestors_nodes(nid), nids),
+        "descendants_nodes": (lambda nid: tree.descendants_nodes(nid), nids),
+        "level_nodes": (lambda nid: tree.level_nodes(nid, 2), nids),
+        "nodes_where": (lambda name: tree.nodes_where([[("name", "=", name)]]), names),
+        "nodes_where_list": (lambda word: tree.nodes_where([[("alias", "=", word)]], limit=10), words),
+        "nodes_where_path": (lambda rank: tree.nodes_where([[("meta.rank", "=", rank)]], limit=10), ranks),
+        "update_node": (lambda nid: tree.update_node(nid=nid, set_values=[("weight", -1)]), nids),
+        "delete_node": (lambda nid: tree.delete_node(nid), leaves),
+        "export": (lambda path: tree.export(path), [workdir / f"{shape}_{size}.export.jl"]),
+    }
+    for operation, (callback, args) in benchmarks.items():
+        if operations is not None and operation not in operations:
+            continue
+        results[operation] = measure(callback, args)
+    tree.con.close()
+    return results
+
+
+def run(
+    shapes: list[Shape] | None = None,
+    sizes: list[int] | None = None,
+    repeat: int = 100,
+    seed: int = 0,
+    operations: list[str] | None = None,
+    workdir: str | Path | None = None
+) -> dict[str, Any]:
+    """run the benchmarks over every shape and size, and return the report."""
+    report = {
+        "version": (Path(__file__).parent / "VERSION").read_text().strip(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "seed": seed,
+        "repeat": repeat,
+        "results": {}
+    }
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for shape in shapes or SHAPES:
+            for size in sizes or SIZES:
+                results = bench_tree(shape, size, Path(tmp), repeat, seed, operations)
+                report["results"][f"{shape}/{size}"] = results
+    return report
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], metric: str = "mean") -> dict[str, dict[str, float]]:
+    """ratio current / baseline of each operation `metric`. Below 1 is faster."""
+    ratios = {}
+    for tree, operations in current["results"].items():
+        base = baseline["results"].get(tree, None)
+        if base is None:
+            continue
+        ratios[tree] = {
+            operation: stats[metric] / base[operation][metric]
+            for operation, stats in operations.items()
+            if operation in base and base[operation][metric] > 0
+        }
+    return ratios
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="weetags.bench", description="benchmark weetags over synthetic trees.")
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=list(SHAPES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--operations", nargs="+", default=None)
+    parser.add_argument("--workdir", default=None, help="directory holding the temporary datasets and databases.")
+    parser.add_argument("--output", default=None, help="write the json report into this file.")
+    parser.add_argument("--compare", default=None, help="json report to compare the results with.")
+    args = parser.parse_args(argv)
+
+    report = run(args.shapes, args.sizes, args.repeat, args.seed, args.operations, args.workdir)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for tree, operations in report["results"].items():
+        print(tree)
+        for operation, stats in operations.items():
+            print(f"  {operation:<20} mean {stats['mean'] * 1000:>10.3f}ms  p95 {stats['p95'] * 1000:>10.3f}ms")
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"compared with {args.compare} (version {baseline['version']}), current / baseline mean:")
+        for tree, ratios in compare(baseline, report).items():
+            print(tree)
+            for operation, ratio in ratios.items():
+                print(f"  {operation:<20} x{ratio:.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
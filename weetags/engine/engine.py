@@ -1,22 +1,54 @@
 from __future__ import annotations
 
+import re
 import json
 import sqlite3
+from time import monotonic
+from contextlib import contextmanager
 from sqlite3 import Cursor, Row
 from sqlite3 import register_adapter, register_converter
-from sqlite3 import PARSE_DECLTYPES
+from sqlite3 import PARSE_DECLTYPES, PARSE_COLNAMES
 
-from typing import Any
+from typing import Any, Iterator
 
 import weetags.engine.sql as sql
 from weetags.engine.sql import _SimpleSqlConverter, SqlConverter, OnConflict
-from weetags.engine.schema import SimpleSqlTable, Namespace
+from weetags.engine.schema import SimpleSqlTable, SimpleSqlField, Namespace, ChangesTable, IndexTable, FtsTable
+from weetags.metrics import Metrics, MetricsSink, timed
+from weetags.exceptions import QueryTimeout, QueryInterrupted
 
 
 Node = dict[str, Any]
 Nodes = list[Node]
 Conditions = list[list[tuple[str, str, Any] | str] | str]
 
+# number of sqlite virtual machine instructions between two deadline checks.
+PROGRESS_STEPS = 1000
+# nodes metadata, either stored in the metadata table or inline within the nodes table.
+METADATA_FIELDS = ["depth", "is_root", "is_leaf"]
+# `FROM table AS alias` and `JOIN table alias` clauses.
+ALIASES = re.compile(r"(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?(\w+)", re.IGNORECASE)
+
+class StatementRecorder:
+    """Stand in for a connection or a cursor, recording every statement along with its parameters."""
+
+    def __init__(self, target: Any, statements: list[tuple[str, Any]]) -> None:
+        self.target = target
+        self.statements = statements
+
+    def execute(self, stmt: str, params: Any = ()) -> Cursor:
+        self.statements.append((stmt, params))
+        return self.target.execute(stmt, params)
+
+    def executemany(self, stmt: str, params: Any) -> Cursor:
+        params = list(params)
+        self.statements.append((stmt, params[0] if params else ()))
+        return self.target.executemany(stmt, params)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.target, name)
+
+
 class TreeEngine:
     tree_name: str
     database: str
@@ -24,21 +56,24 @@ class TreeEngine:
 
     tables: dict[str, Any]
     namespaces: dict[str, Any]
+    defer_commit: bool
+    metrics: Metrics | None
+    deadline: float | None
 
     def __init__(self, tree_name: str, database: str = ":memory:", timeout: float = 5, **params) -> None:
         self.tree_name = tree_name
         self.database = database
         self.params = params
         self.timeout = timeout
-        if database == ":memory":
+        if database == ":memory:":
             self.params.update({"cache":"shared"})
 
-        self.con = sqlite3.connect(self.uri, detect_types=PARSE_DECLTYPES, uri=True, timeout=timeout)
-        self.cursor = self.con.cursor()
-
-        self.con.execute("PRAGMA foreign_keys=ON;")
-        self.con.execute("PRAGMA case_sensitive_like=ON;")
-        self.con.row_factory = self._record_factory
+        self.metrics = None
+        self.deadline = None
+        self._budget = None
+        self._guarded = False
+        self._interrupted = False
+        self._connect(self.uri)
         register_adapter(list, self._serialize)
         register_adapter(dict, self._serialize)
         register_converter("JSON", self._deserialize) # type: ignore
@@ -46,6 +81,7 @@ class TreeEngine:
 
         self.tables = {}
         self.namespaces = {}
+        self.defer_commit = False
 
     @classmethod
     def from_pragma(cls, tree_name: str, database: str = ":memory:", timeout: float = 5, **params) -> TreeEngine:
@@ -53,6 +89,134 @@ class TreeEngine:
         engine._build_tree_context(tree_name)
         return engine
 
+    @contextmanager
+    def _capture(self) -> Iterator[list[tuple[str, Any]]]:
+        """
+        record every statement issued within the context, then roll their effects back.
+        commits are deferred to the capture savepoint.
+        The write lock is taken upfront: a read snapshot cannot be upgraded while another connection commits.
+        """
+        statements: list[tuple[str, Any]] = []
+        con, cursor, defer_commit = self.con, self.cursor, self.defer_commit
+        begun = not con.in_transaction
+        if begun:
+            con.execute("BEGIN IMMEDIATE;")
+        con.execute("SAVEPOINT weetags_capture;")
+        self.con, self.cursor = StatementRecorder(con, statements), StatementRecorder(cursor, statements)
+        self.defer_commit = True
+        try:
+            yield statements
+        finally:
+            self.con, self.cursor, self.defer_commit = con, cursor, defer_commit
+            con.execute("ROLLBACK TO weetags_capture;")
+            con.execute("RELEASE weetags_capture;")
+            if begun:
+                con.rollback()
+
+    @contextmanager
+    def _guard(self, deadline: float | None = None) -> Iterator[None]:
+        """
+        abort the operation once `deadline` seconds elapsed, or once interrupted with `_interrupt`.
+        Only the outermost guard applies, nested operations share its deadline.
+        """
+        if self._guarded:
+            yield
+            return
+
+        self._guarded, self._interrupted = True, False
+        if deadline is not None:
+            self.deadline, self._budget = monotonic() + deadline, deadline
+            self.con.set_progress_handler(self._expired, PROGRESS_STEPS)
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            # both the progress handler and `interrupt` abort with this message, anything else is a genuine error.
+            if str(e) != "interrupted":
+                raise
+            elif self._interrupted:
+                raise QueryInterrupted() from e
+            elif self._expired():
+                raise QueryTimeout(deadline) from e # type: ignore
+            raise
+        finally:
+            self._guarded, self.deadline, self._budget = False, None, None
+            if deadline is not None:
+                self.con.set_progress_handler(None, 0)
+
+    def _expired(self) -> bool:
+        return self._interrupted or (self.deadline is not None and monotonic() >= self.deadline)
+
+    def _check_deadline(self) -> None:
+        """raise when the current operation is interrupted or past its deadline. Called by python side traversals."""
+        if self._interrupted:
+            raise QueryInterrupted()
+        elif self.deadline is not None and monotonic() >= self.deadline:
+            raise QueryTimeout(self._budget) # type: ignore
+
+    def _interrupt(self) -> None:
+        self._interrupted = True
+        self.con.interrupt()
+
+    def _explain(self, stmt: str, params: Any = ()) -> list[dict[str, Any]]:
+        query = sql.EXPLAIN.format(stmt=stmt.strip().rstrip(";"))
+        return self.con.execute(query, params).fetchall()
+
+    def _plan_warnings(self, plan: list[dict[str, Any]], stmt: str) -> list[str]:
+        """
+        flag the query plan steps that walk a whole tree table, or build a temporary structure.
+        Plans name aliased tables by their alias, aliases are resolved from the `FROM` and `JOIN` clauses of `stmt`.
+        """
+        tables = {table._name for table in self.tables.values()}
+        aliases = {alias: table for table, alias in ALIASES.findall(stmt) if table in tables}
+        warnings = []
+        for step in plan:
+            detail = step["detail"]
+            # recursive queries scan their own working queue, only the tree tables are reported.
+            scanned = detail.removeprefix("SCAN ").removeprefix("TABLE ").split(" ")[0]
+            scanned = aliases.get(scanned, scanned)
+            if detail.startswith("SCAN ") and scanned in tables and "VIRTUAL TABLE" not in detail:
+                warnings.append(f"full scan: {detail}")
+            elif "TEMP B-TREE" in detail:
+                warnings.append(f"temporary b-tree: {detail}")
+            elif "AUTOMATIC" in detail:
+                warnings.append(f"automatic index: {detail}")
+        return warnings
+
+    def _connect(self, uri: str) -> None:
+        self.con = sqlite3.connect(uri, detect_types=PARSE_DECLTYPES | PARSE_COLNAMES, uri=True, timeout=self.timeout)
+        # the cursor is created before the row factory, it returns plain tuples.
+        self.cursor = self.con.cursor()
+
+        self.con.execute("PRAGMA foreign_keys=ON;")
+        self.con.execute("PRAGMA case_sensitive_like=ON;")
+        self.con.row_factory = self._record_factory
+        if self.metrics is not None:
+            self.con.set_trace_callback(self.metrics.trace)
+
+    def _enable_metrics(self, sink: MetricsSink | None = None) -> Metrics:
+        self.metrics = Metrics(sink)
+        self.con.set_trace_callback(self.metrics.trace)
+        return self.metrics
+
+    def _disable_metrics(self) -> None:
+        self.metrics = None
+        self.con.set_trace_callback(None)
+
+    def _load_into_memory(self) -> None:
+        """copy the database into a private in memory database, and serve every operation from it."""
+        source = self.con
+        self._connect("file::memory:")
+        source.backup(self.con)
+        source.close()
+
+    def _backup(self, path: str) -> None:
+        """write a consistent snapshot of the database into `path`."""
+        target = sqlite3.connect(path)
+        try:
+            self.con.backup(target)
+        finally:
+            target.close()
+
     @property
     def uri(self) -> str:
         options = ""
@@ -60,14 +224,19 @@ class TreeEngine:
             options = "?" + "&".join([f"{k}={v}" for k,v in self.params.items()])
         return f"file:{self.database}{options}"
 
+    def _commit(self) -> None:
+        """commit the current transaction, unless commits are deferred to a caller owning the transaction."""
+        if not self.defer_commit:
+            self.con.commit()
+
     def _execute(self, query: str) -> None:
         self.cursor.execute(query)
-        self.con.commit()
+        self._commit()
 
     def _execute_many(self, *queries: str) -> None:
         for query in queries:
             self.cursor.execute(query)
-        self.con.commit()
+        self._commit()
 
     def _create_tables(self, *tables: SimpleSqlTable) -> None:
         queries = [table.create_table() for table in tables]
@@ -76,15 +245,147 @@ class TreeEngine:
     def _create_index(self, table: SimpleSqlTable, field_name: str) -> None:
         self._execute(table.create_index(field_name))
 
-    def _create_json_extract_column(self, table: SimpleSqlTable, target_field: str, path: str) -> None:
-        self._execute(table.create_json_extract_column(target_field, path))
+    def _create_parent_index(self) -> None:
+        """index the nodes by parent, in children order. Relations and children arrays are read from it."""
+        nodes_table = self.tables["nodes"]
+        fields = "parent, position" if self.stores_positions else "parent"
+        self._execute(sql.CREATE_PARENT_INDEX.format(table_name=nodes_table._name, fields=fields))
+
+    def _create_field_index(self, fname: str, kind: str | None = None) -> str:
+        """
+        index a single nodes field, according to its type. Index tables are populated from the existing nodes,
+        and kept in sync by triggers. Return the name of the index, or of the index table.
+        """
+        nodes_table = self.tables["nodes"]
+        field = self._check_field_index(fname, kind)
+
+        if kind == "fts":
+            fts_table = FtsTable.initialize(self.tree_name, fname, field.dtype)
+            self.tables[f"fts_{fname}"] = fts_table
+            self._create_tables(fts_table)
+            self._populate_index(fts_table, fname)
+            self._create_triggers(fts_table, fname)
+            return fts_table._name
+
+        elif field.dtype == "JSON":
+            # dict paths are extracted by a virtual column, indexed like any other field.
+            target, _, path = fname.partition(".")
+            column = self._create_json_extract_column(nodes_table, target, path)
+            return f"idx_{nodes_table._name}_{column}"
+
+        elif field.dtype == "JSONLIST":
+            index_table = IndexTable.initialize(self.tree_name, fname, "TEXT")
+            self.tables[fname] = index_table
+            self._create_tables(index_table)
+            self._populate_index(index_table, fname)
+            self._create_index(index_table, fname)
+            self._create_triggers(index_table, fname)
+            return index_table._name
+        else:
+            self._create_index(nodes_table, fname)
+            return f"idx_{nodes_table._name}_{fname}"
+
+    def _check_field_index(self, fname: str, kind: str | None = None) -> SimpleSqlField:
+        """check a single field index can be built, without touching the database. Return the indexed nodes field."""
+        field = getattr(self.tables["nodes"], fname.split(".")[0], None)
+        if field is None:
+            raise ValueError(f"Building Index: field {fname} does not exist")
+
+        if kind == "fts":
+            if field.dtype not in ["TEXT", "JSONLIST"]:
+                raise ValueError(f"Full text index can only be built over TEXT or JSONLIST fields. `{fname}` is {field.dtype}")
+        elif kind is not None:
+            raise ValueError(f"Building Index: unknown index kind `{kind}`")
+        elif field.dtype == "JSON":
+            target, _, path = fname.partition(".")
+            if not path or not path.replace(".", "_").isidentifier():
+                raise ValueError(f"Building Index: JSON field {fname} must be indexed through a path of keys, such as `{target}.key`")
+        return field
+
+    def _create_composite_index(
+        self,
+        fields: list[str],
+        conditions: Conditions | None = None,
+        unique: bool = False,
+        name: str | None = None
+    ) -> str:
+        converter = SqlConverter(
+            namespaces=self.namespaces,
+            tables=self.tables,
+            fields=fields,
+            conds=conditions
+        )
+        name, stmt = converter.create_index(name, unique)
+        self._execute(stmt)
+        return name
+
+    def _drop_index(self, name: str) -> None:
+        """drop an index, or an index table along with the triggers maintaining it."""
+        tables = [t[0] for t in self._get_tables(self.tree_name)]
+        if name not in tables:
+            self._execute(sql.DROP_INDEX.format(index_name=name))
+            return
+
+        triggers = self.cursor.execute(sql.TRIGGER_NAMES.format(table_name=name)).fetchall()
+        self._execute_many(
+            *[sql.DROP_TRIGGER.format(trigger_name=t[0]) for t in triggers],
+            sql.DROP.format(table_name=name)
+        )
+
+    def _get_indexes(self, tree_name: str) -> list[tuple]:
+        query = sql.INDEX_NAMES.format(tree_name=tree_name)
+        return self.cursor.execute(query).fetchall()
+
+    def _create_json_extract_column(self, table: SimpleSqlTable, target_field: str, path: str) -> str:
+        """add a virtual column extracting `path` from a JSON field, and index it. Return the column name."""
+        column = f"{target_field}_{path.replace('.', '_')}"
+        self._execute_many(
+            table.create_json_extract_column(target_field, path),
+            table.create_index(column)
+        )
+        return column
 
-    def _create_triggers(self, table: SimpleSqlTable, target_field: str,  path: str | None = None) -> None:
+    def _populate_index(self, table: SimpleSqlTable, target_field: str) -> None:
+        """fill an index table from the nodes already stored, with a single statement."""
         nodes_table = self.tables["nodes"]
-        self._execute(table.create_insert_trigger(target_field, nodes_table._name, path))
-        self._execute(table.create_update_trigger(target_field, nodes_table._name, path))
+        self._execute(table.populate_index(target_field, nodes_table._name))
+
+    def _create_triggers(self, table: SimpleSqlTable, target_field: str) -> None:
+        nodes_table = self.tables["nodes"]
+        self._execute(table.create_insert_trigger(target_field, nodes_table._name))
+        self._execute(table.create_update_trigger(target_field, nodes_table._name))
         self._execute(table.create_delete_trigger(nodes_table._name))
 
+    def _create_changes_log(self) -> None:
+        """create the changes table and the triggers logging every mutation of the nodes and metadata tables."""
+        changes = ChangesTable.initialize(self.tree_name)
+        nodes_table = self.tables["nodes"]
+        nodes_fields = [f.name for _, f in nodes_table.iter_fields]
+        triggers = [
+            changes.create_insert_trigger(nodes_table._name, nodes_fields),
+            changes.create_update_trigger(nodes_table._name, nodes_fields),
+            changes.create_delete_trigger(nodes_table._name)
+        ]
+        if not self.inlines_metadata:
+            metadata_table = self.tables["metadata"]
+            metadata_fields = [f.name for _, f in metadata_table.iter_fields if f.name != "nid"]
+            triggers.append(changes.create_update_trigger(metadata_table._name, metadata_fields, key="nid"))
+        self._create_tables(changes)
+        self._execute_many(*triggers)
+        self.tables["changes"] = changes
+
+    def _changes_since(self, seq: int, limit: int | None = None) -> Cursor:
+        table_name = self.tables["changes"]._name
+        limit_stmt = f"LIMIT {int(limit)}" if limit is not None else ""
+        query = sql.CHANGES_SINCE.format(table_name=table_name, limit=limit_stmt)
+        return self.con.execute(query, [seq])
+
+    def _prune_changes(self, seq: int) -> None:
+        table_name = self.tables["changes"]._name
+        self.con.execute(sql.PRUNE_CHANGES.format(table_name=table_name), [seq])
+        self._commit()
+
+    @timed
     def _write_one(
         self,
         table_name: str,
@@ -104,8 +405,9 @@ class TreeEngine:
         stmt, values = converter.write_one()
         self.con.execute(stmt, values)
         if commit:
-            self.con.commit()
+            self._commit()
 
+    @timed
     def _write_many(
         self,
         table_name: str,
@@ -125,8 +427,9 @@ class TreeEngine:
         stmt, values = converter.write_many()
         self.con.execute(stmt, values)
         if commit:
-            self.con.commit()
+            self._commit()
 
+    @timed
     def _builder_write_many(
         self,
         table_name: str,
@@ -142,8 +445,9 @@ class TreeEngine:
         stmt, values = converter._write_many()
         self.con.executemany(stmt, values)
         if commit:
-            self.con.commit()
+            self._commit()
 
+    @timed
     def _read_one(
         self,
         fields: list[str] | None = None,
@@ -162,6 +466,7 @@ class TreeEngine:
         stmt, values = converter.read_one()
         return self.con.execute(stmt, values).fetchone()
 
+    @timed
     def _read_many(
         self,
         fields: list[str] | None = None,
@@ -182,44 +487,52 @@ class TreeEngine:
         stmt, values = converter.read_many()
         return self.con.execute(stmt, values).fetchall()
 
-    def _update(
+    @timed
+    def _read_relation(
         self,
-        table_name: str,
-        setter: list[tuple[str, Any]],
+        relation: str,
+        nid: str,
+        fields: list[str] | None = None,
         conditions: Conditions | None = None,
-        commit: bool = True
-    ) -> None:
+        order_by: list[str] | None = None,
+        limit: int | None = None,
+        axis: int = 1,
+        min_distance: int | None = None,
+        max_distance: int | None = None
+    ) -> Nodes:
         converter = SqlConverter(
             namespaces=self.namespaces,
             tables=self.tables,
-            table_name=table_name,
+            fields=fields,
             conds=conditions,
-            setter=setter
+            order_by=order_by,
+            axis=axis,
+            limit=limit
         )
-        stmt, values = converter.update()
-        self.con.execute(stmt, values)
-        if commit:
-            self.con.commit()
-
+        stmt, values = converter.read_relation(relation, nid, min_distance, max_distance)
+        return self.con.execute(stmt, values).fetchall()
 
-    def _builder_update(
+    @timed
+    def _update(
         self,
         table_name: str,
         setter: list[tuple[str, Any]],
-        conditions: list[tuple[str, str, Any]] | None = None,
-        commit: bool = True    
-        ) -> None:
-        """primitive update builder. don't use SqlConverter."""
-        converter = _SimpleSqlConverter(
+        conditions: Conditions | None = None,
+        commit: bool = True
+    ) -> None:
+        converter = SqlConverter(
+            namespaces=self.namespaces,
+            tables=self.tables,
             table_name=table_name,
             conds=conditions,
             setter=setter
         )
-        stmt, values = converter._update()
+        stmt, values = converter.update()
         self.con.execute(stmt, values)
         if commit:
-            self.con.commit()
+            self._commit()
 
+    @timed
     def _delete(self, conditions: Conditions | None = None, commit: bool = True) -> None:
         converter = SqlConverter(
             namespaces=self.namespaces,
@@ -229,17 +542,21 @@ class TreeEngine:
         stmt, values = converter.delete()
         self.con.execute(stmt, values)
         if commit:
-            self.con.commit()
+            self._commit()
 
     def _drop(self, table_name: str) -> None:
         query = sql.DROP.format(table_name=table_name)
         self.cursor.execute(query)
-        self.con.commit()
+        self._commit()
 
     def _table_info(self, table_name: str) -> list[tuple]:
         query = sql.INFO.format(table_name=table_name)
         return self.cursor.execute(query).fetchall()
 
+    def _generated_columns(self, table_name: str) -> list[tuple]:
+        query = sql.XINFO.format(table_name=table_name)
+        return [f for f in self.cursor.execute(query).fetchall() if f[6] in (2, 3)]
+
     def _table_fk_info(self, table_name: str) -> list[tuple]:
         query = sql.FK_INFO.format(table_name=table_name)
         return self.cursor.execute(query).fetchall()
@@ -256,15 +573,137 @@ class TreeEngine:
         query = sql.TABLE_NAMES.format(tree_name=tree_name)
         return self.cursor.execute(query).fetchall()
 
-    def _get_children_from_ids(self, nodes_table: str, ids: list[str]) -> list[tuple[str, list[str]]]:
-        converter = _SimpleSqlConverter(table_name=nodes_table, values=ids)
-        query, values = converter._children_from_ids()
-        return self.con.execute(query, values).fetchall()
+    def _get_virtual_tables(self, tree_name: str) -> list[str]:
+        query = sql.VIRTUAL_TABLE_NAMES.format(tree_name=tree_name)
+        return self.cursor.execute(query).fetchall()
+
+    def _set_children(self, nodes_table: str) -> None:
+        """
+        fill every nodes children with a single statement, children being ordered by position.
+        """
+        query = sql.SET_CHILDREN.format(nodes_table=nodes_table, order=self.children_order)
+        self.con.execute(query)
 
-    def _get_children_from_id(self, nodes_table: str, id: str):
-        converter = _SimpleSqlConverter(table_name=nodes_table, values=[id])
-        query, values = converter._children_from_id()
-        return self.con.execute(query, values).fetchone()
+    def _set_leaves(self) -> None:
+        metadata_table, metadata_key = self.metadata_location
+        query = sql.SET_LEAVES.format(nodes_table=self.tables["nodes"]._name, metadata_table=metadata_table, metadata_key=metadata_key)
+        self.con.execute(query)
+
+    def _create_staging(self, staging_table: str) -> None:
+        """create a temporary table, without constraints, receiving the records in the order they come."""
+        nodes_table = self.tables["nodes"]
+        self._execute_many(
+            nodes_table.create_staging(staging_table),
+            sql.CREATE_INDEX.format(table_name=staging_table, field_name="id"),
+            sql.CREATE_INDEX.format(table_name=staging_table, field_name="parent")
+        )
+
+    def _check_staging(self, staging_table: str) -> None:
+        """validate the staged records before computing their topology."""
+        duplicate = self.con.execute(sql.STAGED_DUPLICATE.format(table_name=staging_table)).fetchone()
+        if duplicate is not None:
+            raise ValueError(f"node id `{duplicate['id']}` is duplicated.")
+
+        roots = self.con.execute(sql.STAGED_ROOTS.format(table_name=staging_table)).fetchall()
+        if len(roots) != 1:
+            raise ValueError(f"data must contain a single root node, found {'none' if not roots else 'several'}.")
+
+        orphan = self.con.execute(sql.STAGED_ORPHAN.format(table_name=staging_table)).fetchone()
+        if orphan is not None:
+            raise ValueError(f"node `{orphan['id']}` parent `{orphan['parent']}` is unknown.")
+
+    def _stage_topology(self, staging_table: str) -> str:
+        """
+        compute every staged node depth with a recursive query from the root, into a temporary table.
+        Nodes that cannot be reached from the root are part of a cycle. Return the topology table name.
+        """
+        topology_table = f"{staging_table}_topology"
+        if self.stores_positions:
+            self.con.execute(sql.STAGED_POSITIONS.format(table_name=staging_table))
+        self.con.execute(sql.STAGED_TOPOLOGY.format(table_name=staging_table, topology_table=topology_table))
+        unreachable = self.con.execute(sql.STAGED_UNREACHABLE.format(table_name=staging_table, topology_table=topology_table)).fetchone()
+        if unreachable is not None:
+            raise ValueError(f"node `{unreachable['id']}` is part of a cycle.")
+        return topology_table
+
+    def _load_staging(self, staging_table: str, columns: list[str]) -> str:
+        """fill the nodes and metadata tables from the staged records, ordered from root to leaves. Return the root id."""
+        topology_table = f"{staging_table}_topology"
+        nodes_table = self.tables["nodes"]._name
+        columns, staged_columns = self._staged_columns(columns)
+        try:
+            self._stage_topology(staging_table)
+            self.con.execute(sql.LOAD_STAGED_NODES.format(
+                nodes_table=nodes_table,
+                table_name=staging_table,
+                topology_table=topology_table,
+                columns=", ".join(columns),
+                staged_columns=", ".join(staged_columns)
+            ))
+            if not self.inlines_metadata:
+                metadata_table = self.tables["metadata"]._name
+                self.con.execute(sql.LOAD_STAGED_METADATA.format(metadata_table=metadata_table, topology_table=topology_table))
+            root = self.con.execute(sql.STAGED_ROOTS.format(table_name=staging_table)).fetchone()
+        finally:
+            self.con.execute(sql.DROP.format(table_name=topology_table))
+            self.con.execute(sql.DROP.format(table_name=staging_table))
+        return root["id"]
+
+    def _sync_staging(self, staging_table: str, columns: list[str]) -> dict[str, int]:
+        """
+        apply the difference between the staged records and the stored nodes, within a single transaction.
+        Nodes are compared column by column, so unchanged nodes are neither rewritten nor seen by the triggers.
+        Return the number of deleted, updated and inserted nodes.
+        """
+        topology_table = f"{staging_table}_topology"
+        nodes_table = self.tables["nodes"]._name
+        metadata_table, metadata_key = self.metadata_location
+        fields = [c for c in columns if c not in ["id", "children"]]
+        columns, staged_columns = self._staged_columns(columns)
+        formats = dict(
+            nodes_table=nodes_table,
+            metadata_table=metadata_table,
+            metadata_key=metadata_key,
+            table_name=staging_table,
+            topology_table=topology_table,
+            columns=", ".join(columns),
+            staged_columns=", ".join(staged_columns),
+            fields=", ".join(fields),
+            order=self.children_order,
+            staged_fields=", ".join([f"s.{c}" for c in fields]),
+            changed=" OR ".join([f"{nodes_table}.{c} IS NOT s.{c}" for c in fields])
+        )
+        try:
+            self._stage_topology(staging_table)
+            self.con.commit()
+
+            self.con.execute("BEGIN IMMEDIATE;")
+            try:
+                deleted = self.con.execute(sql.SYNC_DELETE.format(**formats)).rowcount
+                updated = self.con.execute(sql.SYNC_UPDATE.format(**formats)).rowcount
+                inserted = self.con.execute(sql.SYNC_INSERT.format(**formats)).rowcount
+                if not self.inlines_metadata:
+                    self.con.execute(sql.SYNC_METADATA.format(**formats))
+                self.con.execute(sql.SYNC_DEPTHS.format(**formats))
+                if "children" in columns:
+                    self.con.execute(sql.SYNC_CHILDREN.format(**formats))
+                    self.con.execute(sql.SYNC_NO_CHILDREN.format(**formats))
+                self.con.execute(sql.SYNC_LEAVES.format(**formats))
+                self.con.commit()
+            except Exception:
+                self.con.rollback()
+                raise
+        finally:
+            self.con.execute(sql.DROP.format(table_name=topology_table))
+            self.con.execute(sql.DROP.format(table_name=staging_table))
+        return {"deleted": deleted, "updated": updated, "inserted": inserted}
+
+    def _staged_columns(self, columns: list[str]) -> tuple[list[str], list[str]]:
+        """nodes columns loaded from the staged records. Inline metadata is computed from the topology."""
+        staged_columns = [f"s.{c}" for c in columns]
+        if self.inlines_metadata:
+            columns, staged_columns = columns + METADATA_FIELDS, staged_columns + ["t.depth", "t.depth = 0", "0"]
+        return (columns, staged_columns)
 
     def _get_user(self, username: str) -> dict[str, Any] | None:
         return self.con.execute(sql.GET_USER, [username]).fetchone()
@@ -316,25 +755,36 @@ class TreeEngine:
             anchor = f"({anchors})"
         return anchor
 
-    def _build_tree_context(self, tree_name: str) -> None:
-        """Build tables and namespaces collections from db pragma"""
+    def _build_tree_context(self, tree_name: str) -> str | None:
+        """
+        Build tables and namespaces collections, and return the cached root id.
+        The tree schema is read from the catalog, or collected from the db pragma when the catalog is stale.
+        Reading a tree never writes: the catalog is only refreshed by the builder and by the tree schema changes.
+        """
         self.tables = {}
         self.namespaces = {}
 
-        tables = self._get_tables(tree_name)
-        if len(tables) == 0:
-            raise ValueError(
-                f"tree: {tree_name} is currently not builded.",
-                "Consider building the tree first with the TreeBuilder"
-            )
+        catalog = self._read_catalog(tree_name)
+        if catalog is not None:
+            root_id, context = catalog
+        else:
+            root_id, context = getattr(self, "root_id", None), self._tree_pragma(tree_name)
 
-        for table in tables:
-            table_name = table[0]
-            info = self._table_info(table_name)
-            fk_info = self._table_fk_info(table_name)
+        for table in context["tables"]:
+            table_name, info = table["name"], table["info"]
             table_type = table_name.split("__")[1]
 
-            table_repr = SimpleSqlTable.from_pragma(table_name, info, fk_info)
+            table_repr = SimpleSqlTable.from_pragma(table_name, info, table["fk_info"])
+            if table_type == "changes":
+                self.tables[table_type] = table_repr
+                continue
+            elif table_name in context["virtual"]:
+                # full text indexes are reached through their field namespace.
+                fname = info[1][1]
+                self.namespaces[fname].fts = table_name
+                self.tables[table_type] = table_repr
+                continue
+
             for fname, f in table_repr.iter_fields:
                 current_namespace = self.namespaces.get(fname, None)
                 if table_type not in ["metadata", "nodes"] and fname in ("nid", "elm_idx"):
@@ -347,5 +797,133 @@ class TreeEngine:
                         ftype = f.dtype
                     )
                 else:
-                    current_namespace.index_table = table_repr._name
+                    current_namespace.index = table_repr._name
+
+            # generated columns are queryable, but are not part of the table fields written by the engine.
+            for f in table["generated"]:
+                self.namespaces[f[1]] = Namespace(
+                    table = table_repr._name,
+                    index = table_repr._name,
+                    fname = f[1],
+                    ftype = f[2]
+                )
             self.tables[table_type] = table_repr
+
+        nodes_table = self.tables["nodes"]._name
+        if not self.stores_children:
+            self.namespaces["children"] = Namespace(
+                table = nodes_table,
+                index = nodes_table,
+                fname = "children",
+                ftype = "JSONLIST",
+                derived = sql.DERIVED_CHILDREN.format(nodes_table=nodes_table, order=self.children_order)
+            )
+        if self.inlines_metadata:
+            # nodes are returned with the same shape as when joined with the metadata table.
+            self.namespaces["nid"] = Namespace(
+                table = nodes_table,
+                index = nodes_table,
+                fname = "nid",
+                ftype = "TEXT",
+                derived = f"{nodes_table}.id"
+            )
+        return root_id
+
+    @property
+    def stores_children(self) -> bool:
+        """whether nodes children are stored, or derived from the parent index when read."""
+        return "children" in self.tables["nodes"].fields
+
+    @property
+    def stores_positions(self) -> bool:
+        """whether siblings are ordered by a position column, or by rowid for trees built without it."""
+        return "position" in self.tables["nodes"].fields
+
+    @property
+    def children_order(self) -> str:
+        """column ordering siblings."""
+        return "position" if self.stores_positions else "rowid"
+
+    @property
+    def inlines_metadata(self) -> bool:
+        """whether nodes depth and flags are stored within the nodes table, or in the metadata table."""
+        return "depth" in self.tables["nodes"].fields
+
+    @property
+    def metadata_location(self) -> tuple[str, str]:
+        """table holding the nodes depth and flags, along with the column referencing the node id."""
+        if self.inlines_metadata:
+            return (self.tables["nodes"]._name, "id")
+        return (self.tables["metadata"]._name, "nid")
+
+    @property
+    def node_columns(self) -> list[str]:
+        """nodes columns written from the records. Inline metadata is computed by the engine."""
+        return [f.name for _, f in self.tables["nodes"].iter_fields if f.name not in METADATA_FIELDS]
+
+    def _tree_pragma(self, tree_name: str) -> dict[str, Any]:
+        """collect the schema of a tree from the db pragma."""
+        tables = self._get_tables(tree_name)
+        if len(tables) == 0:
+            raise ValueError(
+                f"tree: {tree_name} is currently not builded.",
+                "Consider building the tree first with the TreeBuilder"
+            )
+        return {
+            "tables": [
+                {
+                    "name": table_name,
+                    "info": self._table_info(table_name),
+                    "fk_info": self._table_fk_info(table_name),
+                    "generated": self._generated_columns(table_name)
+                }
+                for (table_name,) in tables
+            ],
+            "virtual": [t[0] for t in self._get_virtual_tables(tree_name)]
+        }
+
+    def _next_position(self, pid: str) -> int:
+        """position of a new last child of `pid`."""
+        query = sql.NEXT_POSITION.format(nodes_table=self.tables["nodes"]._name)
+        return self.cursor.execute(query, [pid]).fetchone()[0]
+
+    def _read_catalog(self, tree_name: str) -> tuple[str | None, dict[str, Any]] | None:
+        """return the cached root id and schema of a tree, unless the catalog is missing or stale."""
+        try:
+            return self.cursor.execute(sql.READ_CATALOG, [tree_name]).fetchone()
+        except sqlite3.OperationalError:
+            return None
+
+    def _write_catalog(self, tree_name: str, context: dict[str, Any] | None = None, root_id: str | None = None) -> None:
+        """
+        cache a tree schema and root id into the catalog. Skipped within a caller owning the transaction.
+        Read only databases keep collecting the schema from the db pragma.
+        """
+        if self.defer_commit:
+            return
+        if context is None:
+            context = self._tree_pragma(tree_name)
+        try:
+            self.cursor.execute(sql.CREATE_CATALOG)
+            self.cursor.execute(sql.WRITE_CATALOG, [tree_name, root_id, context])
+            self.con.commit()
+        except sqlite3.OperationalError:
+            self.con.rollback()
+
+    def _delete_catalog(self, tree_name: str) -> None:
+        try:
+            self.cursor.execute(sql.DELETE_CATALOG, [tree_name])
+            self._commit()
+        except sqlite3.OperationalError:
+            pass
+
+    def _resolve_root(self, root_id: str | None) -> str | None:
+        """check the cached root id with a primary key lookup, and look the root up when it moved."""
+        metadata_table, metadata_key = self.metadata_location
+        if root_id is not None:
+            query = sql.IS_ROOT.format(metadata_table=metadata_table, metadata_key=metadata_key)
+            if self.cursor.execute(query, [root_id]).fetchone() is not None:
+                return root_id
+
+        root = self.cursor.execute(sql.ROOT.format(metadata_table=metadata_table, metadata_key=metadata_key)).fetchone()
+        return None if root is None else root[0]
@@ -70,6 +70,8 @@ class Namespace:
     index: str = field(validator=[validators.instance_of(str)])
     fname: str = field(validator=[validators.instance_of(str)])
     ftype: str = field(validator=[validators.instance_of(str)])
+    fts: str | None = field(default=None)
+    derived: str | None = field(default=None)
 
     def is_joinable(self) -> bool:
         return self.index.split("__")[1] != "nodes"
@@ -77,7 +79,13 @@ class Namespace:
     def is_metadata(self) -> bool:
         return self.table.split("__")[1] == "metadata"
 
+    def column(self) -> str:
+        return self.derived or f"{self.table}.{self.fname}"
+
     def select(self) -> str:
+        if self.derived is not None:
+            # derived values have no declared type, their converter is named after the column.
+            return f'{self.derived} AS "{self.fname} [{self.ftype}]"'
         return f"{self.table}.{self.fname}"
 
     def join(self, to_table: str) -> str:
@@ -85,9 +93,25 @@ class Namespace:
             raise KeyError("__nodes is not joinable")
         return f"JOIN {self.index} ON {to_table}.id = {self.index}.nid"
 
-    def where(self, op: str, values: Any) -> tuple[str, Any]:
+    def match_join(self, alias: str, to_table: str) -> str:
+        if self.fts is None:
+            raise KeyError(f"field `{self.fname}` has no full text index.")
+        return sql.MATCH_JOIN.format(table_name=self.fts, alias=alias, to_table=to_table)
+
+    def where(self, op: str, values: Any, alias: str | None = None) -> tuple[str, Any]:
+        if op.upper() == "MATCH":
+            # the full text query is bound to the ranked join, matching nodes are the joined ones.
+            if self.fts is None:
+                raise KeyError(f"field `{self.fname}` has no full text index.")
+            if not isinstance(values, str):
+                raise ValueError(f"MATCH operator expects a full text query string. `{values}` is not a string")
+            return (f"{alias}.docid IS NOT NULL", values)
         fname, op, values = self._prepare(op, values)
-        return ((f"{fname} {op} {self._set_anchor(op, values)}", values))
+        where = f"{fname} {op} {self._set_anchor(op, values)}"
+        if self.index != self.table:
+            # list elements are searched in their index table.
+            where = f"{self.table}.id IN (SELECT nid FROM {self.index} WHERE {where})"
+        return (where, values)
 
     def _prepare(self, op: str, values: Any) -> tuple[str, Any]:
         if op.lower() == "ilike" and isinstance(values, list):
@@ -101,6 +125,8 @@ class Namespace:
             return (f"UPPER({self.index}.{self.fname})", "LIKE", values.upper())
         elif op.lower() == "ilike":
             raise ValueError(f"ILIKE operator must compare Strings. `{values}` is not a string")
+        elif self.derived is not None:
+            return (self.derived, op, values)
         else:
             return (f"{self.index}.{self.fname}", op, values)
 
@@ -136,7 +162,7 @@ class SimpleSqlField:
         sql = {
             ("nullable", False): "NOT NULL",
             ("unique", True): "UNIQUE",
-            ("serial", True): "AUTOINCREMENT"
+            ("serial", True): "PRIMARY KEY AUTOINCREMENT"
         }
         options = []
         for k,v in sql.items():
@@ -178,24 +204,27 @@ class SimpleSqlTable(ABC):
             fields.append(f.to_sql())
             if f.fk is not None:
                 fk.append(f.foreign_key)
-            if f.pk is not False:
+            if f.pk is not False and not f.serial:
                 pk.append(f.name)
-        data = ", ".join(fields + [sql.pk_to_sql(pk)] + fk)
+        data = ", ".join([f for f in fields + [sql.pk_to_sql(pk)] + fk if f])
         return sql.CREATE_TABLE.format(table_name=self._name, fields=data)
 
     def create_index(self, field_name: str) -> str:
         return sql.CREATE_INDEX.format(table_name=self._name, field_name=field_name)
 
+    def create_staging(self, staging_table: str) -> str:
+        fields = ", ".join([f"{f.name} {f.dtype}" for _, f in self.iter_fields])
+        return sql.CREATE_STAGING.format(table_name=staging_table, fields=fields)
+
     def create_json_extract_column(self, target_field: str, path: str) -> str:
-        return sql.CREATE_EXTRACT_COLUMN.format(table_name=self._name, target_field=target_field, path=path)
-
-    def create_insert_trigger(self, target_field: str, target_table: str | None = None, path: str | None = None) -> str:
-        if path is not None:
-            base = path.split(".")[0]
-            inner_path = ".".join(path.split(".")[1:])
-            fname = path.replace(".", "_")
-            trigger = sql.ADD_JSON_TRIGGER.format(table_name=self._name, target_table=target_table, target_field=fname, base=base, path=inner_path)
-        elif path is None and target_table:
+        column = f"{target_field}_{path.replace('.', '_')}"
+        return sql.CREATE_EXTRACT_COLUMN.format(table_name=self._name, column=column, target_field=target_field, path=path)
+
+    def populate_index(self, target_field: str, target_table: str) -> str:
+        return sql.POPULATE_JSONLIST_INDEX.format(table_name=self._name, target_table=target_table, target_field=target_field)
+
+    def create_insert_trigger(self, target_field: str, target_table: str | None = None) -> str:
+        if target_table:
             trigger = sql.ADD_JSONLIST_TRIGGER.format(table_name=self._name, target_table=target_table, target_field=target_field)
         else:
             raise ValueError("Cannot create insert trigger.")
@@ -204,13 +233,8 @@ class SimpleSqlTable(ABC):
     def create_delete_trigger(self, target_table: str) -> str:
         return sql.DELETE_TRIGGER.format(table_name=self._name, target_table=target_table)
 
-    def create_update_trigger(self, target_field: str, target_table: str | None = None, path: str | None = None) -> str:
-        if path is not None:
-            base = path.split(".")[0]
-            inner_path = ".".join(path.split(".")[1:])
-            fname = path.replace(".", "_")
-            trigger = sql.UPDATE_JSON_TRIGGER.format(table_name=self._name, target_table=target_table, target_field=fname, base=base, path=inner_path)
-        elif path is None and target_table:
+    def create_update_trigger(self, target_field: str, target_table: str | None = None) -> str:
+        if target_table:
             trigger = sql.UPDATE_JSONLIST_TRIGGER.format(table_name=self._name, target_table=target_table, target_field=target_field)
         else:
             raise ValueError("Cannot Create update trigger")
@@ -223,16 +247,39 @@ class NodesTable(SimpleSqlTable):
     id: SimpleSqlField = field(default=SimpleSqlField("id", "TEXT", pk=True, nullable=False, unique=True))
     parent: SimpleSqlField = field(default=SimpleSqlField("parent", "TEXT"))
     children: SimpleSqlField = field(default=SimpleSqlField("children", "JSONLIST", nullable=False))
+    position: SimpleSqlField = field(default=SimpleSqlField("position", "INTEGER"))
 
     @classmethod
-    def initialize(cls, _name: str, **fields: SimpleSqlField) -> NodesTable:
+    def initialize(
+        cls,
+        _name: str,
+        store_children: bool = True,
+        inline_metadata: bool = False,
+        **fields: SimpleSqlField
+    ) -> SimpleSqlTable:
         table_name = f"{_name}__nodes"
         table = cls(table_name)
         for k,v in fields.items():
             if k in table.__dict__.keys():
                 raise ValueError("Table Field already exist")
             setattr(table, k, cls.validate_field(v))
-        return table
+        if inline_metadata:
+            # nodes carry their own depth and flags, reads never join the metadata table.
+            for k, v in MetadataTable("").iter_fields:
+                if k == "nid":
+                    continue
+                elif k in table.__dict__.keys():
+                    raise ValueError("Table Field already exist")
+                setattr(table, k, v)
+        if store_children:
+            return table
+
+        # children are derived from the parent index when read.
+        derived = SimpleSqlTable(table_name)
+        for k, v in table.iter_fields:
+            if k != "children":
+                setattr(derived, k, v)
+        return derived
 
     @classmethod
     def validate_field(cls, v: SimpleSqlField) -> SimpleSqlField:
@@ -274,6 +321,70 @@ class IndexTable(SimpleSqlTable):
         )
         return table
 
+@define(slots=False)
+class FtsTable(SimpleSqlTable):
+    """full text index over a TEXT or JSONLIST field, one document per node."""
+    _name: str = field()
+    nid: SimpleSqlField = field()
+    value: SimpleSqlField = field()
+
+    @classmethod
+    def initialize(cls, _name: str, field_name: str, field_dtype: str) -> FtsTable:
+        if field_dtype not in ["TEXT", "JSONLIST"]:
+            raise ValueError(f"Full text index can only be built over TEXT or JSONLIST fields. `{field_name}` is {field_dtype}")
+        table = cls(
+            f"{_name}__fts_{field_name}",
+            nid=SimpleSqlField("nid", "TEXT"),
+            value=SimpleSqlField(field_name, field_dtype)
+        )
+        return table
+
+    def create_table(self) -> str:
+        return sql.CREATE_FTS_TABLE.format(table_name=self._name, field_name=self.value.name)
+
+    def document(self, prefix: str = "") -> str:
+        template = sql.FTS_JSONLIST if self.value.dtype == "JSONLIST" else sql.FTS_TEXT
+        return template.format(prefix=prefix, target_field=self.value.name)
+
+    def populate_index(self, target_field: str, target_table: str) -> str:
+        return sql.POPULATE_FTS_INDEX.format(table_name=self._name, target_table=target_table, target_field=target_field, document=self.document())
+
+    def create_insert_trigger(self, target_field: str, target_table: str | None = None) -> str:
+        trigger = sql.ADD_FTS_TRIGGER.format(table_name=self._name, target_field=target_field, document=self.document("NEW."))
+        return sql.CREATE_TRIGGER.format(table_name=self._name, target_table=target_table, trigger=trigger)
+
+    def create_delete_trigger(self, target_table: str) -> str:
+        return sql.DELETE_FTS_TRIGGER.format(table_name=self._name, target_table=target_table)
+
+    def create_update_trigger(self, target_field: str, target_table: str | None = None) -> str:
+        trigger = sql.UPDATE_FTS_TRIGGER.format(table_name=self._name, target_field=target_field, document=self.document("NEW."))
+        return sql.UPDATE_TRIGGER.format(table_name=self._name, target_table=target_table, target_field=target_field, trigger=trigger)
+
+
+@define(slots=False)
+class ChangesTable(SimpleSqlTable):
+    _name: str = field()
+    seq: SimpleSqlField = field(default=SimpleSqlField("seq", "INTEGER", pk=True, nullable=False, serial=True))
+    op: SimpleSqlField = field(default=SimpleSqlField("op", "TEXT", nullable=False))
+    nid: SimpleSqlField = field(default=SimpleSqlField("nid", "TEXT", nullable=False))
+    changed: SimpleSqlField = field(default=SimpleSqlField("changed", "JSONLIST", nullable=False))
+
+    @classmethod
+    def initialize(cls, _name: str) -> ChangesTable:
+        return cls(f"{_name}__changes")
+
+    def create_insert_trigger(self, target_table: str, target_fields: list[str], key: str = "id") -> str:
+        fields = ", ".join([f"'{f}'" for f in target_fields])
+        return sql.CHANGES_INSERT_TRIGGER.format(table_name=self._name, target_table=target_table, key=key, fields=fields)
+
+    def create_update_trigger(self, target_table: str, target_fields: list[str], key: str = "id") -> str:
+        changed = " OR ".join([f"OLD.{f} IS NOT NEW.{f}" for f in target_fields])
+        cases = ", ".join([f"CASE WHEN OLD.{f} IS NOT NEW.{f} THEN '{f}' END" for f in target_fields])
+        return sql.CHANGES_UPDATE_TRIGGER.format(table_name=self._name, target_table=target_table, key=key, changed=changed, cases=cases)
+
+    def create_delete_trigger(self, target_table: str, key: str = "id") -> str:
+        return sql.CHANGES_DELETE_TRIGGER.format(table_name=self._name, target_table=target_table, key=key)
+
 @define(slots=False)
 class UsersTable(SimpleSqlTable):
     _name: str = field(default="weetags__users")
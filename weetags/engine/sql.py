@@ -1,6 +1,7 @@
 from attrs import define, field, validators
 from collections.abc import Sequence
 from enum import Enum
+from hashlib import sha1
 
 from typing import Any
 
@@ -15,30 +16,53 @@ DTYPES = {"TEXT": str, "INTEGER": int, "JSONLIST": list, "JSON": dict, "BOOL": b
 # CREATE
 CREATE_TABLE = "CREATE TABLE  IF NOT EXISTS {table_name} ({fields});"
 CREATE_INDEX = "CREATE INDEX IF NOT EXISTS idx_{table_name}_{field_name} ON {table_name}({field_name});"
-CREATE_EXTRACT_COLUMN = "ALTER TABLE {table_name} ADD COLUMN {target_field}_{path} TEXT AS (json_extract({target_field}, '{path}'))"
+# children are walked in (parent, position) order. Trees built without a position column fall back on the rowid.
+CREATE_PARENT_INDEX = "CREATE INDEX IF NOT EXISTS idx_{table_name}_parent ON {table_name}({fields});"
+CREATE_CUSTOM_INDEX = "CREATE {unique} INDEX IF NOT EXISTS {index_name} ON {table_name}({fields}) {conditions};"
+# extracted columns are declared without a type: values keep the type they have in the document, numbers compare as numbers.
+CREATE_EXTRACT_COLUMN = "ALTER TABLE {table_name} ADD COLUMN {column} AS (json_extract({target_field}, '$.{path}')) VIRTUAL;"
+
+CREATE_FTS_TABLE = "CREATE VIRTUAL TABLE IF NOT EXISTS {table_name} USING fts5(nid UNINDEXED, {field_name}, tokenize='unicode61 remove_diacritics 2');"
 
 # TRIGGERS
-ADD_JSON_TRIGGER = """\
+ADD_JSONLIST_TRIGGER = """\
 INSERT INTO {table_name}({target_field}, nid, elm_idx)
-SELECT json_extract({base}, "$.{path}"), {target_table}.id, 1 FROM {target_table} WHERE {target_table}.id = NEW.id;
+SELECT j.value, {target_table}.id, j.key FROM {target_table}, json_each(NEW.{target_field}) as j WHERE {target_table}.id = NEW.id;
 """
 
-UPDATE_JSON_TRIGGER = """\
+UPDATE_JSONLIST_TRIGGER = """\
 DELETE FROM {table_name} WHERE nid = OLD.id;
 INSERT INTO {table_name}({target_field}, nid, elm_idx)
-SELECT json_extract({base}, "$.{path}"), {target_table}.id, 1 FROM {target_table} WHERE {target_table}.id = NEW.id;
+SELECT j.value, {target_table}.id, j.key FROM {target_table}, json_each(NEW.{target_field}) as j WHERE {target_table}.id = NEW.id;
 """
 
-ADD_JSONLIST_TRIGGER = """\
+POPULATE_JSONLIST_INDEX = """\
 INSERT INTO {table_name}({target_field}, nid, elm_idx)
-SELECT j.value, {target_table}.id, j.key FROM {target_table}, json_each(NEW.{target_field}) as j WHERE {target_table}.id = NEW.id;
+SELECT j.value, {target_table}.id, j.key FROM {target_table}, json_each({target_table}.{target_field}) as j;
 """
 
-UPDATE_JSONLIST_TRIGGER = """\
-DELETE FROM {table_name} WHERE nid = OLD.id;
-INSERT INTO {table_name}({target_field}, nid, elm_idx)
-SELECT j.value, {target_table}.id, j.key FROM {target_table}, json_each(NEW.{target_field}) as j WHERE {target_table}.id = NEW.id;
+# FULL TEXT
+# a node is indexed as a single document, stored under the node rowid so writes reach it without scanning the index.
+# JSONLIST elements are concatenated, one per line.
+FTS_TEXT = "{prefix}{target_field}"
+FTS_JSONLIST = "(SELECT group_concat(j.value, char(10)) FROM json_each({prefix}{target_field}) AS j)"
+POPULATE_FTS_INDEX = """\
+INSERT INTO {table_name}(rowid, nid, {target_field})
+SELECT rowid, id, {document} FROM {target_table} WHERE {target_field} IS NOT NULL;
+"""
+ADD_FTS_TRIGGER = """\
+INSERT OR REPLACE INTO {table_name}(rowid, nid, {target_field}) SELECT NEW.rowid, NEW.id, {document} WHERE NEW.{target_field} IS NOT NULL;
+"""
+UPDATE_FTS_TRIGGER = """\
+DELETE FROM {table_name} WHERE rowid = OLD.rowid;
+INSERT OR REPLACE INTO {table_name}(rowid, nid, {target_field}) SELECT NEW.rowid, NEW.id, {document} WHERE NEW.{target_field} IS NOT NULL;
 """
+DELETE_FTS_TRIGGER = """\
+CREATE TRIGGER {table_name}__delete_trigger AFTER DELETE ON {target_table} BEGIN
+DELETE FROM {table_name} WHERE rowid = OLD.rowid;
+END;
+"""
+MATCH_JOIN = "LEFT JOIN (SELECT rowid AS docid, rank FROM {table_name} WHERE {table_name} MATCH ?) AS {alias} ON {to_table}.rowid = {alias}.docid"
 
 CREATE_TRIGGER = """\
 CREATE TRIGGER {table_name}__insert_trigger AFTER INSERT ON {target_table} BEGIN
@@ -56,25 +80,201 @@ CREATE TRIGGER {table_name}__update_on_{target_field}_trigger AFTER UPDATE OF {t
 END;
 """
 
+# CHANGES LOG
+CHANGES_INSERT_TRIGGER = """\
+CREATE TRIGGER IF NOT EXISTS {table_name}__{target_table}_insert_trigger AFTER INSERT ON {target_table} BEGIN
+INSERT INTO {table_name}(op, nid, changed) VALUES('insert', NEW.{key}, json_array({fields}));
+END;
+"""
+CHANGES_UPDATE_TRIGGER = """\
+CREATE TRIGGER IF NOT EXISTS {table_name}__{target_table}_update_trigger AFTER UPDATE ON {target_table} WHEN {changed} BEGIN
+INSERT INTO {table_name}(op, nid, changed)
+SELECT 'update', NEW.{key}, json_group_array(value) FROM json_each(json_array({cases})) WHERE value IS NOT NULL;
+END;
+"""
+CHANGES_DELETE_TRIGGER = """\
+CREATE TRIGGER IF NOT EXISTS {table_name}__{target_table}_delete_trigger AFTER DELETE ON {target_table} BEGIN
+INSERT INTO {table_name}(op, nid, changed) VALUES('delete', OLD.{key}, json_array());
+END;
+"""
+CHANGES_SINCE = "SELECT seq, op, nid, changed FROM {table_name} WHERE seq > ? ORDER BY seq {limit};"
+PRUNE_CHANGES = "DELETE FROM {table_name} WHERE seq <= ?;"
+
+# STAGING
+CREATE_STAGING = "CREATE TEMP TABLE IF NOT EXISTS {table_name} (seq INTEGER PRIMARY KEY, {fields});"
+STAGED_DUPLICATE = "SELECT id FROM {table_name} GROUP BY id HAVING COUNT(*) > 1 LIMIT 1;"
+STAGED_ROOTS = "SELECT id FROM {table_name} WHERE parent IS NULL LIMIT 2;"
+STAGED_ORPHAN = """\
+SELECT s.id, s.parent FROM {table_name} AS s
+WHERE s.parent IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {table_name} AS p WHERE p.id = s.parent)
+LIMIT 1;
+"""
+STAGED_TOPOLOGY = """\
+CREATE TEMP TABLE {topology_table} AS
+WITH RECURSIVE topology(seq, id, depth) AS (
+    SELECT seq, id, 0 FROM {table_name} WHERE parent IS NULL
+    UNION ALL
+    SELECT s.seq, s.id, t.depth + 1 FROM {table_name} AS s JOIN topology AS t ON s.parent = t.id
+)
+SELECT seq, id, depth FROM topology;
+"""
+# a node position is its rank among its siblings, in the order records were given.
+STAGED_POSITIONS = """\
+UPDATE {table_name} SET position = p.position
+FROM (SELECT seq, row_number() OVER (PARTITION BY parent ORDER BY seq) - 1 AS position FROM {table_name}) AS p
+WHERE {table_name}.seq = p.seq;
+"""
+STAGED_UNREACHABLE = "SELECT id FROM {table_name} WHERE seq NOT IN (SELECT seq FROM {topology_table}) LIMIT 1;"
+LOAD_STAGED_NODES = """\
+INSERT INTO {nodes_table}({columns})
+SELECT {staged_columns} FROM {topology_table} AS t JOIN {table_name} AS s ON s.seq = t.seq
+ORDER BY t.depth, t.seq;
+"""
+LOAD_STAGED_METADATA = """\
+INSERT INTO {metadata_table}(nid, depth, is_root, is_leaf)
+SELECT id, depth, depth = 0, 0 FROM {topology_table} ORDER BY depth, seq;
+"""
+
+# SYNC
+SYNC_DELETE = "DELETE FROM {nodes_table} WHERE NOT EXISTS (SELECT 1 FROM {table_name} AS s WHERE s.id = {nodes_table}.id);"
+SYNC_UPDATE = """\
+UPDATE {nodes_table} SET ({fields}) = ({staged_fields})
+FROM {table_name} AS s
+WHERE {nodes_table}.id = s.id AND ({changed});
+"""
+SYNC_INSERT = """\
+INSERT INTO {nodes_table}({columns})
+SELECT {staged_columns} FROM {topology_table} AS t JOIN {table_name} AS s ON s.seq = t.seq
+WHERE NOT EXISTS (SELECT 1 FROM {nodes_table} AS n WHERE n.id = s.id)
+ORDER BY t.depth, t.seq;
+"""
+SYNC_METADATA = """\
+INSERT INTO {metadata_table}(nid, depth, is_root, is_leaf)
+SELECT id, depth, depth = 0, 0 FROM {topology_table} AS t
+WHERE NOT EXISTS (SELECT 1 FROM {metadata_table} AS m WHERE m.nid = t.id)
+ORDER BY depth, seq;
+"""
+SYNC_DEPTHS = """\
+UPDATE {metadata_table} SET depth = t.depth, is_root = t.depth = 0
+FROM {topology_table} AS t
+WHERE {metadata_table}.{metadata_key} = t.id AND {metadata_table}.depth IS NOT t.depth;
+"""
+SYNC_CHILDREN = """\
+UPDATE {nodes_table} SET children = c.children
+FROM (
+    SELECT parent, children FROM (
+        SELECT parent, row_number() OVER w AS rank,
+        json_group_array(id) OVER (w ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS children
+        FROM {nodes_table} WHERE parent IS NOT NULL
+        WINDOW w AS (PARTITION BY parent ORDER BY {order})
+    ) WHERE rank = 1
+) AS c
+WHERE {nodes_table}.id = c.parent AND json({nodes_table}.children) IS NOT c.children;
+"""
+SYNC_NO_CHILDREN = """\
+UPDATE {nodes_table} SET children = '[]'
+WHERE json(children) != '[]' AND NOT EXISTS (SELECT 1 FROM {nodes_table} AS c WHERE c.parent = {nodes_table}.id);
+"""
+SYNC_LEAVES = """\
+UPDATE {metadata_table} SET is_leaf = l.is_leaf
+FROM (
+    SELECT id, NOT EXISTS (SELECT 1 FROM {nodes_table} AS c WHERE c.parent = n.id) AS is_leaf FROM {nodes_table} AS n
+) AS l
+WHERE {metadata_table}.{metadata_key} = l.id AND {metadata_table}.is_leaf IS NOT l.is_leaf;
+"""
 
 ## infos
+EXPLAIN = "EXPLAIN QUERY PLAN {stmt};"
 INFO = "PRAGMA table_info({table_name});"
+XINFO = "PRAGMA table_xinfo({table_name});"
 FK_INFO = "PRAGMA foreign_key_list({table_name});"
 TABLE_SIZE = "SELECT COUNT(*) FROM {table_name};"
 TREE_DEPTH = "SELECT MAX(depth) FROM {table_name};"
-TABLE_NAMES = "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE '{tree_name}__%';"
-
+TABLE_NAMES = """\
+SELECT name FROM sqlite_master WHERE type='table' AND name GLOB '{tree_name}__*' AND name != 'weetags__catalog'
+AND name NOT IN (SELECT name FROM pragma_table_list WHERE type = 'shadow');
+"""
+INDEX_NAMES = """\
+SELECT name, tbl_name FROM sqlite_master WHERE type='index' AND tbl_name GLOB '{tree_name}__*' AND sql IS NOT NULL
+AND tbl_name NOT IN (SELECT name FROM pragma_table_list WHERE type = 'shadow');
+"""
+TRIGGER_NAMES = "SELECT name FROM sqlite_master WHERE type='trigger' AND name GLOB '{table_name}__*';"
+VIRTUAL_TABLE_NAMES = "SELECT name FROM pragma_table_list WHERE schema = 'main' AND type = 'virtual' AND name GLOB '{tree_name}__*';"
+
+# catalog. a tree schema, along with its root id, cached in a single row.
+# the row is stale as soon as the database schema changed since it was written.
+CREATE_CATALOG = """\
+CREATE TABLE IF NOT EXISTS weetags__catalog(
+    tree TEXT PRIMARY KEY,
+    schema_version INTEGER NOT NULL,
+    root_id TEXT,
+    context JSON NOT NULL
+);
+"""
+READ_CATALOG = """\
+SELECT root_id, context FROM weetags__catalog
+WHERE tree = ? AND schema_version = (SELECT schema_version FROM pragma_schema_version());
+"""
+WRITE_CATALOG = """\
+INSERT OR REPLACE INTO weetags__catalog(tree, schema_version, root_id, context)
+VALUES(?, (SELECT schema_version FROM pragma_schema_version()), ?, ?);
+"""
+DELETE_CATALOG = "DELETE FROM weetags__catalog WHERE tree = ?;"
+IS_ROOT = "SELECT {metadata_key} FROM {metadata_table} WHERE {metadata_key} = ? AND depth = 0;"
+ROOT = "SELECT {metadata_key} FROM {metadata_table} WHERE depth = 0 LIMIT 1;"
 # actions
 DROP = "DROP TABLE IF EXISTS {table_name};"
+DROP_INDEX = "DROP INDEX IF EXISTS {index_name};"
+DROP_TRIGGER = "DROP TRIGGER IF EXISTS {trigger_name};"
 WRITE = "INSERT {on_conflict} INTO {table_name}({col_names}) VALUES({anchors});"
 READ_ONE = "SELECT {fields} FROM {node_table} {joins} {conditions} {order} {axis};"
 READ_MANY = "SELECT {fields} FROM {node_table} {joins} {conditions} {order} {axis} {limit};"
+READ_RELATION = """\
+WITH RECURSIVE related(id, distance) AS ({relation})
+SELECT {fields} FROM related CROSS JOIN {node_table} ON {node_table}.id = related.id {distance} {joins} {conditions} {order} {axis} {limit};
+"""
 UPDATE = "UPDATE {table_name} SET {setter} {conditions};"
 DELETE = "DELETE FROM {node_table} {conditions};"
 
+# related nodes ids along with their distance to the base node, emitted from the closest to the farthest.
+# children are read from the parent index, in (parent, position) order: the order children arrays are built in.
+# related nodes are read from this queue first, so a LIMIT stops the walk. `bound` stops the recursion at a maximum distance.
+RELATIONS = {
+    "parent": "SELECT parent, 1 FROM {node_table} WHERE id = ? AND parent IS NOT NULL",
+    "children": "SELECT id, 1 FROM {node_table} WHERE parent = ? ORDER BY {order}",
+    "siblings": """\
+SELECT id, 1 FROM {node_table}
+WHERE parent = (SELECT parent FROM {node_table} WHERE id = ?1) AND id != ?1 ORDER BY {order}""",
+    "ancestors": """\
+SELECT parent, 1 FROM {node_table} WHERE id = ? AND parent IS NOT NULL
+UNION ALL
+SELECT n.parent, r.distance + 1 FROM related AS r JOIN {node_table} AS n ON n.id = r.id {bound} WHERE n.parent IS NOT NULL""",
+    "descendants": """\
+SELECT id, 1 FROM {node_table} WHERE parent = ?
+UNION ALL
+SELECT n.id, r.distance + 1 FROM related AS r JOIN {node_table} AS n ON n.parent = r.id {bound}""",
+}
 SEARCH_SUBQUERY = "id IN ({subquery})"
-CHILDREN_FROM_IDS = "SELECT id, children FROM {table_name} WHERE id IN ({anchors});"
-CHILDREN_FROM_ID = "SELECT id, children FROM {table_name} WHERE id=?;"
+# children arrays are aggregated over windows ordered by position: the order holds whatever the query plan,
+# the parent index only saves the sort.
+SET_CHILDREN = """\
+UPDATE {nodes_table} SET children = c.children
+FROM (
+    SELECT parent, children FROM (
+        SELECT parent, row_number() OVER w AS rank,
+        json_group_array(id) OVER (w ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS children
+        FROM {nodes_table} WHERE parent IS NOT NULL
+        WINDOW w AS (PARTITION BY parent ORDER BY {order})
+    ) WHERE rank = 1
+) AS c
+WHERE {nodes_table}.id = c.parent;
+"""
+# children of trees built without a children column, read from the parent index in position order.
+DERIVED_CHILDREN = """\
+COALESCE((SELECT json_group_array(c.id) OVER (ORDER BY c.{order} ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) \
+FROM {nodes_table} AS c WHERE c.parent = {nodes_table}.id LIMIT 1), '[]')"""
+NEXT_POSITION = "SELECT COALESCE(MAX(position) + 1, 0) FROM {nodes_table} WHERE parent = ?;"
+SET_LEAVES = "UPDATE {metadata_table} SET is_leaf = 1 WHERE {metadata_key} NOT IN (SELECT parent FROM {nodes_table} WHERE parent IS NOT NULL);"
 GET_USER = "SELECT username, password_sha256, auth_level, salt, max_age FROM weetags__users WHERE username=?"
 GET_RESTRICTION = "SELECT auth_level FROM weetags__restrictions WHERE tree=? AND blueprint=?"
 
@@ -100,6 +300,7 @@ class SqlOperator(str, Enum):
     Not_in = "NOT IN"
     Is = "IS"
     Is_not = "IS NOT"
+    Match = "MATCH"
 
     def values():
         return [s.value for s in SqlOperator]
@@ -147,18 +348,6 @@ class _SimpleSqlConverter:
     table_name: str | None = field(default=None)
     target_columns: list[str] | None = field(default=None, validator=[listOrNone])
     values: list[Any]|list[list[Any]]|None = field(default=None, validator=[listOrNone])
-    setter: list[tuple[str, Any]] | None = field(default=None, validator=[listOrNone])
-    conds: list[tuple[str, str, Any]] | None = field(default=None, validator=[listOrNone])
-
-
-    def _children_from_ids(self) -> tuple[str, list[Any]]:
-        anchors = self.anchors(self.values)
-        stmt = CHILDREN_FROM_IDS.format(table_name=self.table_name, anchors=anchors)
-        return (stmt, self.values)
-
-    def _children_from_id(self) -> tuple[str, list[Any]]:
-        stmt = CHILDREN_FROM_ID.format(table_name=self.table_name)
-        return (stmt, self.values)
 
     def _write_many(self) -> tuple[str, list[list[Any]]]:
         # add validation for columns names ? and table_name ?
@@ -171,51 +360,10 @@ class _SimpleSqlConverter:
         stmt =  WRITE.format(table_name=self.table_name, col_names=columns, anchors=anchors, on_conflict="")
         return (stmt, self.values) # type: ignore
 
-    def _update(self) -> tuple[str, list[Any]]:
-        def parse_simple_conditions(conds: list[tuple[str, str, Any]] | None) -> tuple[str, list[Any]]:
-            if conds is None:
-                return ("", [])
-
-            values, conditions = [], []
-            for field, op, val in conds:
-                anchors = f"({self.condition_anchor(op, val)})"
-                conditions.append(f"{field} {op} {anchors}")
-                values.append(val)
-            return ("WHERE " + ' AND '.join(conditions), values)
-
-        def parse_simple_setter(setter: list[tuple[str, Any]]) -> tuple[str, list[Any]]:
-            values, fields = [], []
-            [(fields.append(f"{field} = ?"), values.append(val)) for field, val in setter]
-            return (", ".join(fields), values)
-
-        if self.setter is None:
-            raise ValueError(f"You must Set some pairs of key values to update.")
-
-        conditions, cvalues = parse_simple_conditions(self.conds)
-        setter, svalues = parse_simple_setter(self.setter)
-        stmt = UPDATE.format(table_name=self.table_name, setter=setter, conditions=conditions)
-        return (stmt, svalues + cvalues)
-
-
-    @staticmethod
-    def condition_anchor(op: str, values: Any) -> str:
-        """define the right anchor for the given condition operator."""
-        anchor = "?"
-        if op.lower() == "in" and isinstance(values, list):
-            anchors = ", ".join(["?" for _ in range(len(values))])
-            anchor = f"({anchors})"
-        return anchor
-
     @staticmethod
     def anchors(values: list[Any]) -> str:
         return ' ,'.join(["?" for _ in range(len(values))])
 
-    @staticmethod
-    def update_setter(set: list[tuple[str, Any]]) -> tuple[str, Any]:
-        values, fields = [], []
-        [(fields.append(f"{field} = ?"), values.append(val)) for field, val in set]
-        return (", ".join(fields), values)
-
 
 @define(kw_only=True)
 class SqlConverter:
@@ -232,6 +380,7 @@ class SqlConverter:
     order_by: list[str] | None = field(default=None, validator=[listOrNone])
     axis: int = field(default=1, converter=int, validator=[validators.instance_of(int)])
     setter: list[tuple[str, Any]] | None = field(default=None, validator=[listOrNone])
+    matches: list[tuple[str, Namespace, str]] = field(factory=list, init=False)
 
     def write_one(self) -> tuple[str, list[Any]]:
 
@@ -270,7 +419,7 @@ class SqlConverter:
         node_table = self.tables["nodes"]._name
         fields = self.parse_fields()
         conditions, values = self.parse_conditions()
-        joins = self.parse_joins()
+        joins, jvalues = self.parse_joins(), self.parse_match_values()
         order_by = self.parse_order()
         axis = self.parse_axis()
         stmt = READ_ONE.format(
@@ -281,13 +430,13 @@ class SqlConverter:
             order=order_by,
             axis=axis
         )
-        return (stmt, values)
+        return (stmt, jvalues + values)
 
     def read_many(self) -> tuple[str, list[Any]]:
         node_table = self.tables["nodes"]._name
         fields = self.parse_fields()
         conditions, values = self.parse_conditions()
-        joins = self.parse_joins()
+        joins, jvalues = self.parse_joins(), self.parse_match_values()
         order_by = self.parse_order()
         axis = self.parse_axis()
         limit = self.parse_limit()
@@ -300,7 +449,100 @@ class SqlConverter:
             axis=axis,
             limit=limit
         )
-        return (stmt, values)
+        return (stmt, jvalues + values)
+
+    def read_relation(
+        self,
+        relation: str,
+        nid: str,
+        min_distance: int | None = None,
+        max_distance: int | None = None
+    ) -> tuple[str, list[Any]]:
+        """
+        read the nodes related to `nid`, at a distance from `nid` within [min_distance, max_distance].
+        Without `order_by`, nodes come from the closest to the farthest, in children order.
+        `axis=0` returns the farthest, then the latest inserted, nodes first.
+        """
+        template = RELATIONS.get(relation, None)
+        if template is None:
+            raise KeyError(f"Unknown relation: {relation}")
+        node_table = self.tables["nodes"]._name
+
+        bound, bvalues, distance, dvalues = "", [], [], []
+        if max_distance is not None:
+            bound, bvalues = "AND r.distance < ?", [max_distance]
+            distance.append("related.distance <= ?")
+            dvalues.append(max_distance)
+        if min_distance is not None:
+            distance.append("related.distance >= ?")
+            dvalues.append(min_distance)
+
+        fields = self.parse_fields()
+        conditions, values = self.parse_conditions()
+        joins, jvalues = self.parse_joins(), self.parse_match_values()
+        order_by, axis = self.parse_order(), self.parse_axis()
+        order = self.children_order()
+        if not order_by and self.axis == 0:
+            order_by, axis = f"ORDER BY related.distance DESC, {node_table}.{order}", "DESC"
+        stmt = READ_RELATION.format(
+            relation=template.format(node_table=node_table, bound=bound, order=order),
+            fields=fields,
+            node_table=node_table,
+            distance=" ".join([f"AND {d}" for d in distance]),
+            joins=joins,
+            conditions=conditions,
+            order=order_by,
+            axis=axis,
+            limit=self.parse_limit()
+        )
+        return (stmt, [nid] + bvalues + dvalues + jvalues + values)
+
+    def create_index(self, index_name: str | None = None, unique: bool = False) -> tuple[str, str]:
+        """
+        index one or several fields of the same table, optionally restricted to the rows complying with the conditions.
+        Indexes cannot be bound to parameters, conditions values are rendered as literals.
+        """
+        if not self.fields:
+            raise ValueError("An index must cover at least one field.")
+
+        namespaces = []
+        for fname in self.fields:
+            namespace = self.get_namespace(fname)
+            if namespace is None:
+                raise KeyError(f"Unknown field name: {fname}")
+            if namespace.index != namespace.table:
+                raise ValueError(f"field `{fname}` is stored in an index table, it cannot be part of a composite index.")
+            namespaces.append(namespace)
+        table_name = namespaces[0].table
+        if any([n.table != table_name for n in namespaces]):
+            raise ValueError("All the fields of an index must belong to the same table, either the nodes or the metadata.")
+
+        conditions = ""
+        if self.conds is not None:
+            for fname in self.extract_fieldnames(self.conds):
+                namespace = self.get_namespace(fname)
+                if namespace is None or namespace.table != table_name or namespace.index != namespace.table:
+                    raise ValueError(f"Partial index conditions can only refer to fields of `{table_name}`.")
+            where, values = self.parse_conditions()
+            if self.matches or " LIKE " in where:
+                # LIKE is overriden by the case_sensitive_like pragma, sqlite does not consider it deterministic.
+                raise ValueError("Partial index conditions cannot use the MATCH, LIKE or ILIKE operators.")
+            parts = where.split("?")
+            conditions = parts[0] + "".join([self.literal(v) + p for v, p in zip(values, parts[1:])])
+
+        columns = [n.fname for n in namespaces]
+        if index_name is None:
+            index_name = f"idx_{table_name}_{'_'.join(columns)}"
+            if conditions:
+                index_name += f"_{sha1(conditions.encode()).hexdigest()[:8]}"
+        stmt = CREATE_CUSTOM_INDEX.format(
+            unique="UNIQUE" if unique else "",
+            index_name=index_name,
+            table_name=table_name,
+            fields=", ".join(columns),
+            conditions=conditions
+        )
+        return (index_name, stmt)
 
     def delete(self) -> tuple[str, list[Any]]:
         node_table = self.tables["nodes"]._name
@@ -333,18 +575,28 @@ class SqlConverter:
             for fname in fields:
                 if fname == "*":
                     continue
-                namespace = self.namespaces.get(fname, None) # type: ignore
+                namespace = self.get_namespace(fname)
                 if namespace is None:
                     raise KeyError(f"Unknown table field: {fname}")
-                if namespace.is_joinable():
+                # list index tables are filtered through a subquery, they would multiply the joined rows.
+                if namespace.is_joinable() and namespace.table == namespace.index:
                     buff.append(namespace.join(tnodes))
             return buff
 
         tnodes = self.tables["nodes"]._name
-        stmts = [self.namespaces["depth"].join(tnodes)]
+        stmts = []
+        if self.fields is None and "metadata" in self.tables:
+            # whole nodes are read along with their metadata.
+            stmts.append(self.namespaces["depth"].join(tnodes))
         for sequence in [self.conds, self.order_by, self.fields]:
             stmts.extend(parse_sequence(sequence))
-        return " ".join(list(set(stmts)))
+        # tables are joined once, in the order their fields are first referenced. Statements stay the same between calls.
+        # full text joins are bound to parameters, they keep the order of their conditions.
+        matches = [namespace.match_join(alias, tnodes) for alias, namespace, _ in self.matches]
+        return " ".join(list(dict.fromkeys(stmts)) + matches)
+
+    def parse_match_values(self) -> list[Any]:
+        return [query for _, _, query in self.matches]
 
     def parse_conditions(self, with_subqueries: bool=False) -> tuple[str, list[Any]]:
         """
@@ -383,12 +635,19 @@ class SqlConverter:
 
             elif isinstance(cond, Sequence) and not isinstance(cond, str):
                 f, op, val = cond
-                namespace = self.namespaces.get(f, None)
+                namespace = self.get_namespace(f)
                 if namespace is None:
                     raise KeyError(f"Unknown Table Field: {f}")
                 if op.upper() not in SqlOperator.values():
                     raise KeyError(f"Unknown Operator: {op}")
 
+                if op.upper() == SqlOperator.Match:
+                    alias = f"match_{len(self.matches)}"
+                    where, val = namespace.where(op, val, alias)
+                    self.matches.append((alias, namespace, val))
+                    conditions.append(where)
+                    continue
+
                 where, val = namespace.where(op, val)
                 conditions.append(where)
                 if isinstance(val, list):
@@ -423,12 +682,33 @@ class SqlConverter:
                         buff.append(cond[0])
         return buff
 
+    def get_namespace(self, fname: str) -> Namespace | None:
+        """find a field namespace. dict paths, such as `meta.lang`, resolve to their extracted column `meta_lang`."""
+        namespace = self.namespaces.get(fname, None)
+        if namespace is None and "." in fname:
+            namespace = self.namespaces.get(fname.replace(".", "_"), None)
+        return namespace
+
+    def children_order(self) -> str:
+        """column ordering siblings. Trees built without a position column are ordered by rowid."""
+        return "position" if "position" in self.tables["nodes"].fields else "rowid"
+
     def parse_fields(self) -> str:
-        fields = ["*"]
+        # neither joined tables columns nor generated columns are part of the nodes. Positions are only read explicitly.
+        tnodes = self.tables["nodes"]
+        fields = [f"{tnodes._name}.{f.name}" for _, f in tnodes.iter_fields if f.name != "position"]
+        if "metadata" in self.tables:
+            fields.append(f"{self.tables['metadata']._name}.*")
+        children = self.namespaces.get("children", None)
+        if children is not None and children.derived is not None:
+            fields.insert(2, children.select())
+        nid = self.namespaces.get("nid", None)
+        if nid is not None and nid.derived is not None:
+            fields.insert(fields.index(f"{tnodes._name}.depth"), nid.select())
         if self.fields is not None:
             fields = []
             for fname in self.fields:
-                namespace = self.namespaces.get(fname, None)
+                namespace = self.get_namespace(fname)
                 if namespace is None:
                     raise KeyError(f"Unknown field name: {fname}")
                 fields.append(namespace.select())
@@ -447,9 +727,13 @@ class SqlConverter:
         return limit
 
     def parse_order(self) -> str:
+        if self.order_by is None and self.matches:
+            # bm25 ranks are negative, the best matches come first.
+            ranks = " + ".join([f"COALESCE({alias}.rank, 0)" for alias, _, _ in self.matches])
+            return f"ORDER BY {ranks}"
         if self.order_by is None:
             return ""
-        f = ", ".join([self.namespaces[fname].select() for fname in self.order_by])
+        f = ", ".join([self.get_namespace(fname).column() for fname in self.order_by]) # type: ignore
         return f"ORDER BY {f}"
 
     def parse_axis(self) -> str:
@@ -466,13 +750,26 @@ class SqlConverter:
     def update_setter(self, set_values: list[tuple[str, Any]]) -> tuple[str, Any]:
         values, fields = [], []
         for fname, val in set_values:
-            namespace = self.namespaces.get(fname, None)
+            namespace = self.get_namespace(fname)
             if namespace is None:
                 raise KeyError(f"Unknown field name: {fname}")
             fields.append(f"{fname} = ?")
             values.append(val)
         return (", ".join(fields), values)
 
+    @staticmethod
+    def literal(value: Any) -> str:
+        if value is None:
+            return "NULL"
+        elif isinstance(value, bool):
+            return str(int(value))
+        elif isinstance(value, (int, float)):
+            return repr(value)
+        elif isinstance(value, str):
+            escaped = value.replace("'", "''")
+            return f"'{escaped}'"
+        raise ValueError(f"Cannot render `{value}` as a sql literal.")
+
     @staticmethod
     def condition_anchor(op: str, values: Any) -> str:
         """define the right anchor for the given condition operator."""
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from time import monotonic
+from queue import Queue, Empty
+from threading import Thread, Event
+from concurrent.futures import Future
+
+from typing import Any, Callable
+
+from attrs import define, field
+
+from weetags.engine.engine import TreeEngine
+
+
+@define(slots=True)
+class WriteRequest:
+    method: str = field()
+    args: tuple[Any, ...] = field(factory=tuple)
+    kwargs: dict[str, Any] = field(factory=dict)
+    future: Future = field(factory=Future)
+
+
+class TreeWriter(Thread):
+    """
+    Single writer thread owning the only write connection of a tree.
+    Mutations are queued, coalesced into groups and committed within one transaction.
+    Each request runs inside its own savepoint, so a failing request only fails its own future.
+    :attributes:
+        :factory: (Callable) build the engine used by the writer. Called from within the writer thread.
+        :max_delay: (float) maximum time, in seconds, spent collecting requests for a group once the first one arrived.
+        :max_batch: (int) maximum number of requests committed within a single group.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], TreeEngine],
+        max_delay: float = 0.005,
+        max_batch: int = 256
+    ) -> None:
+        super().__init__(name="weetags-writer", daemon=True)
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        if max_delay < 0:
+            raise ValueError("max_delay must be positive")
+
+        self.factory = factory
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.queue: Queue[WriteRequest | None] = Queue()
+        self._ready = Event()
+        self._error: BaseException | None = None
+        self._closed = False
+
+        self.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, method: str, args: tuple[Any, ...] = (), kwargs: dict[str, Any] | None = None) -> Future:
+        if self._closed:
+            raise RuntimeError("writer is closed")
+        request = WriteRequest(method, args, kwargs or {})
+        self.queue.put(request)
+        return request.future
+
+    def close(self, wait: bool = True) -> None:
+        """stop the writer once every queued request is committed."""
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(None)
+        if wait:
+            self.join()
+
+    def run(self) -> None:
+        try:
+            engine = self.factory()
+            engine.defer_commit = True
+        except BaseException as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        running = True
+        while running:
+            request = self.queue.get()
+            if request is None:
+                break
+            group, running = self._collect([request])
+            self._commit_group(engine, group)
+        engine.con.close()
+
+    def _collect(self, group: list[WriteRequest]) -> tuple[list[WriteRequest], bool]:
+        deadline = monotonic() + self.max_delay
+        while len(group) < self.max_batch:
+            timeout = deadline - monotonic()
+            try:
+                if timeout > 0:
+                    request = self.queue.get(timeout=timeout)
+                else:
+                    request = self.queue.get_nowait()
+            except Empty:
+                break
+            if request is None:
+                return (group, False)
+            group.append(request)
+        return (group, True)
+
+    def _commit_group(self, engine: TreeEngine, group: list[WriteRequest]) -> None:
+        group = [r for r in group if r.future.set_running_or_notify_cancel()]
+        if not group:
+            return
+
+        con = engine.con
+        try:
+            con.execute("BEGIN IMMEDIATE;")
+        except Exception as e:
+            [r.future.set_exception(e) for r in group]
+            return
+
+        results = []
+        for request in group:
+            con.execute("SAVEPOINT weetags_request;")
+            try:
+                res = getattr(engine, request.method)(*request.args, **request.kwargs)
+            except Exception as e:
+                con.execute("ROLLBACK TO weetags_request;")
+                con.execute("RELEASE weetags_request;")
+                results.append((request, None, e))
+            else:
+                con.execute("RELEASE weetags_request;")
+                results.append((request, res, None))
+
+        try:
+            con.commit()
+        except Exception as e:
+            con.rollback()
+            [r.future.set_exception(e) for r in group]
+            return
+
+        for request, res, error in results:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(res)
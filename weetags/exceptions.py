@@ -49,6 +49,20 @@ class OutputError(WeetagsException):
     def __init__(self, relation: str, expected:str) -> None:
         super().__init__(self.message.format(relation=relation, expected=expected))
 
+class QueryTimeout(WeetagsException):
+    message = """Query exceeded its deadline of {deadline}s"""
+    status = 504
+    def __init__(self, deadline: float) -> None:
+        self.deadline = deadline
+        super().__init__(self.message.format(deadline=deadline))
+
+class QueryInterrupted(WeetagsException):
+    message = """Query interrupted"""
+    status = 503
+    def __init__(self, ) -> None:
+        super().__init__(self.message)
+
+
 
 class MissingLogin(WeetagsException):
     message = """You must provide a username and a password"""
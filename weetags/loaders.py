@@ -1,13 +1,29 @@
+import io
+import bz2
+import csv
+import gzip
 import json
-from typing import Any, Generator
-
-from weetags.exceptions import NotImplemented
+import lzma
+from typing import Any, Generator, TextIO
 
 
 Payload = dict[str, Any]
 TableName = FieldName = str
 
+BUFFER_SIZE = 1 << 20
+WHITESPACES = " \t\n\r"
+# decoding errors raised that close to the end of the buffer may come from a cut token, such as `-Infinity` or `\uXXXX`.
+TRUNCATION_MARGIN = 16
+COMPRESSIONS = {
+    "gz": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zst": b"\x28\xb5\x2f\xfd",
+}
+
 class Loader(object):
+    compression: str | None = None
+
     def __init__(self, data: list[Payload]) -> None:
         self.data = data
         self.loader = self.default_loader
@@ -18,41 +34,199 @@ class Loader(object):
 
 
 class JsonLoader(Loader):
-    def __init__(self, fp: str, strategy: str= "default") -> None:
+    def __init__(self, fp: str, strategy: str= "default", compression: str | None = None) -> None:
         self.fp = fp
+        self.compression = compression or infer_compression(fp)
         self.loader = {
             "default": self.default_loader,
             "lazy": self.lazy_loader
         }[strategy]
 
     def default_loader(self) -> Generator:
-        with open(self.fp) as f:
-            data = iter(json.load(f))
-            while line := next(data, None):
-                yield line
+        with open_source(self.fp, self.compression) as f:
+            yield from json.load(f)
 
     def lazy_loader(self) -> Generator:
-        raise NotImplemented()
+        """stream the records of a json array, without loading the whole file."""
+        with open_source(self.fp, self.compression) as f:
+            yield from iter_json_array(f)
 
 
 class JlLoader(Loader):
-    def __init__(self, fp: str, strategy: str= "default") -> None:
+    def __init__(self, fp: str, strategy: str= "default", compression: str | None = None) -> None:
         self.fp = fp
+        self.compression = compression or infer_compression(fp)
         self.loader = {
             "default": self.default_loader,
             "lazy": self.lazy_loader
         }[strategy]
 
     def default_loader(self) -> Generator:
-        with open(self.fp) as f:
-            data = iter([json.loads(line) for line in f.readlines()])
-            while line := next(data, None):
-                yield line
+        with open_source(self.fp, self.compression) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
 
     def lazy_loader(self) -> Generator:
-        with open(self.fp) as f:
-            while line := f.readline():
-                yield json.loads(line.strip("\n"))
+        yield from self.default_loader()
 
     def __call__(self) -> Any:
         yield from self.loader()
+
+
+class CsvLoader(Loader):
+    """
+    Load records from a delimited file with a header row.
+    Without `columns`, values are loaded as strings. `columns` maps column names to their dtype
+    (`TEXT`, `INTEGER`, `REAL`, `BOOL`, `JSON`, `JSONLIST`), collections being stored as json strings.
+    Empty cells are loaded as `None`.
+    """
+    delimiter = ","
+
+    def __init__(
+        self,
+        fp: str,
+        strategy: str= "default",
+        compression: str | None = None,
+        columns: dict[str, str] | None = None,
+        delimiter: str | None = None
+    ) -> None:
+        self.fp = fp
+        self.compression = compression or infer_compression(fp)
+        self.columns = columns
+        self.delimiter = delimiter or self.delimiter
+        self.loader = {
+            "default": self.default_loader,
+            "lazy": self.default_loader
+        }[strategy]
+
+    def default_loader(self) -> Generator:
+        with open_source(self.fp, self.compression) as f:
+            reader = csv.DictReader(f, delimiter=self.delimiter)
+            for row in reader:
+                yield {k: self.convert(k, v) for k, v in row.items()}
+
+    def convert(self, column: str, value: str | None) -> Any:
+        if value is None or value == "":
+            return None
+        if self.columns is None:
+            return value
+
+        dtype = self.columns.get(column, "TEXT")
+        match dtype:
+            case "TEXT":
+                return value
+            case "INTEGER":
+                return int(value)
+            case "REAL":
+                return float(value)
+            case "BOOL":
+                return value.strip().lower() in ("1", "true", "t", "yes", "y")
+            case "JSON" | "JSONLIST":
+                return json.loads(value)
+            case _:
+                raise ValueError(f"column `{column}` has an unknown dtype: {dtype}")
+
+
+class TsvLoader(CsvLoader):
+    delimiter = "\t"
+
+
+def infer_compression(fp: str) -> str | None:
+    """infer the compression of a file, from its extension or from its magic bytes."""
+    ext = str(fp).split(".")[-1]
+    if ext in COMPRESSIONS:
+        return ext
+    with open(fp, "rb") as f:
+        head = f.read(6)
+    for compression, magic in COMPRESSIONS.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_source(fp: str, compression: str | None = None) -> TextIO:
+    """open a text stream over a file, decompressing it on the fly."""
+    match compression:
+        case None:
+            return open(fp, encoding="utf-8", buffering=BUFFER_SIZE)
+        case "gz":
+            return gzip.open(fp, "rt", encoding="utf-8")
+        case "bz2":
+            return bz2.open(fp, "rt", encoding="utf-8")
+        case "xz":
+            return lzma.open(fp, "rt", encoding="utf-8")
+        case "zst":
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("Reading zstandard files requires the `zstd` extra: pip install weetags[zstd]")
+            raw = open(fp, "rb")
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+            return io.TextIOWrapper(io.BufferedReader(stream, BUFFER_SIZE), encoding="utf-8")
+        case _:
+            raise ValueError(f"Unknown compression: {compression}")
+
+
+def iter_json_array(f: TextIO, chunk_size: int = BUFFER_SIZE) -> Generator:
+    """
+    incrementally decode the elements of a json array from a text stream.
+    only the element being decoded is kept in memory, along with a chunk of the stream.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    # next expected token: the opening bracket, the first element, a separator, an element, or nothing but whitespaces.
+    expect = "["
+    while True:
+        while pos < len(buffer) and buffer[pos] in WHITESPACES:
+            pos += 1
+        if pos == len(buffer):
+            if eof and expect == "end":
+                return
+            elif eof:
+                raise ValueError("Unexpected end of file: json array is not closed")
+            chunk = f.read(chunk_size)
+            eof = len(chunk) == 0
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        char = buffer[pos]
+        if expect == "[":
+            if char != "[":
+                raise ValueError("Json data must be an array of records")
+            expect, pos = "first", pos + 1
+            continue
+        elif expect == "end":
+            raise ValueError(f"Unexpected data after the json array: `{char}`")
+        elif char == "]" and expect in ("first", "separator"):
+            expect, pos = "end", pos + 1
+            continue
+        elif expect == "separator":
+            if char != ",":
+                raise ValueError(f"Json array elements must be separated by a single comma, found `{char}`")
+            expect, pos = "element", pos + 1
+            continue
+        elif char == ",":
+            raise ValueError("Json array elements must be separated by a single comma")
+
+        try:
+            element, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            # only an element cut by the end of the buffer is worth reading further, any other error is final.
+            if eof or not is_truncated(e, len(buffer)):
+                raise
+            end = None
+
+        # the element might be truncated by the end of the chunk
+        if end is None or (end == len(buffer) and not eof):
+            chunk = f.read(chunk_size)
+            eof = len(chunk) == 0
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield element
+        expect, pos = "separator", end
+
+
+def is_truncated(error: json.JSONDecodeError, size: int) -> bool:
+    """whether a decoding error can be caused by the end of a buffer of `size` characters, rather than malformed json."""
+    return error.msg.startswith("Unterminated string") or error.pos >= size - TRUNCATION_MARGIN
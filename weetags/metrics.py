@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from time import perf_counter
+from bisect import bisect_left
+from functools import wraps
+
+from typing import Any, Callable
+
+from attrs import define, field
+
+# latency histogram buckets upper bounds, in seconds.
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+
+class MetricsSink:
+    """Receive one record per instrumented call. Subclass it to forward metrics to a monitoring system."""
+
+    def record(self, method: str, elapsed: float, statements: int) -> None:
+        raise NotImplementedError
+
+
+@define(slots=True)
+class MethodStats:
+    count: int = field(default=0)
+    statements: int = field(default=0)
+    total: float = field(default=0.0)
+    max: float = field(default=0.0)
+    histogram: list[int] = field(factory=lambda: [0 for _ in BUCKETS])
+
+    def add(self, elapsed: float, statements: int) -> None:
+        self.count += 1
+        self.statements += statements
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.histogram[bisect_left(BUCKETS, elapsed)] += 1
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "statements": self.statements,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "histogram": {f"<={b}": n for b, n in zip(BUCKETS, self.histogram) if n > 0}
+        }
+
+
+class TreeStats(MetricsSink):
+    """In memory sink, aggregating counts, statements and latency histograms per method."""
+
+    def __init__(self) -> None:
+        self.methods: dict[str, MethodStats] = {}
+
+    def record(self, method: str, elapsed: float, statements: int) -> None:
+        stats = self.methods.get(method, None)
+        if stats is None:
+            stats = self.methods[method] = MethodStats()
+        stats.add(elapsed, statements)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        return {method: stats.summary() for method, stats in self.methods.items()}
+
+
+class Metrics:
+    """
+    Instrumentation state of an engine.
+    Statements are counted through the connection trace callback, statements run by triggers excluded.
+    Only the outermost public call is recorded, so a method statements include the ones of the methods it calls.
+    """
+
+    def __init__(self, sink: MetricsSink | None = None) -> None:
+        self.stats = TreeStats()
+        self.sink = sink
+        self.statements = 0
+        self.depth = 0
+
+    def trace(self, statement: str) -> None:
+        if not statement.startswith("--"):
+            self.statements += 1
+
+    def record(self, method: str, elapsed: float, statements: int) -> None:
+        self.stats.record(method, elapsed, statements)
+        if self.sink is not None:
+            self.sink.record(method, elapsed, statements)
+
+
+def timed(f: Callable) -> Callable:
+    """record the latency and statements of an engine primitive, when metrics are enabled."""
+    @wraps(f)
+    def wrapped(engine, *args, **kwargs):
+        metrics = engine.metrics
+        if metrics is None:
+            return f(engine, *args, **kwargs)
+        statements, start = metrics.statements, perf_counter()
+        try:
+            return f(engine, *args, **kwargs)
+        finally:
+            metrics.record(f.__name__, perf_counter() - start, metrics.statements - statements)
+    return wrapped
+
+
+def instrumented(cls: type) -> type:
+    """record every public method of a class, when metrics are enabled."""
+    def instrument(name: str, f: Callable) -> Callable:
+        @wraps(f)
+        def wrapped(tree, *args, **kwargs):
+            metrics = tree.metrics
+            if metrics is None or metrics.depth > 0:
+                return f(tree, *args, **kwargs)
+            statements, start = metrics.statements, perf_counter()
+            metrics.depth += 1
+            try:
+                return f(tree, *args, **kwargs)
+            finally:
+                metrics.depth -= 1
+                metrics.record(name, perf_counter() - start, metrics.statements - statements)
+        return wrapped
+
+    for name, attr in list(cls.__dict__.items()):
+        if name.startswith("_") or not callable(attr) or isinstance(attr, (staticmethod, classmethod, type)):
+            continue
+        if name in ["stats", "enable_metrics", "disable_metrics", "interrupt"]:
+            continue
+        setattr(cls, name, instrument(name, attr))
+    return cls
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+
+from typing import Any, Callable, Iterator
+
+from weetags.loaders import Loader, JlLoader
+from weetags.utils import infer_model, merge_dtype, check_record
+
+Payload = dict[str, Any]
+Row = tuple[Any, ...]
+Model = dict[str, str]
+
+
+class ParallelLoader:
+    """
+    Decode Jsonlines sources within a pool of worker processes.
+    Files are split into byte ranges ending on a newline, each range being decoded by a worker.
+    Workers send back flat rows with collections already serialized, as unpickling nested dictionaries
+    costs as much as decoding them. Chunks are consumed in the sources order, so parents still come before their children.
+    Sources that cannot be split, such as compressed files, are consumed inline, in order.
+    """
+    def __init__(self, sources: list[Loader], workers: int | None = None, chunk_size: int = 1 << 22) -> None:
+        self.sources = sources
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def rows(self, columns: list[str], model: Model | None = None) -> Iterator[Row]:
+        """yield every record as a tuple of `columns` values. Records are checked against `model` when given."""
+        def inline(source: Loader) -> Iterator[list[Row]]:
+            for record in source.loader():
+                if model is not None:
+                    check_record(record, model)
+                yield [to_row(record, columns)]
+
+        for rows in self._map(encode_chunk, inline, columns, model):
+            yield from rows
+
+    def infer_model(self) -> Model:
+        """infer the data model, each worker inferring the model of its own chunks."""
+        def inline(source: Loader) -> Iterator[Model]:
+            yield infer_model(source.loader())
+
+        model = {}
+        for partial in self._map(infer_chunk, inline):
+            for fname, dtype in partial.items():
+                merge_dtype(model, fname, dtype)
+        return model
+
+    def _map(self, task: Callable, inline: Callable, *args: Any) -> Iterator[Any]:
+        with ProcessPoolExecutor(self.workers) as pool:
+            pending: deque[Future] = deque()
+            window = self.workers * 2
+            for source in self.sources:
+                if not isinstance(source, JlLoader) or source.compression is not None:
+                    while len(pending) > 0:
+                        yield pending.popleft().result()
+                    yield from inline(source)
+                    continue
+
+                for start, end in chunk_offsets(source.fp, self.chunk_size):
+                    pending.append(pool.submit(task, source.fp, start, end, *args))
+                    if len(pending) >= window:
+                        yield pending.popleft().result()
+            while len(pending) > 0:
+                yield pending.popleft().result()
+
+
+def chunk_offsets(fp: str, chunk_size: int) -> list[tuple[int, int]]:
+    """split a file into (start, end) byte ranges of roughly `chunk_size` bytes, each ending on a newline."""
+    size = os.path.getsize(fp)
+    offsets, start = [], 0
+    with open(fp, "rb") as f:
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()
+            end = f.tell()
+            offsets.append((start, end))
+            start = end
+    return offsets
+
+
+def read_chunk(fp: str, start: int, end: int) -> Iterator[Payload]:
+    with open(fp, "rb") as f:
+        f.seek(start)
+        lines = f.read(end - start).splitlines()
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def encode_chunk(fp: str, start: int, end: int, columns: list[str], model: Model | None = None) -> list[Row]:
+    rows = []
+    for record in read_chunk(fp, start, end):
+        if model is not None:
+            check_record(record, model)
+        rows.append(to_row(record, columns, encode=True))
+    return rows
+
+
+def infer_chunk(fp: str, start: int, end: int) -> Model:
+    return infer_model(read_chunk(fp, start, end))
+
+
+def to_row(record: Payload, columns: list[str], encode: bool = False) -> Row:
+    if not encode:
+        return tuple([record.get(c, None) for c in columns])
+
+    row = []
+    for c in columns:
+        value = record.get(c, None)
+        if isinstance(value, (list, dict)):
+            value = json.dumps(value)
+        row.append(value)
+    return tuple(row)
+
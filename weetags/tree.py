@@ -1,15 +1,18 @@
 from __future__ import annotations
 
-import copy
 import json
 from pathlib import Path
 from hashlib import sha1
 from collections import deque
 from itertools import chain
-from typing import Literal, Optional, Any
+from functools import partial
+from threading import RLock, get_ident
+from typing import Literal, Optional, Iterator, Any
 
 from weetags.engine.engine import TreeEngine
-from weetags.utils import valid_creation, valid_update, valid_append, apply_handler, ErrorHandler
+from weetags.engine.writer import TreeWriter
+from weetags.metrics import MetricsSink, instrumented
+from weetags.utils import valid_creation, valid_update, valid_append, queued, guarded, apply_handler, ErrorHandler
 
 Nid = str
 StrOrPath = str | Path
@@ -24,6 +27,7 @@ Relations = Literal["parent", "children", "siblings", "ancestors", "descendants"
 
 
 # @apply_handler(ErrorHandler)
+@instrumented
 class Tree(TreeEngine):
     """
     A Tree Reprensation based on the Sqlite Engine. Able to realise basic graph operations on trees.
@@ -35,6 +39,9 @@ class Tree(TreeEngine):
         :tree_size: (int) number of nodes contained in the tree.
         :tree_depth: (int) maximum number of depth in the tree.
         :info: (dict[str, Any]) summary of tree data.
+        :writer: (TreeWriter | None) writer thread handling mutations, when started with `start_writer`.
+        :in_memory: (bool) whether the tree is served from a private in memory copy of its database.
+        :metrics: (Metrics | None) instrumentation of the tree operations, when enabled with `enable_metrics`.
     :warnings:
         :efficiency: As SQlite is not a native Graphdb, Large operation recquiring to walk accross the whole tree tend to be inneficients.
         Large but relatively light trees can be better off Being cached rather than stored in a database.
@@ -45,14 +52,19 @@ class Tree(TreeEngine):
         tree_name: str,
         database: Optional[str] = ":memory:",
         timeout: float = 5,
+        in_memory: bool = False,
         **params: Any) -> None:
         super().__init__(tree_name, database, timeout, **params)
-        self._build_tree_context(tree_name)
+        root_id = self._build_tree_context(tree_name)
         self.name = tree_name
         self.remove_orphans = True
-        self.root_id = None
-        if self.tree_size > 0:
-            self.root_id = self.root
+        self.writer = None
+        self.in_memory = False
+        self._write_lock = RLock()
+        self._explaining = None
+        if in_memory:
+            self.load_into_memory()
+        self.root_id = self._resolve_root(root_id)
 
     def __repr__(self) -> str:
         return f"<Tree name: {self.name}, size: {self.tree_size}, depth: {self.tree_depth}>"
@@ -64,8 +76,8 @@ class Tree(TreeEngine):
 
     @property
     def tree_depth(self) -> int:
-        metadata = self.tables["metadata"]._name
-        return self._max_depth(metadata)
+        metadata_table, _ = self.metadata_location
+        return self._max_depth(metadata_table)
 
     @property
     def root(self) -> dict[str, Any]:
@@ -81,6 +93,183 @@ class Tree(TreeEngine):
             "model": {f.fname:f.ftype for f in self.namespaces.values()}
         }
 
+    def load_into_memory(self) -> None:
+        """
+        Copy the tree database into memory with the sqlite backup API, and serve every operation from this copy.
+        The database file is left untouched: mutations only apply to the in memory copy, unless saved with `persist`.
+        """
+        if self.in_memory:
+            return
+        if self.writer is not None:
+            raise ValueError("Stop the writer thread before loading the tree into memory.")
+        self._load_into_memory()
+        self.in_memory = True
+
+    def persist(self, path: StrOrPath) -> None:
+        """Write a consistent snapshot of the tree database into `path`, while the tree keeps serving operations."""
+        self._backup(str(path))
+
+    def start_writer(self, max_delay: float = 0.005, max_batch: int = 256) -> None:
+        """
+        Route every mutation through a single writer thread owning its own connection.
+        Concurrent mutations are committed by groups of at most `max_batch` requests, collected during `max_delay` seconds.
+        While the writer runs, mutation methods return a `concurrent.futures.Future`.
+        """
+        if self.writer is not None:
+            return
+        if self.database == ":memory:" or self.in_memory:
+            raise ValueError("A writer thread requires a database file. in memory databases are not shared between connections.")
+        factory = partial(type(self), self.tree_name, self.database, self.timeout, **self.params)
+        self.writer = TreeWriter(factory, max_delay, max_batch)
+
+    def stop_writer(self) -> None:
+        """commit the remaining queued mutations and stop the writer thread."""
+        if self.writer is None:
+            return
+        writer, self.writer = self.writer, None
+        writer.close()
+
+    def track_changes(self) -> None:
+        """
+        start logging every mutation of the tree into the `{tree}__changes` table.
+        As a schema change, it runs on the tree connection and requires the writer thread to be stopped.
+        """
+        self._check_no_writer()
+        if "changes" not in self.tables:
+            self._create_changes_log()
+            self._refresh_context()
+
+    def changes_since(self, seq: int = 0, limit: Optional[int] = None) -> list[dict[str, Any]]:
+        """
+        the logged mutations with a sequence number greater than `seq`, ordered by sequence number.
+        Use `limit` to read large logs by pages, from the last sequence number read.
+        Each change is formatted as: `{"seq": 1, "op": "insert" | "update" | "delete", "nid": "NodeId", "changed": [fields]}`.
+        """
+        if "changes" not in self.tables:
+            raise ValueError(f"tree: {self.name} does not track changes. Consider enabling it with `track_changes`")
+        return self._changes_since(seq, limit).fetchall()
+
+    @queued
+    def prune_changes(self, seq: int) -> None:
+        """remove the logged mutations with a sequence number lower or equal than `seq`."""
+        if "changes" not in self.tables:
+            raise ValueError(f"tree: {self.name} does not track changes. Consider enabling it with `track_changes`")
+        self._prune_changes(seq)
+
+    @property
+    def indexes(self) -> list[str]:
+        """names of the indexes and index tables of the tree."""
+        indexes = [name for name, _ in self._get_indexes(self.tree_name)]
+        index_tables = [t._name for k, t in self.tables.items() if k not in ["nodes", "metadata", "changes"]]
+        return index_tables + indexes
+
+    def create_index(
+        self,
+        fields: str | list[str],
+        where: Conditions = None,
+        unique: bool = False,
+        name: Optional[str] = None
+    ) -> str:
+        """
+        Index an existing tree, and return the index name.
+        A single `list` field, or `dict` path such as `dict.x`, is indexed as with `TreeBuilder.build_tree(indexes=...)`,
+        from the nodes already stored. Otherwise, `fields` can list several fields of the same table, nodes or metadata,
+        for composite and covering indexes. `where` restricts a partial index to the nodes complying with the conditions.
+        As a schema change, it runs on the tree connection and requires the writer thread to be stopped.
+        """
+        self._check_no_writer()
+        if isinstance(fields, str):
+            fields = [fields]
+        if len(fields) == 1 and where is None and not unique and name is None:
+            fname = fields[0]
+            base = self.namespaces.get(fname.split(".")[0], None)
+            is_list = base is not None and base.ftype == "JSONLIST" and fname not in self.tables
+            is_path = base is not None and base.ftype == "JSON" and fname.replace(".", "_") not in self.namespaces
+            if is_list or is_path:
+                index = self._create_field_index(fname)
+                self._refresh_context()
+                return index
+        index = self._create_composite_index(fields, where, unique, name)
+        self._refresh_context()
+        return index
+
+    def drop_index(self, name: str) -> None:
+        """
+        Drop an index, or an index table along with the triggers keeping it in sync.
+        The parent index cannot be dropped: children and relations are read from it.
+        As a schema change, it runs on the tree connection and requires the writer thread to be stopped.
+        """
+        self._check_no_writer()
+        if name not in self.indexes:
+            raise KeyError(f"Unknown index: {name}")
+        if name == f"idx_{self.tables['nodes']._name}_parent":
+            raise ValueError(f"{name} cannot be dropped: children and relations are read from it.")
+        self._drop_index(name)
+        self._refresh_context()
+
+    def interrupt(self) -> None:
+        """
+        abort the operation running on this tree, from another thread. The operation raises `QueryInterrupted`.
+        Mutations queued to the writer thread are not interrupted.
+        """
+        self._interrupt()
+
+    def enable_metrics(self, sink: Optional[MetricsSink] = None) -> None:
+        """
+        Record the latency and the number of sql statements of every public method call, and of the engine primitives.
+        Records are aggregated in `stats`, and forwarded to `sink` when given.
+        """
+        self._enable_metrics(sink)
+
+    def disable_metrics(self) -> None:
+        self._disable_metrics()
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Aggregated metrics, per method: `{"count", "statements", "total", "mean", "max", "histogram"}`.
+        Latencies are expressed in seconds, histograms map buckets upper bounds to calls counts.
+        """
+        if self.metrics is None:
+            raise ValueError(f"tree: {self.name} metrics are not enabled. Consider enabling them with `enable_metrics`")
+        return self.metrics.stats.snapshot()
+
+    def explain(self, method: str, **kwargs: Any) -> list[dict[str, Any]]:
+        """
+        Run a public method of the tree, and return the statements it issued along with their query plan.
+        Mutations are rolled back: the tree is left untouched.
+        Each statement is formatted as: `{"sql": str, "params": list, "plan": [str], "warnings": [str]}`.
+        Warnings flag full table scans, temporary b-trees and automatic indexes.
+        """
+        if method.startswith("_") or not callable(getattr(self, method, None)):
+            raise ValueError(f"Unknown tree method: {method}")
+
+        # explained mutations bypass the writer and run on this connection, and are rolled back.
+        # the write lock keeps the other threads mutations out of the capture.
+        with self._write_lock:
+            self._explaining = get_ident()
+            try:
+                with self._capture() as statements:
+                    res = getattr(self, method)(**kwargs)
+                    if isinstance(res, Iterator):
+                        list(res)
+            finally:
+                self._explaining = None
+                self._build_tree_context(self.tree_name)
+
+        explained = []
+        for stmt, params in statements:
+            if stmt.lstrip().split(" ")[0].upper() not in ["SELECT", "INSERT", "UPDATE", "DELETE", "WITH"]:
+                continue
+            plan = self._explain(stmt, params)
+            explained.append({
+                "sql": stmt,
+                "params": list(params),
+                "plan": [step["detail"] for step in plan],
+                "warnings": self._plan_warnings(plan, stmt)
+            })
+        return explained
+
+    @guarded
     def export(self, path: StrOrPath, fields: Optional[Fields] = None) -> None:
         filtered = ["depth", "is_root","is_leaf", "nid"]
         base = self.node(self.root_id, fields)
@@ -93,12 +282,15 @@ class Tree(TreeEngine):
             node = {k:v for k,v in base.items() if k not in filtered}
             f.write(f"{json.dumps(base)}\n")
             for node in self.descendants_nodes(self.root_id, fields):
+                self._check_deadline()
                 node = {k:v for k,v in node.items() if k not in filtered}
                 f.write(f"{json.dumps(node)}\n")
 
+    @guarded
     def node(self, nid: Nid, fields: Fields = None) -> Node:
         return self._read_one(fields=fields, conditions=[[("id", "=", nid)]])
 
+    @guarded
     def nodes_where(
         self,
         conditions: Optional[Conditions] = None,
@@ -109,6 +301,7 @@ class Tree(TreeEngine):
         ) -> Nodes:
         return self._read_many(fields, conditions, order_by, limit, axis)
 
+    @guarded
     def nodes_relation_where(
         self,
         relation: Relations,
@@ -127,9 +320,10 @@ class Tree(TreeEngine):
             "descendants": self.descendants_nodes
         }
         callback = relations.get(relation)
-        nodes = self._nodes_where(conditions, list(set(["id"] + fields)), order, axis, limit)
+        nodes = self.nodes_where(conditions, list(set(["id"] + fields)) if fields else None, order, axis, limit)
         res = {}
         for node in nodes:
+            self._check_deadline()
             related = callback(node["id"], fields)
             if include_base:
                 res.update({sha1(json.dumps(node).encode()).hexdigest(): node})
@@ -139,97 +333,96 @@ class Tree(TreeEngine):
                 res.update({sha1(json.dumps(related).encode()).hexdigest(): related})
         return list(res.values())
             
-    def parent_node(self, nid: Nid, fields: Optional[Fields] = None) -> Node:
-        node = self.node(nid, ["id","parent"])
-        if node is None:
-            return None
-        return self.node(node["parent"], fields)
+    @guarded
+    def parent_node(self, nid: Nid, fields: Optional[Fields] = None, conditions: Optional[Conditions] = None) -> Node:
+        nodes = self._read_relation("parent", nid, fields, conditions, limit=1)
+        return nodes[0] if len(nodes) > 0 else None
 
+    @guarded
     def children_nodes(
         self, 
         nid: Nid, 
         fields: Optional[Fields] = None,
         order_by: Optional[Fields] = None,
         axis: Optional[int] = 1,
-        limit: Optional[int | None] = None
+        limit: Optional[int | None] = None,
+        conditions: Optional[Conditions] = None
     ) -> Nodes:
-        node = self.node(nid, ["id","children"])
-        if node is None:
-            return []
-        return self.nodes_where([[("id","IN", node["children"])]], fields, order_by, axis, limit)
+        return self._read_relation("children", nid, fields, conditions, order_by, limit, axis)
 
+    @guarded
     def siblings_nodes(
         self, 
         nid: Nid, 
         fields: Optional[Fields] = None,
         order_by: Optional[Fields] = None,
         axis: Optional[int] = 1,
-        limit: Optional[int | None] = None
+        limit: Optional[int | None] = None,
+        conditions: Optional[Conditions] = None
         ) -> Nodes:
-        node = self.node(nid, ["id","parent"])
-        if node is None:
-            return []
-        pnode = self.node(node["parent"], ["children"])
-        if pnode is None:
-            return []
-        return self.nodes_where([[("id", "IN", pnode["children"]), ("id", "!=", nid)]], fields, order_by, axis, limit)
-
+        return self._read_relation("siblings", nid, fields, conditions, order_by, limit, axis)
 
+    @guarded
     def ancestors_nodes(
         self,
         nid: Nid, 
         fields: Optional[Fields] = None,
         axis: Optional[int] = 1,
-        limit: Optional[int | None] = None 
+        limit: Optional[int | None] = None,
+        order_by: Optional[Fields] = None,
+        conditions: Optional[Conditions] = None,
+        min_depth: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        absolute: bool = False
     ) -> Nodes:
-        remove_parent= False
-        if fields is not None and "parent" not in fields:
-            # force parent, as needed to go up ancestors
-            remove_parent = True
-            fields =  ["parent"] + fields
-
-
-        node = self.node(nid, ["id","parent"])
-        if node is None:
+        """
+        ancestors, from the parent up to the root unless ordered by `order_by`.
+        `min_depth` and `max_depth` count levels up from the node, or from the root when `absolute`.
+        """
+        distances = self._distances(nid, "ancestors", min_depth, max_depth, absolute)
+        if distances is None:
             return []
+        return self._read_relation("ancestors", nid, fields, conditions, order_by, limit, axis, *distances)
 
-        ancestors = []
-        while node["parent"]:
-            node = self.node(node["parent"], fields)
-            if remove_parent:
-                payload = copy.deepcopy(node)
-                payload.pop("parent", None)
-                ancestors.append(payload)
-            else:
-                ancestors.append(node)
-
-        if axis != 1 or limit is not None:
-            ancestors = self._parse_selection(ancestors, None, axis, limit)
-        return ancestors
-
+    @guarded
     def descendants_nodes(
         self,
         nid: Nid,
         fields: Optional[Fields] = None,
         axis: Optional[int] = 1,
-        limit: Optional[int | None] = None
+        limit: Optional[int | None] = None,
+        order_by: Optional[Fields] = None,
+        conditions: Optional[Conditions] = None,
+        min_depth: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        absolute: bool = False
     ) -> Nodes:
-        node = self.node(nid, ["id","children"])
-        if node is None:
+        """
+        descendants, level by level unless ordered by `order_by`. The subtree is walked lazily: `limit` stops the walk.
+        `min_depth` and `max_depth` count levels down from the node, or from the root when `absolute`.
+        The walk stops at `max_depth`, so the cost is bounded by the levels actually read.
+        """
+        distances = self._distances(nid, "descendants", min_depth, max_depth, absolute)
+        if distances is None:
             return []
+        return self._read_relation("descendants", nid, fields, conditions, order_by, limit, axis, *distances)
 
-        descendants, queue = [], deque(node["children"])
-        while len(queue) > 0:
-            cid = queue.pop()
-            node = self.node(cid, fields)
-            children = self.node(cid, ["children"])
-            queue.extendleft(children["children"]) # weird to do that, have to do 2 I/O operations
-            descendants.append(node)
-
-        if axis != 1 or limit is not None:
-            descendants = self._parse_selection(descendants, None, axis, limit)
-        return descendants
+    @guarded
+    def level_nodes(
+        self,
+        nid: Nid,
+        depth: int,
+        fields: Optional[Fields] = None,
+        axis: Optional[int] = 1,
+        limit: Optional[int | None] = None,
+        order_by: Optional[Fields] = None,
+        conditions: Optional[Conditions] = None,
+        absolute: bool = False
+    ) -> Nodes:
+        """descendants `depth` levels below the node, or at `depth` in the tree when `absolute`."""
+        return self.descendants_nodes(nid, fields, axis, limit, order_by, conditions, depth, depth, absolute)
 
+    @guarded
     def orphans_nodes(
         self,
         fields: Optional[Fields] = None,
@@ -244,6 +437,7 @@ class Tree(TreeEngine):
                 break
         return orphans
 
+    @guarded
     def is_related(self, nid0: Nid, nid1: Nid, check_siblings: bool=False) -> bool:
         if nid0 == nid1:
             return True
@@ -262,6 +456,7 @@ class Tree(TreeEngine):
                 return True
         return False
 
+    @guarded
     def path(self, nid: Nid, to: Nid, fields: Optional[Fields] = None) -> Nodes:
         if fields is None:
             fields = []
@@ -270,6 +465,7 @@ class Tree(TreeEngine):
         to_node = [self.node(to, list(set(["id", "parent"] + fields)))]
         meetup = False
         while meetup is False:
+            self._check_deadline()
             if ((from_node[-1]["parent"] == to_node[-1]["id"]) or
                 (to_node[-1]["parent"] == from_node[-1]["id"])):
                 to_node.append(self.node(to_node[-1]["parent"], list(set(["id","parent"] + fields))))
@@ -285,6 +481,7 @@ class Tree(TreeEngine):
         return from_node[:-1] + to_node[::-1]
 
     @valid_creation
+    @queued
     def add_node(self, *, nid: Nid, parent: Nid | None, node_values: dict[str, Any] | None = None) -> None:
         node = {"id": nid, "parent": parent}
         if node_values is not None:
@@ -299,29 +496,35 @@ class Tree(TreeEngine):
             self._add_node(node, pnode["depth"] + 1)
 
     @valid_update
+    @queued
     def update_node(self, *, nid: Nid, set_values: Setter) -> None:
         self._update("nodes", set_values, [[("id", "=", nid)]])
 
     @valid_update
+    @queued
     def update_nodes_where(self, *, conditions: Conditions, set_values: Setter) -> None:
         nids = [n["id"] for n in self.nodes_where(conditions, ["id"])]
         self._update("nodes", set_values, [[("id", "IN", nids)]])
 
     @valid_append
+    @queued
     def append_node(self, *, nid: Nid, field_name: str, value: Any) -> None:
         base_value = self.node(nid, fields=[field_name]).get(field_name)
         self._update("nodes", [(field_name, base_value + [value])], [[("id","=",nid)]])
 
     @valid_append
+    @queued
     def extend_node(self, *, nid: Nid, field_name: str, values: list[Any]) -> None:
         base_value = self.node(nid, fields=[field_name]).get(field_name)
         self._update("nodes", [(field_name, base_value + values)], [[("id","=",nid)]])
 
+    @queued
     def delete_node(self, nid: Nid) -> None:
         self._delete_node(nid)
         if self.remove_orphans:
             self.delete_dead_branches()
 
+    @queued
     def delete_nodes_where(self, conditions: Optional[Conditions] = None) -> None:
         nodes = self.nodes_where(conditions, ["id"])
         for n in nodes:
@@ -332,11 +535,13 @@ class Tree(TreeEngine):
         if self.remove_orphans:
             self.delete_dead_branches()
 
+    @queued
     def delete_dead_branches(self) -> None:
         orphans = self.orphans_nodes(["id"])
         nodes = chain.from_iterable([[o] + self.descendants_nodes(o["id"], ["id"]) for o in orphans])
         [self._delete([[("id","=", node["id"])]]) for node in nodes]
 
+    @queued
     def delete_orphans(self):
         orphans = self.orphans_nodes(["id"])
         [self._delete([[("id","=", o["id"])]]) for o in orphans]
@@ -419,17 +624,47 @@ class Tree(TreeEngine):
         tree = self.draw_tree(nid, style, extra_space)
         print(tree)
 
+    def _check_no_writer(self) -> None:
+        if self.writer is not None:
+            raise ValueError("Stop the writer thread before changing the tree schema.")
+
+    def _refresh_context(self) -> None:
+        """reload the tree schema once changed, and cache it into the catalog."""
+        self._build_tree_context(self.tree_name)
+        self._write_catalog(self.tree_name, root_id=self.root_id)
+
     def _add_node(self, node: Node, depth: int=0, is_root: bool= False, is_leaf: bool = True) -> None:
+        if self.stores_positions:
+            # new nodes come last among their siblings.
+            node = {**node, "position": 0 if is_root else self._next_position(node["parent"])}
+        if self.inlines_metadata:
+            node = {**node, "depth": depth, "is_root": is_root, "is_leaf": is_leaf}
+            self._write_one("nodes", list(node.keys()), list(node.values()), "none")
+            return
         self._write_one("nodes", list(node.keys()), list(node.values()), "none")
         self._write_one("metadata", ["nid", "depth", "is_root", "is_leaf"], [node["id"], depth, is_root, is_leaf], "none")
 
+    def _set_leaf(self, nid: Nid, is_leaf: bool) -> None:
+        if self.inlines_metadata:
+            self._update("nodes", [("is_leaf", is_leaf)], [[("id", "=", nid)]])
+            return
+        self._update("metadata", [("is_leaf", is_leaf)], [[("nid", "=", nid)]])
+
     def _add_children(self, nid: Nid, cnid: Nid) -> Node:
+        if not self.stores_children:
+            pnode = self.node(nid, ["id", "depth"])
+            assert(pnode is not None)
+            self._set_leaf(pnode["id"], False)
+            return pnode
+
         pnode = self.node(nid, ["id", "depth", "children"])
         assert(pnode is not None)
 
-        pnode.update({"children": list((set(pnode["children"] + [cnid])))})
+        if cnid not in pnode["children"]:
+            # new children come last, as their position does.
+            pnode["children"].append(cnid)
         self._update("nodes", [("children", pnode["children"])], [[("id", "=", nid)]])
-        self._update("metadata", [("is_leaf", False)], [[("nid","=", pnode["id"])]])
+        self._set_leaf(pnode["id"], False)
         return pnode
 
     def _delete_node(self, nid: Nid) -> None:
@@ -442,28 +677,39 @@ class Tree(TreeEngine):
         self._delete([[("id", "=", nid)]])
 
     def _remove_children(self, nid: Nid, cnid: Nid):
+        if not self.stores_children:
+            return
         node = self.node(nid, ["id", "children"])
         if cnid in node["children"]:
             node["children"].remove(cnid)
         self._update("nodes", [("children", node["children"])], [[("id", "=", node["id"])]])
 
+    def _distances(
+        self,
+        nid: Nid,
+        relation: Literal["ancestors", "descendants"],
+        min_depth: int | None,
+        max_depth: int | None,
+        absolute: bool
+    ) -> tuple[int | None, int | None] | None:
+        """convert depth bounds into distances from the node. Absolute depths are offset by the node depth."""
+        if not absolute or (min_depth is None and max_depth is None):
+            return (min_depth, max_depth)
+        node = self.node(nid, ["depth"])
+        if node is None:
+            return None
+
+        depth = node["depth"]
+        if relation == "ancestors":
+            low = None if max_depth is None else depth - max_depth
+            high = None if min_depth is None else depth - min_depth
+        else:
+            low = None if min_depth is None else min_depth - depth
+            high = None if max_depth is None else max_depth - depth
+        if high is not None and high < 1:
+            return None
+        return (low, high)
+
     def _remove_parent(self, nid: Nid):
         node = self.node(nid, ["id"])
         self._update("nodes", [("parent", None)], [[("id", "=", node["id"])]])
-
-    def _parse_selection(
-        self, 
-        nodes: Nodes,
-        order_by: Fields,
-        axis: int,
-        limit: int | None
-    ) -> list[dict[str,Any]]:
-        if order_by:
-            nodes = sorted(nodes, key= lambda x: [x[f] for f in order_by])
-        if axis == 1 and limit:
-            nodes = nodes[:limit]
-        elif axis == 0 and limit:
-            nodes = nodes[::-1][:limit]
-        elif axis == 0 and limit is None:
-            nodes = nodes[::-1]
-        return nodes
\ No newline at end of file
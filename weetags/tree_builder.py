@@ -1,38 +1,57 @@
 from pathlib import Path
-from collections import defaultdict, deque
+from itertools import islice
+from contextlib import closing
 
 from typing import Any, Type, Literal, Iterator, Optional
 
 
-from weetags.utils import infer_dtype, infer_loader
+from weetags.utils import infer_loader, infer_model, parse_model, check_record
 from weetags.tree import Tree
-from weetags.loaders import Loader, JlLoader, JsonLoader
-from weetags.engine.engine import TreeEngine
+from weetags.loaders import Loader, JlLoader, JsonLoader, CsvLoader, TsvLoader
+from weetags.parallel import ParallelLoader, to_row
+from weetags.engine.engine import TreeEngine, METADATA_FIELDS
 from weetags.engine.schema import SimpleSqlField, SimpleSqlTable
-from weetags.engine.schema import NodesTable, MetadataTable, IndexTable 
+from weetags.engine.schema import NodesTable, MetadataTable
 
 StrOrPath = str | Path
-DataLoader = list[Type[Loader|JlLoader|JsonLoader]] | None
-Data = list[dict[str, Any]] | list[Type[Loader|JlLoader|JsonLoader]] | list[StrOrPath] | None
+DataLoader = list[Type[Loader|JlLoader|JsonLoader|CsvLoader|TsvLoader]] | None
+Data = list[dict[str, Any]] | list[Type[Loader|JlLoader|JsonLoader|CsvLoader|TsvLoader]] | list[StrOrPath] | None
 Loaders = Literal["default", "lazy"]
+Model = dict[str, str | type]
+Index = str | dict[str, str]
 
 class TreeBuilder(TreeEngine):
     data: DataLoader = None
     model: dict[str, Any] | None = None
     BATCH_SIZE = 500
     root_id = None
+    workers: int | None = None
+    check_records: bool = False
+    ordered: bool = True
+    store_children: bool = True
+    inline_metadata: bool = False
 
     def __init__(
         self,
         tree_name: str,
         database: Optional[str] = ":memory:",
         data: Optional[Data] = None,
+        workers: Optional[int] = None,
+        model: Optional[Model] = None,
+        sample: Optional[int] = None,
+        ordered: Optional[bool] = True,
+        store_children: Optional[bool] = True,
+        inline_metadata: Optional[bool] = False,
         **params: Optional[Any]
         ) -> None:
 
         super().__init__(tree_name, database, **params)
+        self.workers = workers
+        self.ordered = ordered
+        self.store_children = store_children
+        self.inline_metadata = inline_metadata
         self._set_loaders(data)
-        self._infer_model(None)
+        self._infer_model(model, sample)
         self._collect_tables()
 
     @classmethod
@@ -41,157 +60,242 @@ class TreeBuilder(TreeEngine):
         tree_name: str,
         database: Optional[str] = ":memory:",
         data: Optional[Data] = None,
-        indexes: Optional[list[str]] = None,
+        indexes: Optional[list[Index]] = None,
         read_only: Optional[bool] = False,
         replace: Optional[bool] = False,
+        track_changes: Optional[bool] = False,
+        workers: Optional[int] = None,
+        model: Optional[Model] = None,
+        sample: Optional[int] = None,
+        ordered: Optional[bool] = True,
+        sync: Optional[bool] = False,
+        in_memory: Optional[bool] = False,
+        store_children: Optional[bool] = True,
+        inline_metadata: Optional[bool] = False,
         **params: Any
     ) -> Tree:
-        builder = cls(tree_name, database, data, **params)
+        """
+        Build a tree and return it.
+        By default, the data model is infered from a first full pass over the data.
+        `model` skips the inference, and `sample` infers the model from the first `sample` records only.
+        In both cases, records are checked against the model while being loaded, so the data is read once.
+        `ordered=False` accepts records in any order. They are staged in a temporary table, checked for duplicated ids,
+        orphans and cycles, then loaded from root to leaves.
+        `sync=True` applies the data to an existing tree instead of rebuilding it: only the nodes that were added,
+        removed or modified are written, within a single transaction. Records can come in any order.
+        `in_memory=True` returns a tree served from an in memory copy of the database.
+        `store_children=False` builds a tree without a children column. Children are derived from the parent index
+        when read, so adding or deleting a node never rewrites its parent.
+        `inline_metadata=True` stores the nodes `depth`, `is_root` and `is_leaf` within the nodes table,
+        so reads filtering or sorting on them never join the metadata table.
+        """
+        builder = cls(tree_name, database, data, workers, model, sample, ordered, store_children, inline_metadata, **params)
         if (builder.data is None and not builder._get_tables(tree_name)) or (replace and not builder.data):
             raise ValueError("You must initialize the TreeBuilder with a data or a builded database.")
         
-        if replace:
-            builder.drop_tree()
-        if not builder._get_tables(tree_name) or replace:
+        if sync and not replace and builder.data and builder._get_tables(tree_name):
+            builder.sync_tree()
+        elif not builder._get_tables(tree_name) or replace:
+            # index specs are checked before the data is loaded, rather than once the load is over.
+            builder.check_indexes(indexes or [])
+            if replace:
+                builder.drop_tree()
             builder.build_tree_tables()
-            if indexes:
-                builder.build_indexes(indexes)
-            builder.populate_tree()
-        return Tree(tree_name=tree_name, database=database, read_only=read_only, **params)
+            try:
+                builder.populate_tree()
+                # indexes and their triggers are built from the loaded tables, rather than maintained row by row.
+                if indexes:
+                    builder.build_indexes(indexes)
+            except Exception:
+                # records are checked while being loaded, do not leave a partial tree behind.
+                builder.con.rollback()
+                builder.drop_tree()
+                raise
+        else:
+            builder.upgrade_tree()
+        if track_changes and "changes" not in builder.tables:
+            builder._create_changes_log()
+        # trees start from the catalog rather than from the db pragma.
+        if builder.root_id is None:
+            builder.root_id = builder._resolve_root(None)
+        builder._write_catalog(tree_name, root_id=builder.root_id)
+        return Tree(tree_name=tree_name, database=database, read_only=read_only, in_memory=in_memory, **params)
 
 
     @property
     def iter_data(self) -> Iterator:
         for source in self.data:
-            for node in source.loader():
-                yield node
+            # delegating lets `close` reach the loader, and its file.
+            yield from source.loader()
+
+    @property
+    def parallel(self) -> bool:
+        return self.workers is not None and self.workers > 1
+
+    def iter_rows(self, columns: list[str]) -> Iterator[tuple[Any, ...]]:
+        """iterate over the data records as tuples of `columns` values."""
+        model = self.model if self.check_records else None
+        if self.parallel:
+            yield from ParallelLoader(self.data, self.workers).rows(columns, model)
+            return
+
+        for node in self.iter_data:
+            if model is not None:
+                check_record(node, model)
+            yield to_row(node, columns)
+
+    def upgrade_tree(self) -> None:
+        """bring an existing tree up to date. Trees built by earlier versions get their parent index."""
+        self._create_parent_index()
 
     def drop_tree(self) -> None:
         tables = self._get_tables(self.tree_name)
         for table in tables:
             self._drop(table[0])
+        self._delete_catalog(self.tree_name)
     
     def build_tree_tables(self) -> None:
-        tables = [self.tables["nodes"], self.tables["metadata"]]
+        tables = [self.tables[k] for k in ["nodes", "metadata"] if k in self.tables]
         self._create_tables(*tables)
 
-    def build_indexes(self, indexes: list[str]) -> None:
-        nodes_table = self.tables["nodes"]
-        for fname in indexes:
-            field = getattr(self.tables["nodes"], fname.split(".")[0], None)
-            if field is None:
-                raise ValueError(f"Building Index: field {fname} does not exist")            
-
-            if field.dtype == "JSON":
-                target = fname.split(".")[0]
-                path_name = fname.replace(".", "_")
-
-                index_table = IndexTable.initialize(self.tree_name, path_name, "TEXT")
-                self.tables[path_name] = index_table
-                self._create_tables(index_table)
-                # self._create_index(index_table, fname)
-                self._create_triggers(index_table, target, fname)
-
-            elif field.dtype == "JSONLIST":
-                index_table = IndexTable.initialize(self.tree_name, fname, "TEXT")
-                self.tables[fname] = index_table
-                self._create_tables(index_table)
-                self._create_index(index_table, fname)
-                self._create_triggers(index_table, fname)
-            else:
-                self._create_index(nodes_table, fname)
+    def check_indexes(self, indexes: list[Index]) -> None:
+        for index in indexes:
+            self._check_field_index(*self._index_spec(index))
+
+    def build_indexes(self, indexes: list[Index]) -> None:
+        for index in indexes:
+            self._create_field_index(*self._index_spec(index))
+
+    @staticmethod
+    def _index_spec(index: Index) -> tuple[str, str | None]:
+        if isinstance(index, dict):
+            return (index["field"], index.get("kind", None))
+        return (index, None)
 
     def populate_tree(self) -> None:
         if self.data is None:
             return
-        
-        batch, parent2children = deque(), defaultdict(list)
-        for node in self.iter_data:
-            if node.get("children", None) is None:
-                node.update({"children":[]})
+        if not self.ordered:
+            self.populate_unordered()
+            return
+
+        columns = self.node_columns
+        batch, metadata, depths, positions = [], [], {}, {}
+        for row in self.iter_rows(columns):
+            nid, pid = row[0], row[1]
 
             # add directly the root node ... with meta data.
-            if node["parent"] is None and self.root_id is None:
-                self._build_root(node)
+            if pid is None and self.root_id is None:
+                self._build_root(columns, row)
+                depths[nid] = 0
                 continue
 
-            # build batch
-            batch.append(node)
-            if node.get("parent", None):
-                parent2children[node["parent"]].append(node["id"])
+            # data is ordered from parents to children, parent depth is already known.
+            depth = depths.get(pid, None)
+            if depth is None:
+                raise ValueError(f"node `{nid}` parent `{pid}` is unknown. Data must be ordered from root to leaves, with a single root.")
+            depths[nid] = depth + 1
+            positions[pid] = position = positions.get(pid, -1) + 1
+
+            # build batch. children are computed once every node is loaded.
+            if self.inlines_metadata:
+                batch.append(self._reset_children(row, position) + (depth + 1, False, False))
+            else:
+                batch.append(self._reset_children(row, position))
+                metadata.append((nid, depth + 1, False, False))
 
             # write db when batch size is attained
             if len(batch) == self.BATCH_SIZE:
-                (batch, parent2children) = self._build_nodes(batch, parent2children)
-                parent2children = self._add_remaining_children(parent2children)
+                batch = self._build_nodes(columns, batch)
+                metadata = self._build_metadata(metadata)
                 self.con.commit()
         # do the remaining nodes
         if len(batch) > 0:
-            (batch, parent2children) = self._build_nodes(batch, parent2children)
-            parent2children = self._add_remaining_children(parent2children)
-            self.con.commit()
+            batch = self._build_nodes(columns, batch)
+            metadata = self._build_metadata(metadata)
 
-        # still need to setup metadata
-        self._build_metadata()
+        # relations are only known once every node is loaded.
+        self._create_parent_index()
+        if self.stores_children:
+            self._set_children(self.tables["nodes"]._name)
+        self._set_leaves()
         self.con.commit()
 
-    def _build_root(self, node: dict[str, Any]) -> None:
-        nodes_table = self.tables["nodes"]._name
-        metadata_table = self.tables["metadata"]._name
-        self.root_id = node["id"]
-        self._builder_write_many(nodes_table, list(node.keys()), [list(node.values())])
-        self._builder_write_many(metadata_table, ["nid", "depth", "is_root", "is_leaf"], [[node["id"], 0, True, False]])
+    def populate_unordered(self) -> None:
+        """stage the records as they come, then load them from root to leaves in a single pass."""
+        staging_table = f"{self.tree_name}__staging"
+        columns = self.node_columns
+        self._stage_rows(staging_table, columns)
+        self.root_id = self._load_staging(staging_table, columns)
 
-    def _build_nodes(
-        self,
-        batch: deque[dict[str, Any]],
-        parent2children: dict[str, list[str]]
-    ) -> tuple[deque, dict[str, list[str]]]:
+        self._create_parent_index()
+        if self.stores_children:
+            self._set_children(self.tables["nodes"]._name)
+        self._set_leaves()
+        self.con.commit()
 
-        nodes_table = self.tables["nodes"]._name
-        k, v = list(batch[0].keys()), []
-        while len(batch) > 0:
-            node = batch.popleft()
-            children = parent2children.pop(node["id"], [])
-            node.update({"children": children})
-            v.append(tuple(node.values()))
-        self._builder_write_many(nodes_table, k, v, False)
-        return (batch, parent2children)
-
-    def _add_remaining_children(
-        self,
-        parent2children: dict[str, list[str]]
-    ) -> dict[str, list[str]]:
-        nodes_table = self.tables["nodes"]._name
-        remains = self._get_children_from_ids(nodes_table, list(parent2children.keys()))
-        for node in remains:
-            new_children = parent2children.pop(node["id"])
-            children = node["children"] + new_children
-            self._builder_update(nodes_table, [("children", children)], [("id","=",node["id"])], commit=False)
-        return parent2children
-
-    def _build_metadata(self) -> None:
-        nodes_table = self.tables["nodes"]._name
+    def sync_tree(self) -> dict[str, int]:
+        """
+        apply the data to an existing tree, deleting, updating, inserting or moving only the nodes that changed.
+        The data is staged in a temporary table first, so readers are only locked out while the difference is written.
+        Records fields must be part of the tree nodes, new fields require rebuilding the tree with `replace=True`.
+        """
+        staging_table = f"{self.tree_name}__staging"
+        columns = self.node_columns
+        unknown = [f for f in self.model or {} if f not in columns and f != "children"]
+        if unknown:
+            raise ValueError(f"fields {unknown} are not part of tree: {self.tree_name}. Consider rebuilding it with `replace=True`.")
+        self._create_parent_index()
+        self._stage_rows(staging_table, columns)
+        return self._sync_staging(staging_table, columns)
+
+    def _stage_rows(self, staging_table: str, columns: list[str]) -> None:
+        self._create_staging(staging_table)
+        try:
+            batch = []
+            # records are checked while being staged.
+            for row in self.iter_rows(columns):
+                batch.append(self._reset_children(row))
+                if len(batch) == self.BATCH_SIZE:
+                    self._builder_write_many(staging_table, columns, batch, False)
+                    batch = []
+            if len(batch) > 0:
+                self._builder_write_many(staging_table, columns, batch, False)
+            self._check_staging(staging_table)
+        except Exception:
+            self._drop(staging_table)
+            raise
+
+    def _reset_children(self, row: tuple[Any, ...], position: int | None = None) -> tuple[Any, ...]:
+        """children are computed once every node is loaded. A node position is its rank among its siblings."""
+        head, tail = row[:2], row[2:]
+        if self.stores_children:
+            head, tail = head + ("[]",), tail[1:]
+        if self.stores_positions:
+            head, tail = head + (position,), tail[1:]
+        return head + tail
+
+    def _build_root(self, columns: list[str], row: tuple[Any, ...]) -> None:
+        self.root_id = row[0]
+        if self.inlines_metadata:
+            self._build_nodes(columns, [self._reset_children(row, 0) + (0, True, False)])
+            return
+        self._build_nodes(columns, [self._reset_children(row, 0)])
+        self._build_metadata([(self.root_id, 0, True, False)])
+
+    def _build_metadata(self, metadata: list[tuple[str, int, bool, bool]]) -> list[tuple[str, int, bool, bool]]:
+        if len(metadata) == 0:
+            return []
         metadata_table = self.tables["metadata"]._name
-        root = self._get_children_from_id(nodes_table, self.root_id)
-        current_layer, layers_size, queue, values = 1, defaultdict(int), deque(root["children"]), []
-        layers_size[current_layer] += len(root["children"])
-        while len(queue) > 0:
-            nid = queue.popleft()
-            children = self._get_children_from_id(nodes_table, nid)
-            values.append(tuple((nid, current_layer, False, not any(children["children"]))))
-            queue.extend(children["children"])
-
-            layers_size[current_layer + 1] += len(children["children"])
-            layers_size[current_layer] -= 1
-            if layers_size[current_layer] == 0:
-                current_layer += 1
-
-            if len(values) == self.BATCH_SIZE:
-                self._builder_write_many(metadata_table, ["nid", "depth", "is_root", "is_leaf"], values)
-                values = []
-        if len(values) > 0:
-            self._builder_write_many(metadata_table, ["nid", "depth", "is_root", "is_leaf"], values)
+        self._builder_write_many(metadata_table, ["nid", "depth", "is_root", "is_leaf"], metadata, False)
+        return []
+
+    def _build_nodes(self, columns: list[str], batch: list[tuple[Any, ...]]) -> list[tuple[Any, ...]]:
+        nodes_table = self.tables["nodes"]._name
+        if self.inlines_metadata:
+            columns = columns + METADATA_FIELDS
+        self._builder_write_many(nodes_table, columns, batch, False)
+        return []
 
     def _collect_tables(self) -> None:
         self.tables = {}
@@ -207,8 +311,9 @@ class TreeBuilder(TreeEngine):
             raise ValueError("Input data files or a database into the TreeBuilder")
         else:
             nodes_fields = {k:SimpleSqlField(k,v) for k,v in self.model.items() if k not in ["nid", "id", "parent", "children"]}
-            self.tables["nodes"] = NodesTable.initialize(self.tree_name, **nodes_fields)
-            self.tables["metadata"] = MetadataTable.initialize(self.tree_name)
+            self.tables["nodes"] = NodesTable.initialize(self.tree_name, self.store_children, self.inline_metadata, **nodes_fields)
+            if not self.inline_metadata:
+                self.tables["metadata"] = MetadataTable.initialize(self.tree_name)
 
     def _set_loaders(self, data: Data, strategy: Loaders= "lazy") -> None:
         if data is None:
@@ -223,37 +328,31 @@ class TreeBuilder(TreeEngine):
             if isinstance(d, dict):
                 self.data.append(Loader(data))
                 break
-            elif isinstance(d, str):
+            elif isinstance(d, (str, Path)):
                 loader = infer_loader(d)
-                self.data.append(loader(d, strategy))
-            elif type(d) in [Loader, JlLoader, JsonLoader]:
+                self.data.append(loader(str(d), strategy))
+            elif isinstance(d, Loader):
                 self.data.append(d)
             else:
                 raise ValueError("data must be of type list[dict[str, Any]] | list[str] | None")
         
-    def _infer_model(self, model: dict[str, Any] | None) -> None:
+    def _infer_model(self, model: Model | None = None, sample: int | None = None) -> None:
         if model is not None:
+            model = parse_model(model)
+            self.check_records = True
+        elif self.data is None:
             return
+        elif sample is not None:
+            with closing(self.iter_data) as records:
+                model = infer_model(islice(records, sample))
+            self.check_records = True
+        elif self.parallel:
+            model = ParallelLoader(self.data, self.workers).infer_model()
+        else:
+            model = infer_model(self.iter_data)
 
-        model = {}
-        for record in self.iter_data:
-            if "id" not in record.keys():
-                raise KeyError("Data records must have an id field")
-            if "parent" not in record.keys():
-                raise KeyError("Data records must have a parent field.")
-
-            for field, value in record.items():
-                current_dtype = model.get(field, None)
-                dtype = infer_dtype(value)
-                if current_dtype is None:
-                    model[field] = dtype
-                elif dtype is None and current_dtype != "NULL":
-                    continue
-                elif current_dtype == "NULL" and dtype != "NULL":
-                    model[field] = dtype
-                elif current_dtype != dtype and dtype != "NULL":
-                    raise ValueError(f"field `{field}` dtype is not consistent over the dataset.")
-                    
         if model.get("id") != "TEXT":
             raise ValueError("Id must be a string")
-        self.model = model
\ No newline at end of file
+        if model.get("parent") == "NULL":
+            model["parent"] = "TEXT"
+        self.model = model
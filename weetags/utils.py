@@ -1,23 +1,31 @@
 import sqlite3
 import traceback
 from pathlib import Path
+from functools import wraps
+from threading import get_ident
 from operator import itemgetter
-from typing import Any, Callable
+from typing import Any, Callable, Iterable
 
 from weetags.engine.sql import DTYPES
-from weetags.loaders import JlLoader, JsonLoader
+from weetags.loaders import JlLoader, JsonLoader, CsvLoader, TsvLoader, COMPRESSIONS
 
 StrOrPath = str | Path
 
 
 
 
-def infer_loader(path: StrOrPath) -> JlLoader | JsonLoader:
-    ext = path.split(".")[-1]
+def infer_loader(path: StrOrPath) -> JlLoader | JsonLoader | CsvLoader | TsvLoader:
+    exts = str(path).split(".")
+    ext = exts[-1]
+    if ext in COMPRESSIONS and len(exts) > 2:
+        ext = exts[-2]
     loaders = {
         "json": JsonLoader,
         "jl": JlLoader,
-        "jsonlines": JlLoader
+        "jsonl": JlLoader,
+        "jsonlines": JlLoader,
+        "csv": CsvLoader,
+        "tsv": TsvLoader
     }
     loader = loaders.get(ext, None)
     if loader is None:
@@ -41,6 +49,62 @@ def infer_dtype(value: Any) -> str:
         dtype = "JSON"
     return dtype
 
+def merge_dtype(model: dict[str, str], field: str, dtype: str) -> None:
+    """merge a field dtype into a data model. `NULL` dtypes are overriden by any other dtype."""
+    current_dtype = model.get(field, None)
+    if current_dtype is None:
+        model[field] = dtype
+    elif current_dtype == "NULL" and dtype != "NULL":
+        model[field] = dtype
+    elif current_dtype != dtype and dtype != "NULL":
+        raise ValueError(f"field `{field}` dtype is not consistent over the dataset.")
+
+def infer_model(records: Iterable[dict[str, Any]]) -> dict[str, str]:
+    model = {}
+    for record in records:
+        if "id" not in record.keys():
+            raise KeyError("Data records must have an id field")
+        if "parent" not in record.keys():
+            raise KeyError("Data records must have a parent field.")
+        for field, value in record.items():
+            merge_dtype(model, field, infer_dtype(value))
+    return model
+
+def parse_model(model: dict[str, str | type]) -> dict[str, str]:
+    """validate a user defined data model. dtypes are given either as sql dtypes or as python types."""
+    pytypes = {str: "TEXT", int: "INTEGER", float: "REAL", bool: "BOOL", list: "JSONLIST", dict: "JSON"}
+    parsed = {}
+    for field, dtype in model.items():
+        dtype = pytypes.get(dtype, dtype) # type: ignore
+        if dtype not in list(pytypes.values()) + ["NULL"]:
+            raise ValueError(f"field `{field}` has an unknown dtype: {dtype}")
+        parsed[field] = dtype
+    parsed.setdefault("parent", "TEXT")
+    if "id" not in parsed:
+        raise KeyError("Data model must have an id field")
+    return parsed
+
+def check_record(record: dict[str, Any], model: dict[str, str]) -> None:
+    """check a record against a data model. integers are accepted as `REAL` values."""
+    if "id" not in record.keys():
+        raise KeyError("Data records must have an id field")
+    if "parent" not in record.keys():
+        raise KeyError("Data records must have a parent field.")
+
+    for field, value in record.items():
+        if field == "children":
+            continue
+        expected = model.get(field, None)
+        if expected is None:
+            raise ValueError(f"field `{field}` of record `{record['id']}` is not part of the data model.")
+
+        dtype = infer_dtype(value)
+        if dtype == "NULL" or dtype == expected or (expected == "REAL" and dtype == "INTEGER"):
+            continue
+        elif expected == "NULL":
+            raise ValueError(f"field `{field}` of record `{record['id']}` has no dtype in the data model. Consider giving an explicit model or a larger sample.")
+        raise ValueError(f"field `{field}` of record `{record['id']}` must be of dtype {expected}, not {dtype}.")
+
 def valid_creation(f: Callable):
     def wrapped(tree, **kwargs):
         nid, parent, node_values = itemgetter("nid", "parent", "node_values")(kwargs)
@@ -71,8 +135,8 @@ def valid_update(f: Callable):
         meta_table = tree.tables.get("metadata")
         for k,v in set_values:
             field = getattr(node_table, k, None) or getattr(meta_table, k, None)
-            if field.name in ["id","nid","parent","children", "depth", "is_root", "is_leaf"]:
-                raise KeyError(f"You cannot update the following fields: [`id`, `nid`, `parent`, `children`, `depth`, `is_root`, `is_leaf`]")
+            if field.name in ["id","nid","parent","children", "position", "depth", "is_root", "is_leaf"]:
+                raise KeyError(f"You cannot update the following fields: [`id`, `nid`, `parent`, `children`, `position`, `depth`, `is_root`, `is_leaf`]")
             if field is None or isinstance(v, DTYPES[field.dtype]) is False:
                 raise ValueError(f"node field {k} either doesn't exist or has wrong dtype.")
         return f(tree, **kwargs)
@@ -84,14 +148,39 @@ def valid_append(f: Callable):
         node_table = tree.tables.get("nodes")
         meta_table = tree.tables.get("metadata")
         field = getattr(node_table, fname, None) or getattr(meta_table, fname, None)
-        if fname in ["id","nid","parent","children", "depth", "is_root", "is_leaf"]:
-            raise KeyError(f"You cannot update the following fields: [`id`, `nid`, `parent`, `children`, `depth`, `is_root`, `is_leaf`]")
+        if fname in ["id","nid","parent","children", "position", "depth", "is_root", "is_leaf"]:
+            raise KeyError(f"You cannot update the following fields: [`id`, `nid`, `parent`, `children`, `position`, `depth`, `is_root`, `is_leaf`]")
         if field is None or field.dtype not in ["JSON","JSONLIST"]:
             raise TypeError("field_name must reference field containing a collection such as a list or a dict")
         return f(tree, **kwargs)
     return wrapped    
 
 
+def queued(f: Callable):
+    """
+    route the mutation through the tree writer thread when one is running. Returns a Future in that case.
+    Otherwise, the mutation runs on the tree connection while holding the tree write lock.
+    """
+    def wrapped(tree, *args, **kwargs):
+        if getattr(tree, "writer", None) is None or tree._explaining == get_ident():
+            with tree._write_lock:
+                return f(tree, *args, **kwargs)
+        return tree.writer.submit(f.__name__, args, kwargs)
+    return wrapped
+
+
+def guarded(f: Callable):
+    """
+    accept a `deadline` keyword, in seconds, aborting the operation with `QueryTimeout` once expired.
+    Operations interrupted from another thread with `Tree.interrupt` raise `QueryInterrupted`.
+    """
+    @wraps(f)
+    def wrapped(tree, *args, deadline: float | None = None, **kwargs):
+        with tree._guard(deadline):
+            return f(tree, *args, **kwargs)
+    return wrapped
+
+
 def apply_handler(decorator: Callable):
     def decorate(cls):
         for attr in cls.__dict__: